@@ -5,7 +5,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'shared'))
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity, create_access_token, create_refresh_token, get_jwt
 from flask_cors import CORS
 from datetime import datetime, timedelta
@@ -23,7 +23,7 @@ from shared.utils.validators import (
     validate_subject_name, validate_course_name, validate_price, validate_token_count,
     validate_mock_test_count, validate_blog_title, validate_blog_content, validate_tags
 )
-from shared.utils.response_helper import success_response, error_response, validation_error_response
+from shared.utils.response_helper import success_response, error_response, validation_error_response, sse_event
 from shared.utils.email_service import email_service
 from shared.utils.google_oauth import create_google_oauth_service
 from shared.utils.decorators import admin_required, user_required, get_current_user
@@ -107,6 +107,27 @@ def generate_fallback_questions(subject_name, num_questions=50):
 
     return fallback_questions
 
+def start_background_services(app):
+    """Start the MCQ job workers, bank producer, Ollama monitor and model warm-up (idempotent)
+
+    Call once per serving process: from the reloader child (``python app.py``) or from
+    gunicorn's post_worker_init hook (gunicorn.conf.py), after any fork.
+    """
+    from shared.services.async_mcq_generation_service import get_async_mcq_generation_service
+    from shared.services.question_bank_service import QuestionBankService
+    from shared.services.ollama_health_service import get_ollama_health_service
+
+    get_async_mcq_generation_service().start_workers(app)
+    if app.config.get('MCQ_GENERATION_WORKERS', 0) > 0:
+        QuestionBankService.start_producer(app)
+
+    get_ollama_health_service(app.config.get('OLLAMA_BASE_URL')).start_monitor()
+
+    if app.config.get('MULTIMODAL_WARMUP_ON_BOOT') and app.config.get('MULTIMODAL_RAG_ENABLED'):
+        from shared.services.multimodal_rag_service import warm_up_multimodal
+        warm_up_multimodal(app.config.get('MULTIMODAL_CHROMADB_PATH'), app.config.get('MULTIMODAL_OLLAMA_MODEL', 'llava'))
+
+
 def create_app(config_name='development'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
@@ -158,12 +179,31 @@ def create_app(config_name='development'):
     # Health endpoint
     @app.route('/health', methods=['GET'])
     def health_check():
+        from shared.services.model_registry import model_registry
         return jsonify({
             'success': True,
             'message': 'Jishu Backend API is running',
             'version': '1.0.0',
-            'architecture': 'monolithic'
-        })
+            'architecture': 'monolithic',
+            'readiness': {
+                'status': model_registry.overall_state(),
+                'components': model_registry.status()
+            }
+        }), 200
+
+    # Readiness endpoint for load balancers: 503 while models warm up or after a failed load
+    @app.route('/ready', methods=['GET'])
+    def readiness_check():
+        from shared.services.model_registry import READY, model_registry
+        state = model_registry.overall_state()
+        return jsonify({
+            'success': state == READY,
+            'message': 'Jishu Backend API is ready' if state == READY else f'Jishu Backend API is {state}',
+            'readiness': {
+                'status': state,
+                'components': model_registry.status()
+            }
+        }), 200 if state == READY else 503
 
     @app.route('/api/config/dev-settings', methods=['GET'])
     def get_dev_settings():
@@ -2023,10 +2063,90 @@ def create_app(config_name='development'):
             logger.error(f"Error getting token status: {str(e)}", exc_info=True)
             return error_response(f"Failed to get token status: {str(e)}", 500)
 
+    def wants_event_stream(data):
+        """Check whether the client asked for a streamed (Server-Sent Events) response"""
+        return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+    def stream_chat_response(multimodal_service, user_id, session_id, message, subject):
+        """Stream a multimodal RAG chat answer as Server-Sent Events
+
+        Events: ``meta`` (sources), ``token`` (one per Ollama chunk), then ``done`` or ``error``.
+        The AIChatHistory row is written once the stream completes. A stream that runs past
+        SSE_MAX_STREAM_SECONDS ends with an ``error`` event so it frees its worker thread.
+        """
+        max_seconds = app.config.get('SSE_MAX_STREAM_SECONDS', 300)
+
+        def generate():
+            start_time = time.time()
+            first_token_time = None
+
+            events = multimodal_service.stream_chat_response(query=message, subject=subject)
+            for event in events:
+                if time.time() - start_time > max_seconds:
+                    events.close()  # Releases the Ollama host slot
+                    logger.warning(f"⚠️ Chat stream stopped after {max_seconds}s")
+                    yield sse_event('error', {'message': 'Response took too long and was stopped'})
+                    return
+                if event['type'] == 'meta':
+                    yield sse_event('meta', {
+                        'session_id': session_id,
+                        'model_used': event['model_used'],
+                        'sources_used': event['sources_used'],
+                        'docs_count': event['docs_count'],
+                        'cached': event.get('cached', False)
+                    })
+                elif event['type'] == 'token':
+                    if first_token_time is None:
+                        first_token_time = time.time() - start_time
+                    yield sse_event('token', {'content': event['content']})
+                elif event['type'] == 'error':
+                    logger.warning(f"⚠️ Chat stream failed: {event['error']}")
+                    yield sse_event('error', {'message': event['error']})
+                elif event['type'] == 'done':
+                    response_time = time.time() - start_time
+
+                    # Save to chat history
+                    try:
+                        chat_history = AIChatHistory(
+                            user_id=user_id,
+                            session_id=session_id,
+                            message=message,
+                            response=event['response'],
+                            response_time=response_time,
+                            tokens_used=0,
+                            is_academic=True
+                        )
+                        db.session.add(chat_history)
+                        db.session.commit()
+                        print(f"✅ Chat response streamed in {response_time:.2f}s (first token {first_token_time or 0:.2f}s)")
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"❌ Error saving chat history: {e}")
+
+                    yield sse_event('done', {
+                        'session_id': session_id,
+                        'response_time': response_time,
+                        'time_to_first_token': first_token_time,
+                        'model_used': event['model_used'],
+                        'sources_used': event['sources_used'],
+                        'docs_count': event['docs_count'],
+                        'cached': event.get('cached', False),
+                        'method': 'multimodal_rag_pipeline'
+                    })
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
     @app.route('/api/ai/chat', methods=['POST'])
     @user_required
     def api_ai_chat():
-        """AI chatbot conversation using multimodal RAG (backward compatibility endpoint)"""
+        """AI chatbot conversation using multimodal RAG (backward compatibility endpoint)
+
+        Send ``"stream": true`` (or ``Accept: text/event-stream``) to receive tokens as Server-Sent Events.
+        """
         try:
             user = get_current_user()
             if not user:
@@ -2070,6 +2190,9 @@ def create_app(config_name='development'):
             logger.info(f"📚 Available collections: {list(multimodal_service.collections.keys())}")
             logger.info(f"🔎 Searching across ALL collections for comprehensive answer...")
 
+            if wants_event_stream(data):
+                return stream_chat_response(multimodal_service, user.id, session_id, message, detected_subject)
+
             result = multimodal_service.generate_chat_response(
                 query=message,
                 subject=detected_subject  # Used for logging, service searches all collections
@@ -2107,7 +2230,8 @@ def create_app(config_name='development'):
                 'model_used': result.get('model_used', 'llava'),
                 'method': 'multimodal_rag_pipeline',
                 'sources_used': result.get('sources_used', []),
-                'docs_count': result.get('docs_count', 0)
+                'docs_count': result.get('docs_count', 0),
+                'cached': result.get('cached', False)
             }, f"Chat response generated in {response_time:.2f}s using {len(result.get('sources_used', []))} subject collections")
 
         except Exception as e:
@@ -2217,7 +2341,10 @@ def create_app(config_name='development'):
     @app.route('/api/chatbot/query', methods=['POST'])
     @user_required
     def api_chatbot_query():
-        """Answer user questions using multimodal RAG pipeline (CLIP + ChromaDB + Ollama Qwen2-VL)"""
+        """Answer user questions using multimodal RAG pipeline (CLIP + ChromaDB + Ollama Qwen2-VL)
+
+        Send ``"stream": true`` (or ``Accept: text/event-stream``) to receive tokens as Server-Sent Events.
+        """
         try:
             user = get_current_user()
             if not user:
@@ -2254,6 +2381,9 @@ def create_app(config_name='development'):
                 ollama_model=app.config.get('MULTIMODAL_OLLAMA_MODEL', 'llava')
             )
 
+            if wants_event_stream(data):
+                return stream_chat_response(multimodal_service, user.id, session_id, query, subject if subject else 'general')
+
             # Generate response using multimodal RAG pipeline
             import time
             start_time = time.time()
@@ -2292,7 +2422,8 @@ def create_app(config_name='development'):
                 'session_id': session_id,
                 'response_time': response_time,
                 'model_used': result.get('model_used', 'llava'),
-                'method': 'multimodal_rag_pipeline'
+                'method': 'multimodal_rag_pipeline',
+                'cached': result.get('cached', False)
             }, f"Chat response generated in {response_time:.2f}s using multimodal RAG")
 
         except Exception as e:
@@ -2516,6 +2647,124 @@ def create_app(config_name='development'):
         except Exception as e:
             return error_response(f"Failed to get test cards: {str(e)}", 500)
 
+    # Durable MCQ generation jobs, drained by the worker pool in AsyncMCQGenerationService.
+    # Handlers run inside an app context on a worker thread and resume after the last
+    # published chunk if a previous worker died mid-job.
+    def run_mock_test_generation_job(job):
+        """Generate a full mock test, publishing each chunk as it completes"""
+        from shared.services.multimodal_rag_service import get_multimodal_rag_service
+        multimodal_service = get_multimodal_rag_service(
+            chromadb_path=app.config.get('MULTIMODAL_CHROMADB_PATH'),
+            ollama_model=job.payload.get('model_name', 'llava')
+        )
+
+        subject_name = job.payload.get('subject_name', 'physics')
+        logger.info(f"📚 Generating MCQs for subject: {subject_name}")
+
+        result = multimodal_service.generate_mcq(
+            query=subject_name,
+            subject=subject_name,
+            num_questions=job.total_questions,
+            on_chunk=lambda chunk_num, start_index, questions: job.publish(chunk_num, questions),
+            skip_chunks=job.completed_chunks
+        )
+
+        if result.get('success'):
+            logger.info(f"✅ MCQ generation completed: {len(result.get('questions', []))} questions")
+        else:
+            logger.error(f"❌ MCQ generation failed: {result.get('error')}")
+        return result
+
+    def run_remaining_questions_job(job):
+        """Generate the questions after a test session's initial batch, saving each chunk as it completes"""
+        from shared.services.multimodal_rag_service import get_multimodal_rag_service
+        multimodal_service = get_multimodal_rag_service(
+            chromadb_path=app.config.get('MULTIMODAL_CHROMADB_PATH'),
+            ollama_model=app.config.get('MULTIMODAL_OLLAMA_MODEL', 'llava')
+        )
+
+        payload = job.payload
+        subject_name = payload['subject_name']
+        batch_offset = payload.get('batch_offset', 0)
+
+        def save_chunk(chunk_num, start_index, questions):
+            """Save one generated chunk and publish the saved rows in the same commit"""
+            saved = []
+            for idx, q_data in enumerate(questions):
+                try:
+                    question = ExamCategoryQuestion(
+                        exam_category_id=payload['course_id'],
+                        subject_id=job.subject_id,
+                        mock_test_id=job.mock_test_id,
+                        question=q_data.get('question', ''),
+                        option_1=q_data.get('option_a', ''),
+                        option_2=q_data.get('option_b', ''),
+                        option_3=q_data.get('option_c', ''),
+                        option_4=q_data.get('option_d', ''),
+                        correct_answer=q_data.get('correct_answer', ''),
+                        explanation=q_data.get('explanation', ''),
+                        is_ai_generated=True,
+                        ai_model_used=payload.get('model_used'),
+                        difficulty_level='hard',
+                        user_id=job.user_id,
+                        purchased_id=payload.get('purchase_id'),
+                        generation_batch_id=payload.get('batch_id'),
+                        batch_sequence=batch_offset + start_index + idx + 1,
+                        chromadb_collection=subject_name.lower(),
+                        multimodal_source_type='mixed',
+                        generation_method='multimodal_rag'
+                    )
+                    db.session.add(question)
+                    saved.append(question)
+                except Exception as q_error:
+                    logger.error(f"❌ Error saving remaining question {idx}: {str(q_error)}")
+
+            db.session.flush()
+            if not job.publish(chunk_num, [q.to_dict(include_answer=False) for q in saved]):
+                return []
+            logger.info(f"✅ Saved chunk {chunk_num}: {len(saved)} questions to database")
+            return saved
+
+        logger.info(f"🔄 Starting background generation for remaining {job.total_questions} questions")
+
+        # Near-duplicates of questions already in the subject are dropped and regenerated
+        from shared.services.question_dedup_service import generate_deduplicated
+        result = generate_deduplicated(
+            multimodal_service,
+            query=subject_name,
+            subject=subject_name,
+            subject_id=job.subject_id,
+            num_questions=job.total_questions,
+            save_chunk=save_chunk,
+            skip_chunks=job.completed_chunks,
+            dedup_state=job.payload.setdefault('dedup', {})
+        )
+
+        if result.get('success'):
+            logger.info(f"✅ Remaining questions generated: {len(result['questions'])} questions")
+            return result
+
+        error_msg = result.get('error', 'Unknown error')
+        logger.warning(f"⚠️ Remaining questions generation failed: {error_msg}")
+        # Use fallback for remaining questions
+        fallback_questions = generate_fallback_questions(subject_name, job.total_questions)
+        logger.info(f"🔄 Using fallback for remaining: {len(fallback_questions)} questions")
+        return {'success': True, 'questions': fallback_questions, 'fallback_used': True}
+
+    from shared.services.async_mcq_generation_service import get_async_mcq_generation_service
+    generation_job_service = get_async_mcq_generation_service()
+    generation_job_service.register_handler('mock_test', run_mock_test_generation_job)
+    generation_job_service.register_handler('test_session_remaining', run_remaining_questions_job)
+
+    from shared.services.question_bank_service import QuestionBankService, REFILL_JOB_TYPE
+    generation_job_service.register_handler(REFILL_JOB_TYPE, QuestionBankService.run_refill_job)
+
+    # Background threads are started by the serving entrypoint (start_background_services),
+    # not here: create_app also runs in the reloader's parent process, in a gunicorn
+    # --preload master before forking, and in migration scripts
+    if app.config.get('START_BACKGROUND_SERVICES') and not app.config.get('TESTING'):
+        start_background_services(app)
+
     @app.route('/api/user/test-cards/<int:mock_test_id>/instructions', methods=['POST'])
     @user_required
     def api_test_instructions(mock_test_id):
@@ -2531,35 +2780,58 @@ def create_app(config_name='development'):
 
             logger.info(f"📋 Test instructions requested for mock_test_id: {mock_test_id}, user_id: {user.id}")
 
-            # Check Ollama health first
+            # Serve from the subject's question bank when it can fill the test (no LLM call)
+            from shared.services.question_bank_service import QuestionBankService
+            mock_test = MockTestAttempt.query.filter_by(id=mock_test_id, user_id=user.id).first()
+            if not mock_test:
+                logger.error(f"❌ Test card not found: {mock_test_id}")
+                return error_response("Test card not found", 404)
+
+            # Assemble before starting the attempt: if assembly fails the request falls through
+            # to live generation, which starts the (single) attempt itself
+            if QuestionBankService.can_assemble(mock_test.subject_id, mock_test.total_questions or 50):
+                assembled = QuestionBankService.assemble_test(mock_test, mock_test.total_questions or 50)
+                if assembled['success']:
+                    from shared.services.mock_test_service import MockTestService
+                    result = MockTestService.start_test_attempt(mock_test_id, user.id)
+                    if not result['success']:
+                        return error_response(result['error'], 400)
+
+                    QuestionBankService.ensure_refill(mock_test.subject_id)
+                    logger.info(f"✅ Test {mock_test_id} assembled from question bank")
+                    return success_response({
+                        'session_id': result.get('session_id'),
+                        'generation_session_id': None,
+                        'mock_test_id': mock_test_id,
+                        'message': 'Test instructions loaded. Questions are ready.',
+                        'questions_ready': True,
+                        'from_question_bank': True,
+                        'server_healthy': True
+                    }, "Test instructions ready")
+                logger.warning(f"⚠️ Question bank assembly failed, generating live: {assembled['error']}")
+
+            # Check Ollama health from the monitor's cached snapshot (no HTTP round trip)
             from shared.services.ollama_health_service import get_ollama_health_service
             ollama_service = get_ollama_health_service()
 
-            logger.info("🔍 Checking Ollama server health...")
-            is_healthy, health_msg = ollama_service.check_server_health()
+            is_healthy, health_msg = ollama_service.is_healthy_cached()
             if not is_healthy:
                 logger.error(f"❌ Ollama server health check failed: {health_msg}")
                 return error_response(
-                    f"Ollama server not available: {health_msg}. Please ensure Ollama is running on http://localhost:11434",
+                    f"Ollama server not available: {health_msg}. Please ensure Ollama is running on {ollama_service.ollama_base_url}",
                     503
                 )
 
-            logger.info("✅ Ollama server is healthy")
-
-            # Ensure model is available
+            # Ensure model is available; a missing model is pulled in the background
             model_name = app.config.get('MULTIMODAL_OLLAMA_MODEL', 'llava')
-            logger.info(f"🔍 Checking model availability: {model_name}")
-
-            is_available, model_msg = ollama_service.ensure_model_available(model_name, auto_pull=True)
-            if not is_available:
-                logger.error(f"❌ Model not available: {model_msg}")
+            if not ollama_service.is_model_available_cached(model_name):
+                ollama_service.request_model_pull(model_name)
+                logger.error(f"❌ Model not available: {model_name}")
                 return error_response(
-                    f"Model '{model_name}' not available: {model_msg}. Attempting to pull model...",
+                    f"Model '{model_name}' not available. Pulling model, please try again shortly...",
                     503
                 )
 
-            logger.info(f"✅ Model '{model_name}' is available")
-
             # Start test attempt
             from shared.services.mock_test_service import MockTestService
             logger.info(f"📝 Starting test attempt for mock_test_id: {mock_test_id}")
@@ -2577,61 +2849,25 @@ def create_app(config_name='development'):
             from shared.services.async_mcq_generation_service import get_async_mcq_generation_service
             async_service = get_async_mcq_generation_service()
 
-            mock_test = MockTestAttempt.query.filter_by(id=mock_test_id, user_id=user.id).first()
-            if not mock_test:
-                logger.error(f"❌ Test card not found: {mock_test_id}")
-                return error_response("Test card not found", 404)
+            subject = ExamCategorySubject.query.get(mock_test.subject_id)
+            subject_name = subject.subject_name.lower() if subject else 'physics'
 
-            # Create generation session
+            # Bank can't fill a test yet: make sure it is being refilled
+            QuestionBankService.ensure_refill(mock_test.subject_id)
+
+            # Enqueue the generation job (picked up by the worker pool of any process)
             logger.info(f"🔄 Creating generation session for mock_test_id: {mock_test_id}")
             gen_session = async_service.create_session(
                 mock_test_id=mock_test_id,
                 user_id=user.id,
                 subject_id=mock_test.subject_id,
                 total_questions=50,
-                initial_questions_count=5
+                initial_questions_count=5,
+                job_type='mock_test',
+                payload={'subject_name': subject_name, 'model_name': model_name}
             )
 
-            logger.info(f"✅ Generation session created: {gen_session.session_id}")
-
-            # Start background generation
-            def generate_mcq():
-                try:
-                    logger.info(f"🚀 Starting background MCQ generation for session: {gen_session.session_id}")
-
-                    from shared.services.multimodal_rag_service import get_multimodal_rag_service
-                    multimodal_service = get_multimodal_rag_service(
-                        chromadb_path=app.config.get('MULTIMODAL_CHROMADB_PATH'),
-                        ollama_model=model_name
-                    )
-
-                    subject = ExamCategorySubject.query.get(mock_test.subject_id)
-                    subject_name = subject.subject_name.lower() if subject else 'physics'
-
-                    logger.info(f"📚 Generating MCQs for subject: {subject_name}")
-
-                    result = multimodal_service.generate_mcq(
-                        query=subject_name,
-                        subject=subject_name,
-                        num_questions=50
-                    )
-
-                    if result.get('success'):
-                        logger.info(f"✅ MCQ generation completed: {len(result.get('questions', []))} questions")
-                    else:
-                        logger.error(f"❌ MCQ generation failed: {result.get('error')}")
-
-                    return result
-
-                except Exception as e:
-                    logger.error(f"❌ Error in background MCQ generation: {str(e)}", exc_info=True)
-                    return {'success': False, 'error': str(e)}
-
-            logger.info(f"🔄 Starting background generation thread for session: {gen_session.session_id}")
-            async_service.start_background_generation(
-                gen_session.session_id,
-                generate_mcq
-            )
+            logger.info(f"✅ Generation session queued: {gen_session.session_id}")
 
             logger.info(f"✅ Test instructions endpoint completed successfully")
 
@@ -2657,6 +2893,9 @@ def create_app(config_name='development'):
         """
         Poll MCQ generation status
         Returns progress and initial questions when ready
+
+        Long-poll: pass ``since`` (questions already received) and ``wait`` (seconds, max 30)
+        to block until new questions arrive; they are returned in ``new_questions``.
         """
         try:
             user = get_current_user()
@@ -2674,7 +2913,15 @@ def create_app(config_name='development'):
             from shared.services.async_mcq_generation_service import get_async_mcq_generation_service
             async_service = get_async_mcq_generation_service()
 
-            progress = async_service.get_progress(generation_session_id)
+            wait = min(request.args.get('wait', 0, type=float), 30.0)
+            if wait > 0:
+                progress = async_service.wait_for_update(
+                    generation_session_id,
+                    since=request.args.get('since', 0, type=int),
+                    timeout=wait
+                )
+            else:
+                progress = async_service.get_progress(generation_session_id)
 
             if not progress.get('success'):
                 logger.warning(f"⚠️ Generation session not found: {generation_session_id}")
@@ -2694,6 +2941,78 @@ def create_app(config_name='development'):
             logger.error(f"❌ Error getting generation status: {str(e)}", exc_info=True)
             return error_response(f"Failed to get generation status: {str(e)}", 500)
 
+    @app.route('/api/user/test-cards/<int:mock_test_id>/generation-stream', methods=['GET'])
+    @user_required
+    def api_generation_stream(mock_test_id):
+        """
+        Stream MCQ generation as Server-Sent Events
+        Pushes each chunk of questions as soon as it is generated and saved, so the
+        test can start before all questions are ready.
+
+        Query params: ``generation_session_id`` (required), ``since`` (questions already received).
+        Events: ``questions`` per chunk, then ``complete`` or ``error``. A stream still open after
+        SSE_MAX_STREAM_SECONDS ends with ``reconnect`` (carrying ``since``) so the client resumes
+        on a fresh request instead of pinning a worker thread.
+        """
+        try:
+            user = get_current_user()
+            if not user:
+                return error_response("User not found", 404)
+
+            generation_session_id = request.args.get('generation_session_id')
+            if not generation_session_id:
+                return error_response("generation_session_id is required", 400)
+
+            from shared.services.async_mcq_generation_service import get_async_mcq_generation_service
+            async_service = get_async_mcq_generation_service()
+
+            gen_session = async_service.get_session(generation_session_id)
+            if not gen_session or gen_session.user_id != user.id:
+                return error_response("Generation session not found", 404)
+
+            since = request.args.get('since', 0, type=int)
+            deadline = time.time() + app.config.get('SSE_MAX_STREAM_SECONDS', 300)
+
+            def generate():
+                sent = since
+                while True:
+                    if time.time() >= deadline:
+                        yield sse_event('reconnect', {'since': sent})
+                        return
+                    update = async_service.wait_for_update(generation_session_id, since=sent, timeout=15.0)
+                    if not update.get('success'):
+                        yield sse_event('error', {'message': update.get('error')})
+                        return
+
+                    if update['new_questions']:
+                        yield sse_event('questions', {
+                            'start_index': sent,
+                            'questions': update['new_questions'],
+                            'questions_generated': update['questions_generated'],
+                            'total_questions': update['total_questions'],
+                            'progress': update['progress']
+                        })
+                        sent = update['next_index']
+                    elif not (update['is_complete'] or update['has_error']):
+                        yield ": keep-alive\n\n"
+
+                    if update['has_error']:
+                        yield sse_event('error', {'message': update['error_message'], 'questions_generated': sent})
+                        return
+                    if update['is_complete'] and sent >= update['questions_generated']:
+                        yield sse_event('complete', {'questions_generated': sent, 'total_questions': update['total_questions']})
+                        return
+
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        except Exception as e:
+            logger.error(f"❌ Error streaming generation status: {str(e)}", exc_info=True)
+            return error_response(f"Failed to stream generation status: {str(e)}", 500)
+
     @app.route('/api/user/test-cards/<int:mock_test_id>/start', methods=['POST'])
     @user_required
     def api_start_mock_test(mock_test_id):
@@ -2734,18 +3053,14 @@ def create_app(config_name='development'):
     # Ollama Health Check Endpoints
     @app.route('/api/ollama/health', methods=['GET'])
     def api_ollama_health():
-        """Check Ollama server health and model availability"""
+        """Check Ollama server health and model availability (served from the monitor snapshot)"""
         try:
-            app.logger.info("🔍 Checking Ollama server health...")
-
             from shared.services.ollama_health_service import get_ollama_health_service
             ollama_service = get_ollama_health_service()
 
             health_status = ollama_service.get_health_status()
 
-            if health_status['server_healthy']:
-                app.logger.info(f"✅ Ollama server is healthy. Models available: {health_status['models_count']}")
-            else:
+            if not health_status['server_healthy']:
                 app.logger.warning(f"⚠️ Ollama server health check failed: {health_status['server_message']}")
 
             return success_response(health_status, "Ollama health status retrieved")
@@ -2812,6 +3127,38 @@ def create_app(config_name='development'):
             app.logger.error(f"❌ Error checking model '{model_name}': {str(e)}", exc_info=True)
             return error_response(f"Failed to check model: {str(e)}", 500)
 
+    @app.route('/api/admin/ai/cache-stats', methods=['GET'])
+    @admin_required
+    def api_admin_ai_cache_stats():
+        """Get hit rates of the query embedding cache and the semantic chat response cache"""
+        try:
+            from shared.services.multimodal_rag_service import get_chat_cache_stats, get_query_cache_stats
+
+            return success_response({
+                'chat_response_cache': get_chat_cache_stats(),
+                'query_embedding_cache': get_query_cache_stats()
+            }, "AI cache stats retrieved")
+
+        except Exception as e:
+            app.logger.error(f"❌ Error getting AI cache stats: {str(e)}", exc_info=True)
+            return error_response(f"Failed to get AI cache stats: {str(e)}", 500)
+
+    @app.route('/api/admin/ollama/mcq-generation-stats', methods=['GET'])
+    @admin_required
+    def api_admin_mcq_generation_stats():
+        """Get per-model MCQ parse failure and retry counters (structured vs prompt-only)"""
+        try:
+            from shared.services.mcq_schema import mcq_generation_stats
+
+            return success_response({
+                'structured_output_enabled': app.config.get('MULTIMODAL_STRUCTURED_OUTPUT', True),
+                'models': mcq_generation_stats.snapshot()
+            }, "MCQ generation stats retrieved")
+
+        except Exception as e:
+            app.logger.error(f"❌ Error getting MCQ generation stats: {str(e)}", exc_info=True)
+            return error_response(f"Failed to get MCQ generation stats: {str(e)}", 500)
+
     @app.route('/api/user/test-sessions/<int:session_id>/questions', methods=['GET'])
     @user_required
     def api_get_test_questions(session_id):
@@ -2832,9 +3179,26 @@ def create_app(config_name='development'):
             mock_test = session.mock_test
 
             # Check if questions already exist for this mock test
-            existing_questions = ExamCategoryQuestion.query.filter_by(
-                mock_test_id=mock_test.id
-            ).all()
+            from shared.services.question_bank_service import QuestionBankService
+            existing_questions = QuestionBankService.get_mock_test_questions(mock_test.id)
+            total_questions = mock_test.total_questions or 50
+
+            # First attempt: assemble from the subject's question bank when it can fill the test
+            if not existing_questions and QuestionBankService.can_assemble(mock_test.subject_id, total_questions):
+                assembled = QuestionBankService.assemble_test(mock_test, total_questions)
+                QuestionBankService.ensure_refill(mock_test.subject_id)
+                if assembled['success']:
+                    questions = [q.to_dict(include_answer=False) for q in assembled['questions']]
+                    return success_response({
+                        'questions': questions,
+                        'session_id': session.id,
+                        'mock_test_id': mock_test.id,
+                        'attempt_number': session.attempt_number,
+                        'is_re_attempt': False,
+                        'is_generating': False,
+                        'from_question_bank': True,
+                        'total_questions': len(questions)
+                    }, "Questions loaded from question bank")
 
             if existing_questions:
                 # Re-attempt: return existing questions
@@ -2858,6 +3222,9 @@ def create_app(config_name='development'):
                 if not course:
                     return error_response("Course not found", 404)
 
+                # Bank can't fill a test yet: make sure it is being refilled, then generate live
+                QuestionBankService.ensure_refill(subject.id)
+
                 print(f"🚀 Generating AI questions for mock test {mock_test.id}, subject: {subject.subject_name}")
                 logger.info(f"🚀 Starting MCQ generation for test {mock_test.id}")
                 import sys
@@ -2885,6 +3252,15 @@ def create_app(config_name='development'):
                     print(f"✅ Initial batch generated: {len(initial_result['questions'])} questions")
                     logger.info(f"✅ Initial batch generated: {len(initial_result['questions'])} questions")
                     initial_questions = initial_result['questions']
+
+                    # Drop near-duplicates of questions already saved for the subject; the background
+                    # job below generates their replacements, so this request makes no extra LLM call
+                    if app.config.get('QUESTION_DEDUP_ENABLED', True):
+                        from shared.services.question_dedup_service import get_question_dedup_index
+                        initial_questions, duplicates = get_question_dedup_index().filter_new(subject.id, initial_questions)
+                        if duplicates:
+                            logger.info(f"♻️ Dropped {len(duplicates)} near-duplicate initial questions; "
+                                        f"replacements are generated in the background")
                 else:
                     print(f"⚠️ Initial batch generation failed, using fallback...")
                     logger.warning(f"⚠️ Initial batch generation failed")
@@ -2894,6 +3270,7 @@ def create_app(config_name='development'):
                 model_used = app.config.get('MULTIMODAL_OLLAMA_MODEL', 'llava')
                 batch_id = f"batch_{mock_test.id}_{user.id}"
 
+                saved_initial = []
                 for idx, q_data in enumerate(initial_questions):
                     try:
                         question = ExamCategoryQuestion(
@@ -2919,6 +3296,7 @@ def create_app(config_name='development'):
                             generation_method='multimodal_rag'
                         )
                         db.session.add(question)
+                        saved_initial.append(question)
                     except Exception as q_error:
                         logger.error(f"❌ Error saving initial question {idx}: {str(q_error)}")
 
@@ -2926,119 +3304,55 @@ def create_app(config_name='development'):
                     db.session.commit()
                     print(f"✅ Saved {len(initial_questions)} initial questions to database")
                     logger.info(f"✅ Saved {len(initial_questions)} initial questions to database")
+                    if app.config.get('QUESTION_DEDUP_ENABLED', True):
+                        from shared.services.question_dedup_service import get_question_dedup_index
+                        for question in saved_initial:
+                            get_question_dedup_index().add(subject.id, question.id, question.question)
                 except Exception as commit_error:
                     logger.error(f"❌ Error committing initial questions: {str(commit_error)}")
                     db.session.rollback()
 
-                # Step 2: Start async generation for remaining 40 questions
-                print(f"🔄 Starting background generation for remaining 40 questions...")
-                logger.info(f"🔄 Starting background generation for remaining 40 questions...")
+                # Step 2: Start async generation for the remaining questions, including replacements
+                # for initial questions dropped as duplicates or not saved
+                ready_questions = QuestionBankService.get_mock_test_questions(mock_test.id)
+                remaining_questions = max(0, total_questions - len(ready_questions))
+                print(f"🔄 Starting background generation for remaining {remaining_questions} questions...")
+                logger.info(f"🔄 Starting background generation for remaining {remaining_questions} questions...")
 
                 from shared.services.async_mcq_generation_service import get_async_mcq_generation_service
                 async_service = get_async_mcq_generation_service()
 
-                # Create generation session
+                # Enqueue generation of the remaining questions (saved chunk by chunk by a worker)
                 gen_session = async_service.create_session(
                     mock_test_id=mock_test.id,
                     user_id=user.id,
                     subject_id=mock_test.subject_id,
-                    total_questions=40,  # Remaining questions
-                    initial_questions_count=40
+                    total_questions=remaining_questions,
+                    initial_questions_count=remaining_questions,
+                    job_type='test_session_remaining',
+                    payload={
+                        'subject_name': subject.subject_name,
+                        'course_id': mock_test.course_id,
+                        'purchase_id': mock_test.purchase_id,
+                        'batch_id': batch_id,
+                        'batch_offset': len(ready_questions),  # Continue after the initial batch
+                        'model_used': model_used
+                    }
                 )
 
                 logger.info(f"📝 Created generation session: {gen_session.session_id}")
 
-                # Store data needed for background generation (can't pass ORM objects to thread)
-                subject_name = subject.subject_name
-                course_id = mock_test.course_id
-                subject_id = mock_test.subject_id
-                mock_test_id = mock_test.id
-                user_id = user.id
-                purchase_id = mock_test.purchase_id
-
-                # Define background generation function for remaining questions
-                def generate_remaining_mcq():
-                    # Need to run within Flask app context for database access
-                    try:
-                        with app.app_context():
-                            logger.info(f"🔄 Starting background generation for remaining 40 questions")
-
-                            # Generate remaining 40 questions in chunks
-                            result = multimodal_service.generate_mcq(
-                                query=subject_name,
-                                subject=subject_name,
-                                num_questions=40
-                            )
-
-                            if result.get('success') and result.get('questions'):
-                                logger.info(f"✅ Remaining questions generated: {len(result['questions'])} questions")
-
-                                # Save remaining questions to database
-                                for idx, q_data in enumerate(result['questions']):
-                                    try:
-                                        question = ExamCategoryQuestion(
-                                            exam_category_id=course_id,
-                                            subject_id=subject_id,
-                                            mock_test_id=mock_test_id,
-                                            question=q_data.get('question', ''),
-                                            option_1=q_data.get('option_a', ''),
-                                            option_2=q_data.get('option_b', ''),
-                                            option_3=q_data.get('option_c', ''),
-                                            option_4=q_data.get('option_d', ''),
-                                            correct_answer=q_data.get('correct_answer', ''),
-                                            explanation=q_data.get('explanation', ''),
-                                            is_ai_generated=True,
-                                            ai_model_used=model_used,
-                                            difficulty_level='hard',
-                                            user_id=user_id,
-                                            purchased_id=purchase_id,
-                                            generation_batch_id=batch_id,
-                                            batch_sequence=10 + idx + 1,  # Continue from 11
-                                            chromadb_collection=subject_name.lower(),
-                                            multimodal_source_type='mixed',
-                                            generation_method='multimodal_rag'
-                                        )
-                                        db.session.add(question)
-                                    except Exception as q_error:
-                                        logger.error(f"❌ Error saving remaining question {idx}: {str(q_error)}")
-
-                                try:
-                                    db.session.commit()
-                                    logger.info(f"✅ Saved {len(result['questions'])} remaining questions to database")
-                                except Exception as commit_error:
-                                    logger.error(f"❌ Error committing remaining questions: {str(commit_error)}")
-                                    db.session.rollback()
-
-                                return result
-                            else:
-                                error_msg = result.get('error', 'Unknown error')
-                                logger.warning(f"⚠️ Remaining questions generation failed: {error_msg}")
-                                # Use fallback for remaining questions
-                                fallback_questions = generate_fallback_questions(subject.subject_name, 40)
-                                logger.info(f"🔄 Using fallback for remaining: {len(fallback_questions)} questions")
-                                return {'success': True, 'questions': fallback_questions, 'fallback_used': True}
-
-                    except Exception as e:
-                        logger.error(f"❌ Background generation error: {str(e)}", exc_info=True)
-                        return None
+                logger.info(f"✅ Background generation queued for session: {gen_session.session_id}")
 
-                # Start background generation
-                async_service.start_background_generation(
-                    gen_session.session_id,
-                    generate_remaining_mcq
-                )
-
-                logger.info(f"✅ Background generation started for session: {gen_session.session_id}")
-
-                # Return immediately with initial 10 questions
+                # Return immediately with the initial questions that were saved, in batch order
                 return success_response({
-                    'questions': [q.to_dict(include_answer=False) for q in ExamCategoryQuestion.query.filter_by(mock_test_id=mock_test.id).limit(10).all()],
+                    'questions': [q.to_dict(include_answer=False) for q in ready_questions],
                     'session_id': gen_session.session_id,
                     'is_generating': True,
-                    'progress': 20,  # 10 out of 50 = 20%
-                    'questions_generated': 10,
-                    'total_questions': 50,
-                    'message': 'Initial 10 questions ready. Generating remaining 40 in background...',
+                    'progress': len(ready_questions) * 100 // total_questions,
+                    'questions_generated': len(ready_questions),
+                    'total_questions': total_questions,
+                    'message': f'Initial {len(ready_questions)} questions ready. Generating remaining {remaining_questions} in background...',
                     'test_session_id': session.id,
                     'mock_test_id': mock_test.id,
                     'attempt_number': session.attempt_number,
@@ -3078,10 +3392,9 @@ def create_app(config_name='development'):
             if session.status != 'in_progress':
                 return error_response("Test session is not in progress", 400)
 
-            # Get questions for this mock test
-            questions = ExamCategoryQuestion.query.filter_by(
-                mock_test_id=session.mock_test_id
-            ).all()
+            # Get questions for this mock test (bank-assembled or generated live)
+            from shared.services.question_bank_service import QuestionBankService
+            questions = QuestionBankService.get_mock_test_questions(session.mock_test_id)
 
             question_map = {q.id: q for q in questions}
 
@@ -3433,9 +3746,8 @@ def create_app(config_name='development'):
 
             if session and mock_test:
                 # New test card system - check for questions linked to this mock test
-                existing_questions = ExamCategoryQuestion.query.filter_by(
-                    mock_test_id=mock_test.id
-                ).all()
+                from shared.services.question_bank_service import QuestionBankService
+                existing_questions = QuestionBankService.get_mock_test_questions(mock_test.id)
                 purchase_id = mock_test.purchase_id
                 subject_id = mock_test.subject_id
                 course_id = mock_test.course_id
@@ -5557,7 +5869,10 @@ if __name__ == '__main__':
     # with app.app_context():
     #     db.create_all()
 
-
+    # With debug=True the reloader runs this block twice: a file-watching parent and the
+    # serving child (WERKZEUG_RUN_MAIN=true); background threads belong in the child only
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services(app)
 
     app.run(
         host='0.0.0.0',
@@ -57,15 +57,96 @@ class Config:
     MCQ_GENERATION_TIMEOUT = int(os.getenv('MCQ_GENERATION_TIMEOUT', '30'))
     MCQ_TARGET_TIME = int(os.getenv('MCQ_TARGET_TIME', '10'))
 
+    # Durable MCQ generation job queue (mcq_generation_jobs table)
+    # Start job workers, producer, Ollama monitor and warm-up inside create_app (for servers without
+    # an entrypoint hook); python app.py and gunicorn.conf.py start them per serving process instead
+    START_BACKGROUND_SERVICES = os.getenv('START_BACKGROUND_SERVICES', 'false').lower() == 'true'
+    MCQ_GENERATION_WORKERS = int(os.getenv('MCQ_GENERATION_WORKERS', '2'))  # Worker threads per process, 0 = don't drain jobs here
+    MCQ_GENERATION_LEASE_SECONDS = int(os.getenv('MCQ_GENERATION_LEASE_SECONDS', '120'))
+    MCQ_GENERATION_HEARTBEAT_SECONDS = int(os.getenv('MCQ_GENERATION_HEARTBEAT_SECONDS', '30'))
+    MCQ_GENERATION_POLL_SECONDS = float(os.getenv('MCQ_GENERATION_POLL_SECONDS', '2'))
+    MCQ_GENERATION_MAX_ATTEMPTS = int(os.getenv('MCQ_GENERATION_MAX_ATTEMPTS', '3'))
+    MCQ_GENERATION_RETENTION_HOURS = int(os.getenv('MCQ_GENERATION_RETENTION_HOURS', '24'))  # Finished jobs are purged after this
+    SSE_MAX_STREAM_SECONDS = int(os.getenv('SSE_MAX_STREAM_SECONDS', '300'))  # Longest an SSE response holds a worker thread
+
+    # Per-subject question bank (tests are assembled by reference from pre-generated questions)
+    QUESTION_BANK_ENABLED = os.getenv('QUESTION_BANK_ENABLED', 'true').lower() == 'true'
+    QUESTION_BANK_TARGET_DEPTH = int(os.getenv('QUESTION_BANK_TARGET_DEPTH', '500'))  # Questions kept ready per subject
+    QUESTION_BANK_REFILL_BATCH = int(os.getenv('QUESTION_BANK_REFILL_BATCH', '50'))  # Questions per refill job
+    QUESTION_BANK_CHECK_SECONDS = int(os.getenv('QUESTION_BANK_CHECK_SECONDS', '600'))  # Producer check interval
+
+    # Near-duplicate question detection (MinHash/LSH per subject) before question inserts
+    QUESTION_DEDUP_ENABLED = os.getenv('QUESTION_DEDUP_ENABLED', 'true').lower() == 'true'
+    QUESTION_DEDUP_THRESHOLD = float(os.getenv('QUESTION_DEDUP_THRESHOLD', '0.8'))  # Estimated Jaccard of word 3-grams
+    QUESTION_DEDUP_MAX_PER_SUBJECT = int(os.getenv('QUESTION_DEDUP_MAX_PER_SUBJECT', '50000'))  # Index bound per subject
+    QUESTION_DEDUP_SYNC_SECONDS = int(os.getenv('QUESTION_DEDUP_SYNC_SECONDS', '30'))  # Pull rows saved by other workers
+    QUESTION_DEDUP_MAX_TOPUP_ROUNDS = int(os.getenv('QUESTION_DEDUP_MAX_TOPUP_ROUNDS', '2'))  # Regeneration rounds for dropped duplicates
+
     # Multimodal RAG Configuration (CLIP + ChromaDB + Ollama LLaVA)
     MULTIMODAL_RAG_ENABLED = os.getenv('MULTIMODAL_RAG_ENABLED', 'true').lower() == 'true'
     MULTIMODAL_CHROMADB_PATH = os.getenv('MULTIMODAL_CHROMADB_PATH', os.path.join(os.getcwd(), 'chromadb_data'))
     MULTIMODAL_CLIP_MODEL = os.getenv('MULTIMODAL_CLIP_MODEL', 'openai/clip-vit-base-patch32')
+    MULTIMODAL_CLIP_BACKEND = os.getenv('MULTIMODAL_CLIP_BACKEND', 'torch')  # 'torch', 'torch-int8', 'onnx' or 'onnx-int8'
+    MULTIMODAL_CLIP_THREADS = int(os.getenv('MULTIMODAL_CLIP_THREADS', '0'))  # Intra-op threads per process (0 = runtime default)
+    MULTIMODAL_CLIP_ONNX_PATH = os.getenv('MULTIMODAL_CLIP_ONNX_PATH', os.path.join(os.getcwd(), 'models', 'clip_onnx'))
+    # Shared embedding server (scripts/embedding_server.py): one CLIP copy for all web workers
+    MULTIMODAL_EMBED_SERVER = os.getenv('MULTIMODAL_EMBED_SERVER', '')  # Unix socket path ('' = load CLIP in-process)
+    MULTIMODAL_EMBED_SOCKET_PATH = os.getenv('MULTIMODAL_EMBED_SOCKET_PATH', os.path.join(os.getcwd(), 'run', 'embedding.sock'))  # Server default
+    MULTIMODAL_EMBED_SERVER_AUTHKEY = os.getenv('MULTIMODAL_EMBED_SERVER_AUTHKEY', '')  # Shared secret, required by server and workers
+    MULTIMODAL_EMBED_SERVER_BATCH = int(os.getenv('MULTIMODAL_EMBED_SERVER_BATCH', '64'))  # Max inputs per server forward pass
+    MULTIMODAL_EMBED_MAX_WAIT_MS = float(os.getenv('MULTIMODAL_EMBED_MAX_WAIT_MS', '5'))  # Micro-batching window
+    MULTIMODAL_EMBED_CONNECT_TIMEOUT = float(os.getenv('MULTIMODAL_EMBED_CONNECT_TIMEOUT', '2'))  # Connect + authenticate, per attempt
+    MULTIMODAL_EMBED_REQUEST_TIMEOUT = float(os.getenv('MULTIMODAL_EMBED_REQUEST_TIMEOUT', '30'))  # Max wait for an embedding reply
+    MULTIMODAL_LOAD_RETRY_SECONDS = float(os.getenv('MULTIMODAL_LOAD_RETRY_SECONDS', '10'))  # Fail fast this long after a failed CLIP/vector store load
+    MULTIMODAL_WARMUP_ON_BOOT = os.getenv('MULTIMODAL_WARMUP_ON_BOOT', 'true').lower() == 'true'  # Load CLIP + collections in the background at startup
     MULTIMODAL_OLLAMA_MODEL = os.getenv('MULTIMODAL_OLLAMA_MODEL', 'llava')
     MULTIMODAL_CHUNK_SIZE = int(os.getenv('MULTIMODAL_CHUNK_SIZE', '500'))
     MULTIMODAL_CHUNK_OVERLAP = int(os.getenv('MULTIMODAL_CHUNK_OVERLAP', '100'))
+    MULTIMODAL_CHUNKING = os.getenv('MULTIMODAL_CHUNKING', 'token')  # 'token' (sentence windows sized to CLIP) or 'char'
+    MULTIMODAL_EMBED_MAX_TOKENS = int(os.getenv('MULTIMODAL_EMBED_MAX_TOKENS', '77'))  # CLIP text context length
+    MULTIMODAL_CONTEXT_CHARS = int(os.getenv('MULTIMODAL_CONTEXT_CHARS', '1000'))  # Stored/prompt payload per window
     MULTIMODAL_TOP_K_RETRIEVAL = int(os.getenv('MULTIMODAL_TOP_K_RETRIEVAL', '5'))
+    MULTIMODAL_VECTOR_BACKEND = os.getenv('MULTIMODAL_VECTOR_BACKEND', 'chromadb')  # 'chromadb' or 'mmap' (exact search, shared page cache)
+    MULTIMODAL_MMAP_INDEX_PATH = os.getenv('MULTIMODAL_MMAP_INDEX_PATH', os.path.join(MULTIMODAL_CHROMADB_PATH, 'mmap_index'))
+    MULTIMODAL_VECTOR_DTYPE = os.getenv('MULTIMODAL_VECTOR_DTYPE', 'float16')  # mmap matrix: 'float32', 'float16' or 'int8'
+    MULTIMODAL_MMAP_RETRY_SECONDS = int(os.getenv('MULTIMODAL_MMAP_RETRY_SECONDS', '60'))  # ChromaDB fallback looks for the mmap export again after
+    MULTIMODAL_VECTOR_RESCORE = os.getenv('MULTIMODAL_VECTOR_RESCORE', 'auto').lower()  # Keep float32 copy to re-rank candidates: 'auto' (int8 only), 'true', 'false'
+    MULTIMODAL_RESCORE_FACTOR = int(os.getenv('MULTIMODAL_RESCORE_FACTOR', '4'))  # Candidates per result re-ranked (0 = off)
     MULTIMODAL_BATCH_SIZE = int(os.getenv('MULTIMODAL_BATCH_SIZE', '100'))
+    MULTIMODAL_EMBED_BATCH_SIZE = int(os.getenv('MULTIMODAL_EMBED_BATCH_SIZE', '32'))  # Texts per CLIP forward pass
+    MULTIMODAL_IMAGE_BATCH_SIZE = int(os.getenv('MULTIMODAL_IMAGE_BATCH_SIZE', '16'))  # Images per CLIP forward pass
+    MULTIMODAL_IMAGE_DECODE_WORKERS = int(os.getenv('MULTIMODAL_IMAGE_DECODE_WORKERS', '4'))  # Threads for PIL decode/base64
+    MULTIMODAL_PARSE_WORKERS = int(os.getenv('MULTIMODAL_PARSE_WORKERS', str(max(1, (os.cpu_count() or 2) - 1))))  # Processes parsing PDF pages
+    MULTIMODAL_PARSE_PAGES_PER_TASK = int(os.getenv('MULTIMODAL_PARSE_PAGES_PER_TASK', '8'))
+    MULTIMODAL_PIPELINE_QUEUE_SIZE = int(os.getenv('MULTIMODAL_PIPELINE_QUEUE_SIZE', '8'))  # Max items buffered between stages
+    MULTIMODAL_IMAGE_CACHE_SIZE = int(os.getenv('MULTIMODAL_IMAGE_CACHE_SIZE', '256'))  # Images kept in memory per worker
+    MULTIMODAL_INDEX_METADATA_PATH = os.getenv('MULTIMODAL_INDEX_METADATA_PATH', os.path.join(os.getcwd(), 'pdfs', 'index_metadata.json'))
+    MULTIMODAL_MCQ_CONTEXT_POOL = int(os.getenv('MULTIMODAL_MCQ_CONTEXT_POOL', '50'))  # Docs retrieved once per test, split across chunks
+    # Max MCQ chunk requests one test submits at once; OllamaPool caps every host at OLLAMA_NUM_PARALLEL across tests
+    MULTIMODAL_MAX_PARALLEL_CHUNKS = int(os.getenv('MULTIMODAL_MAX_PARALLEL_CHUNKS', os.getenv('OLLAMA_NUM_PARALLEL', '4')))
+    MULTIMODAL_RETRIEVAL_WORKERS = int(os.getenv('MULTIMODAL_RETRIEVAL_WORKERS', '8'))  # Concurrent collection queries per retrieval
+    # Query embedding cache (normalized query text -> CLIP vector)
+    MULTIMODAL_QUERY_CACHE_SIZE = int(os.getenv('MULTIMODAL_QUERY_CACHE_SIZE', '1024'))  # 0 disables the cache
+    MULTIMODAL_QUERY_CACHE_TTL = int(os.getenv('MULTIMODAL_QUERY_CACHE_TTL', '86400'))  # seconds, 0 = no expiry
+    MULTIMODAL_QUERY_CACHE_DISK_PATH = os.getenv('MULTIMODAL_QUERY_CACHE_DISK_PATH', '')  # optional SQLite file shared by workers
+    # Semantic chatbot response cache (CLIP query embedding -> answer, invalidated on re-index)
+    CHAT_RESPONSE_CACHE_SIZE = int(os.getenv('CHAT_RESPONSE_CACHE_SIZE', '2048'))  # 0 disables the cache
+    CHAT_RESPONSE_CACHE_TTL = int(os.getenv('CHAT_RESPONSE_CACHE_TTL', '86400'))  # seconds, 0 = no expiry
+    CHAT_RESPONSE_CACHE_THRESHOLD = float(os.getenv('CHAT_RESPONSE_CACHE_THRESHOLD', '0.95'))  # min cosine similarity
+    CHAT_RESPONSE_CACHE_VERSION_SECONDS = int(os.getenv('CHAT_RESPONSE_CACHE_VERSION_SECONDS', '5'))  # collection version check interval
+    MULTIMODAL_STRUCTURED_OUTPUT = os.getenv('MULTIMODAL_STRUCTURED_OUTPUT', 'true').lower() == 'true'  # JSON schema via Ollama format (server >= 0.5)
+    MULTIMODAL_MCQ_CHUNK_RETRIES = int(os.getenv('MULTIMODAL_MCQ_CHUNK_RETRIES', '1'))  # Re-generations of a chunk with no valid questions
+    # Ollama hosts (comma-separated); chat calls go to the least-loaded healthy host with the model
+    OLLAMA_HOSTS = [h.strip() for h in os.getenv('OLLAMA_HOSTS', os.getenv('AI_OLLAMA_BASE_URL', 'http://localhost:11434')).split(',') if h.strip()] or ['http://localhost:11434']
+    OLLAMA_BASE_URL = OLLAMA_HOSTS[0]
+    OLLAMA_POOL_EVICT_SECONDS = int(os.getenv('OLLAMA_POOL_EVICT_SECONDS', '10'))  # Min time a failed host stays out
+    OLLAMA_REQUEST_TIMEOUT = float(os.getenv('OLLAMA_REQUEST_TIMEOUT', '300'))
+    OLLAMA_NUM_PARALLEL = int(os.getenv('OLLAMA_NUM_PARALLEL', '4'))  # Max requests in flight per host (process-wide)
+    # Ollama health monitor (background probes of every host, served from a cached snapshot)
+    OLLAMA_HEALTH_PROBE_SECONDS = int(os.getenv('OLLAMA_HEALTH_PROBE_SECONDS', '10'))
+    OLLAMA_HEALTH_DOWN_PROBE_SECONDS = int(os.getenv('OLLAMA_HEALTH_DOWN_PROBE_SECONDS', '2'))  # Faster while the server is down
+    OLLAMA_HEALTH_TIMEOUT = float(os.getenv('OLLAMA_HEALTH_TIMEOUT', '2'))
+    OLLAMA_HEALTH_MAX_AGE = int(os.getenv('OLLAMA_HEALTH_MAX_AGE', '30'))  # Older snapshots are reported unhealthy
     MULTIMODAL_ENABLE_IMAGE_PROCESSING = os.getenv('MULTIMODAL_ENABLE_IMAGE_PROCESSING', 'true').lower() == 'true'
 
     # Performance Configuration
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for the Jishu backend
+
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Streaming endpoints (chat with "stream": true, /generation-stream) keep their request
+open for the whole answer or generation run. A sync worker is blocked by one open
+stream, so workers use the gthread class: every request gets its own thread and the
+worker heartbeat is not tied to request length. Keep GUNICORN_THREADS above the
+number of concurrent streams expected per worker; SSE_MAX_STREAM_SECONDS bounds how
+long any one stream holds its thread.
+
+Background threads (MCQ job workers, question bank producer, Ollama monitor, model
+warm-up) are started in each worker by post_worker_init, after the fork, so --preload
+is safe and every worker runs exactly one set.
+"""
+
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+
+def post_worker_init(worker):
+    from app import start_background_services
+    start_background_services(worker.wsgi)
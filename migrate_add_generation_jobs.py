@@ -0,0 +1,61 @@
+"""
+Migration script to add the mcq_generation_jobs table (durable MCQ generation queue)
+"""
+
+import os
+import sys
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Don't start generation workers in the migration process
+os.environ.setdefault('MCQ_GENERATION_WORKERS', '0')
+
+from shared.models.user import db
+from shared.models.purchase import MCQGenerationJob
+from app import create_app
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def migrate_add_generation_jobs():
+    """Create the mcq_generation_jobs table (works on MySQL and SQLite)"""
+
+    app = create_app()
+
+    with app.app_context():
+        logger.info("=" * 70)
+        logger.info("🚀 Adding MCQ Generation Jobs Table")
+        logger.info("=" * 70)
+
+        try:
+            inspector = db.inspect(db.engine)
+            if inspector.has_table(MCQGenerationJob.__tablename__):
+                logger.info("✅ mcq_generation_jobs table already exists")
+                return True
+
+            MCQGenerationJob.__table__.create(db.engine, checkfirst=True)
+            logger.info("✅ mcq_generation_jobs table created")
+
+            columns = [column['name'] for column in db.inspect(db.engine).get_columns(MCQGenerationJob.__tablename__)]
+            logger.info(f"\n✅ Verified columns: {columns}")
+
+            logger.info("\n" + "=" * 70)
+            logger.info("✅ Migration completed successfully!")
+            logger.info("=" * 70)
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Migration failed: {e}")
+            return False
+
+
+if __name__ == "__main__":
+    logger.info("Starting migration...")
+    success = migrate_add_generation_jobs()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,69 @@
+"""
+Migration script to add the question bank mapping table (mock_test_questions)
+"""
+
+import os
+import sys
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Don't start generation workers or the bank producer in the migration process
+os.environ.setdefault('MCQ_GENERATION_WORKERS', '0')
+
+from shared.models.user import db
+from shared.models.purchase import MockTestQuestion, MCQGenerationJob
+from app import create_app
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def migrate_add_question_bank():
+    """Create mock_test_questions and allow job rows without a user (bank refill jobs)"""
+
+    app = create_app()
+
+    with app.app_context():
+        logger.info("=" * 70)
+        logger.info("🚀 Adding Question Bank Tables")
+        logger.info("=" * 70)
+
+        try:
+            inspector = db.inspect(db.engine)
+
+            if inspector.has_table(MockTestQuestion.__tablename__):
+                logger.info("✅ mock_test_questions table already exists")
+            else:
+                MockTestQuestion.__table__.create(db.engine, checkfirst=True)
+                logger.info("✅ mock_test_questions table created")
+
+            if not inspector.has_table(MCQGenerationJob.__tablename__):
+                MCQGenerationJob.__table__.create(db.engine, checkfirst=True)
+                logger.info("✅ mcq_generation_jobs table created")
+            elif db.engine.dialect.name == 'mysql':
+                user_id = next(c for c in inspector.get_columns(MCQGenerationJob.__tablename__) if c['name'] == 'user_id')
+                if not user_id['nullable']:
+                    logger.info("Making mcq_generation_jobs.user_id nullable...")
+                    with db.engine.begin() as connection:
+                        connection.execute(db.text("ALTER TABLE mcq_generation_jobs MODIFY user_id INT NULL"))
+                    logger.info("✅ mcq_generation_jobs.user_id is nullable")
+
+            logger.info("\n" + "=" * 70)
+            logger.info("✅ Migration completed successfully!")
+            logger.info("=" * 70)
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Migration failed: {e}")
+            return False
+
+
+if __name__ == "__main__":
+    logger.info("Starting migration...")
+    success = migrate_add_question_bank()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark CLIP inference backends (MULTIMODAL_CLIP_BACKEND)
+
+Each backend runs in its own subprocess so thread pools and memory don't interfere.
+For each backend it reports:
+    load_s        : time to load (and on first run export/quantize) the model
+    query p50/p95 : latency of a single-text embedding (the chat / MCQ hot path)
+    texts/s       : batched text throughput (MULTIMODAL_EMBED_BATCH_SIZE per call)
+    images/s      : batched image throughput (MULTIMODAL_IMAGE_BATCH_SIZE per call)
+    cos min/mean  : cosine similarity to PyTorch fp32 embeddings of the same inputs
+    RSS MB        : resident memory of the process after the run
+
+Usage:
+    python scripts/benchmark_clip_backends.py [--backends torch,torch-int8,onnx,onnx-int8] [--threads 4]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import Config
+from shared.services.clip_backends import CLIP_BACKENDS
+
+SENTENCES = [
+    "What is the SI unit of electric charge",
+    "Explain the photoelectric effect and the work function of a metal surface",
+    "Which of the following compounds shows geometrical isomerism",
+    "Calculate the molarity of a solution containing 4 g of NaOH in 250 mL",
+    "State the law of conservation of linear momentum",
+    "Describe the structure of DNA and the role of hydrogen bonds between base pairs",
+    "Integrate e to the power x times cos x",
+    "Define the enthalpy of formation",
+]
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB (Linux /proc, else peak RSS)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_inputs(num_texts: int, num_images: int, seed: int = 11):
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    texts = [f"{SENTENCES[i % len(SENTENCES)]} ({i})" for i in range(num_texts)]
+    images = [Image.fromarray(rng.integers(0, 256, size=(224, 224, 3), dtype=np.uint8)) for _ in range(num_images)]
+    return texts, images
+
+
+def run_backend(backend: str, threads: int, num_queries: int, num_texts: int, num_images: int) -> dict:
+    """Benchmark one backend in this process (called in a subprocess)"""
+    from shared.services.clip_backends import load_clip_backend
+
+    started = time.perf_counter()
+    clip = load_clip_backend(backend, Config.MULTIMODAL_CLIP_MODEL, onnx_root=Config.MULTIMODAL_CLIP_ONNX_PATH,
+                             num_threads=threads)
+    load_seconds = time.perf_counter() - started
+    texts, images = make_inputs(num_texts, num_images)
+
+    clip.text_features(texts[:1])  # Warm-up
+    latencies = []
+    for i in range(num_queries):
+        started = time.perf_counter()
+        clip.text_features([texts[i % len(texts)]])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    batch = Config.MULTIMODAL_EMBED_BATCH_SIZE
+    started = time.perf_counter()
+    text_features = np.concatenate([clip.text_features(texts[i:i + batch]) for i in range(0, len(texts), batch)])
+    text_seconds = time.perf_counter() - started
+
+    batch = Config.MULTIMODAL_IMAGE_BATCH_SIZE
+    started = time.perf_counter()
+    image_features = np.concatenate([clip.image_features(images[i:i + batch]) for i in range(0, len(images), batch)])
+    image_seconds = time.perf_counter() - started
+
+    latencies = np.array(latencies)
+    return {
+        'backend': clip.name,
+        'load_s': round(load_seconds, 2),
+        'query_p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'query_p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'texts_per_s': round(len(texts) / text_seconds, 1),
+        'images_per_s': round(len(images) / image_seconds, 1),
+        'rss_mb': round(rss_mb(), 1),
+        'text_features': text_features.tolist(),
+        'image_features': image_features.tolist()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CLIP inference backends')
+    parser.add_argument('--backends', default=','.join(CLIP_BACKENDS), help='Comma-separated backends')
+    parser.add_argument('--threads', type=int, default=Config.MULTIMODAL_CLIP_THREADS,
+                        help='Intra-op threads (0 = runtime default)')
+    parser.add_argument('--queries', type=int, default=200, help='Single-text queries timed')
+    parser.add_argument('--texts', type=int, default=256, help='Texts embedded in batches')
+    parser.add_argument('--images', type=int, default=64, help='Images embedded in batches')
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--only', choices=CLIP_BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.only:
+        print(json.dumps(run_backend(args.only, args.threads, args.queries, args.texts, args.images)))
+        return 0
+
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    if 'torch' not in backends:
+        backends.insert(0, 'torch')  # fp32 reference for the parity columns
+
+    reports = {}
+    for backend in backends:
+        command = [sys.executable, os.path.abspath(__file__), '--only', backend, '--threads', str(args.threads),
+                   '--queries', str(args.queries), '--texts', str(args.texts), '--images', str(args.images)]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"⚠️ {backend} failed:\n{result.stderr.strip()[-2000:]}")
+            continue
+        reports[backend] = json.loads(result.stdout.strip().splitlines()[-1])
+
+    if 'torch' not in reports:
+        print("❌ PyTorch fp32 reference failed; nothing to compare")
+        return 1
+
+    reference_text = np.asarray(reports['torch']['text_features'])
+    reference_image = np.asarray(reports['torch']['image_features'])
+    print(f"\n🧪 CLIP backends ({Config.MULTIMODAL_CLIP_MODEL}, threads={args.threads or 'default'})")
+    print(f"   {'backend':<11} {'load_s':>7} {'p50 ms':>7} {'p95 ms':>7} {'texts/s':>8} {'images/s':>9} "
+          f"{'cos min':>8} {'cos mean':>9} {'RSS MB':>8}")
+    summary = {}
+    for backend, r in reports.items():
+        cosines = np.concatenate([
+            (np.asarray(r.pop('text_features')) * reference_text).sum(axis=1),
+            (np.asarray(r.pop('image_features')) * reference_image).sum(axis=1)
+        ])
+        r['cos_min'] = round(float(cosines.min()), 5)
+        r['cos_mean'] = round(float(cosines.mean()), 5)
+        summary[backend] = r
+        print(f"   {backend:<11} {r['load_s']:>7.2f} {r['query_p50_ms']:>7.2f} {r['query_p95_ms']:>7.2f} "
+              f"{r['texts_per_s']:>8.1f} {r['images_per_s']:>9.1f} {r['cos_min']:>8.4f} {r['cos_mean']:>9.4f} "
+              f"{r['rss_mb']:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
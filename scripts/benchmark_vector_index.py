@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark vector index backends: ChromaDB vs memory-mapped float16 matrix
+
+Each backend runs in its own subprocess so resident memory (RSS) is measured in
+isolation. Queries are stored vectors plus Gaussian noise (no CLIP model needed), so
+both backends answer the same query set; top-k agreement with ChromaDB is reported.
+Export the collections first with scripts/export_mmap_index.py.
+
+Usage:
+    python scripts/benchmark_vector_index.py [--collection physics] [--queries 500] [--k 5]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import Config
+
+BACKENDS = ('chromadb', 'mmap')
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB (Linux /proc, else peak RSS)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_queries(collection: str, num_queries: int, noise: float, seed: int = 3) -> np.ndarray:
+    """Noisy copies of random stored vectors, unit-normalized"""
+    from shared.services.vector_index import export_data_dir
+    directory = export_data_dir(os.path.join(Config.MULTIMODAL_MMAP_INDEX_PATH, collection))
+    vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r')
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vectors), size=num_queries)
+    stored = vectors[picks].astype(np.float32)
+    if os.path.exists(os.path.join(directory, 'scales.npy')):  # int8 export
+        stored *= np.load(os.path.join(directory, 'scales.npy'))[picks, None]
+    queries = stored + rng.normal(0, noise, size=(num_queries, vectors.shape[1]))
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def run_backend(backend: str, collection: str, num_queries: int, k: int, noise: float, where) -> dict:
+    """Time one backend in this process (called in a subprocess)"""
+    baseline_rss = rss_mb()
+    queries = make_queries(collection, num_queries, noise)
+
+    import chromadb
+    from shared.services.vector_index import open_vector_index
+    client = chromadb.PersistentClient(path=Config.MULTIMODAL_CHROMADB_PATH)
+    index = open_vector_index(backend, client.get_collection(collection), Config.MULTIMODAL_MMAP_INDEX_PATH)
+
+    # Warm-up (HNSW load / page cache)
+    index.query(queries[0].tolist(), k, where)
+
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        docs = index.query(query.tolist(), k, where)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([doc['id'] for doc in docs])
+
+    latencies = np.array(latencies)
+    return {
+        'backend': type(index).__name__,
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'mean_ms': round(float(latencies.mean()), 3),
+        'rss_mb': round(rss_mb() - baseline_rss, 1),
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ChromaDB vs mmap vector index')
+    parser.add_argument('--collection', help='Only this collection (default: every exported one)')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=Config.MULTIMODAL_TOP_K_RETRIEVAL)
+    parser.add_argument('--noise', type=float, default=0.02, help='Query noise std per dimension')
+    parser.add_argument('--where', help='Metadata filter as JSON, e.g. \'{"type": "text"}\'')
+    parser.add_argument('--only', choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    where = json.loads(args.where) if args.where else None
+
+    if args.only:
+        print(json.dumps(run_backend(args.only, args.collection, args.queries, args.k, args.noise, where)))
+        return 0
+
+    index_root = Config.MULTIMODAL_MMAP_INDEX_PATH
+    collections = [args.collection] if args.collection else sorted(
+        name for name in os.listdir(index_root) if os.path.isfile(os.path.join(index_root, name, 'manifest.json'))
+    ) if os.path.isdir(index_root) else []
+    if not collections:
+        print(f"⚠️ No mmap indexes in {index_root}; run scripts/export_mmap_index.py first")
+        return 1
+
+    for collection in collections:
+        reports = {}
+        for backend in BACKENDS:
+            command = [sys.executable, os.path.abspath(__file__), '--only', backend, '--collection', collection,
+                       '--queries', str(args.queries), '--k', str(args.k), '--noise', str(args.noise)]
+            if args.where:
+                command += ['--where', args.where]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            reports[backend] = json.loads(output.strip().splitlines()[-1])
+
+        agreement = np.mean([
+            len(set(a) & set(b)) / max(1, len(a))
+            for a, b in zip(reports['chromadb']['results'], reports['mmap']['results'])
+        ])
+
+        print(f"\n📚 {collection} ({args.queries} queries, k={args.k})")
+        print(f"   {'backend':<20} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'RSS MB':>8}")
+        for backend in BACKENDS:
+            r = reports[backend]
+            print(f"   {r['backend']:<20} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['mean_ms']:>8.3f} {r['rss_mb']:>8.1f}")
+        print(f"   top-{args.k} agreement (mmap vs ChromaDB): {agreement:.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Compare character chunking with token-window chunking on the bundled subject PDFs
+
+For each subject and strategy it reports:
+    chunks         : number of text chunks stored
+    truncated      : share of chunk tokens past CLIP's limit (never embedded)
+    redundancy     : stored characters per distinct page character (overlap between chunks)
+    embed_s        : wall time to embed every chunk with CLIP
+    hit@k / mrr    : retrieval quality - sentences sampled from the PDFs are used as
+                     queries; a hit is a top-k chunk whose stored content contains the
+                     sentence (what the LLM prompt would receive)
+    prompt_dup     : share of top-k content characters that merge_overlapping_chunks
+                     removes as duplicates before the prompt is built
+
+Usage:
+    python scripts/compare_chunking.py [--subject physics] [--queries 100] [--k 5] [--max-pages 40] [--json out.json]
+    python scripts/compare_chunking.py --no-embed    # chunk statistics only, no CLIP
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from config import Config
+from shared.services.pdf_page_parser import chunk_page_text, get_token_counter, merge_overlapping_chunks, split_sentences
+
+STRATEGIES = ('char', 'token')
+
+
+def load_page_texts(subject_dir: str, max_pages: int):
+    """Text of every page of every PDF in a subject folder (up to max_pages per PDF)"""
+    texts = []
+    for pdf_file in sorted(os.listdir(subject_dir)):
+        if not pdf_file.lower().endswith('.pdf'):
+            continue
+        with fitz.open(os.path.join(subject_dir, pdf_file)) as doc:
+            for i, page in enumerate(doc):
+                if max_pages and i >= max_pages:
+                    break
+                text = page.get_text()
+                if text.strip():
+                    texts.append(text)
+    return texts
+
+
+def sample_queries(page_texts, num_queries: int, seed: int = 7):
+    """Sample mid-length sentences to use as retrieval queries"""
+    sentences = [s for text in page_texts for s in split_sentences(text) if 8 <= len(s.split()) <= 30]
+    random.Random(seed).shuffle(sentences)
+    return sentences[:num_queries]
+
+
+def evaluate(strategy: str, page_texts, queries, query_embeddings, k: int, count_tokens, embed_texts):
+    """Chunk, embed and score one strategy (chunk statistics only when embed_texts is None)"""
+    chunks = [(page, window, content, span) for page, text in enumerate(page_texts)
+              for window, content, span in chunk_page_text(
+                  text, Config.MULTIMODAL_CHUNK_SIZE, Config.MULTIMODAL_CHUNK_OVERLAP, strategy)]
+    windows = [window for _, window, _, _ in chunks]
+    docs = [{"content": content, "collection": "",
+             "metadata": {"type": "text", "pdf_file": "", "page": page, "span_start": span[0], "span_end": span[1]}}
+            for page, _, content, span in chunks]
+
+    token_counts = count_tokens(windows)
+    limit = Config.MULTIMODAL_EMBED_MAX_TOKENS - 2
+    total_tokens = sum(token_counts)
+    truncated = sum(max(0, n - limit) for n in token_counts)
+
+    # Stored characters per distinct page character (1.0 = no text stored twice)
+    stored_chars = sum(len(doc["content"]) for doc in docs)
+    distinct_chars = sum(len(doc["content"]) for doc in merge_overlapping_chunks(docs))
+
+    row = {
+        'strategy': strategy,
+        'chunks': len(chunks),
+        'avg_content_chars': round(stored_chars / max(1, len(chunks)), 1),
+        'truncated_token_share': round(truncated / total_tokens, 4) if total_tokens else 0.0,
+        'stored_redundancy': round(stored_chars / max(1, distinct_chars), 2)
+    }
+    if embed_texts is None:
+        return row
+
+    started = time.time()
+    embeddings = embed_texts(windows)
+    row['embed_seconds'] = round(time.time() - started, 2)
+
+    scores = query_embeddings @ embeddings.T
+    hits, reciprocal_ranks, prompt_chars, duplicate_chars = 0, 0.0, 0, 0
+    for query, scored in zip(queries, scores):
+        top = [docs[idx] for idx in np.argsort(-scored)[:k]]
+        merged = merge_overlapping_chunks(top)
+        raw = sum(len(doc["content"]) for doc in top)
+        prompt_chars += raw
+        duplicate_chars += raw - sum(len(doc["content"]) for doc in merged)
+        # Normalize whitespace so sentence containment works for both strategies
+        for rank, doc in enumerate(top, start=1):
+            if query in " ".join(doc["content"].split()):
+                hits += 1
+                reciprocal_ranks += 1.0 / rank
+                break
+
+    row[f'hit@{k}'] = round(hits / max(1, len(queries)), 4)
+    row['mrr'] = round(reciprocal_ranks / max(1, len(queries)), 4)
+    row['prompt_duplicate_share'] = round(duplicate_chars / max(1, prompt_chars), 4)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare char vs token-window chunking')
+    parser.add_argument('--pdf-root', default=os.path.join('pdfs', 'subjects'))
+    parser.add_argument('--subject', help='Only this subject folder')
+    parser.add_argument('--queries', type=int, default=100, help='Sampled query sentences per subject')
+    parser.add_argument('--k', type=int, default=Config.MULTIMODAL_TOP_K_RETRIEVAL)
+    parser.add_argument('--max-pages', type=int, default=0, help='Pages per PDF (0 = all)')
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--no-embed', action='store_true', help='Only report chunk statistics (no CLIP)')
+    args = parser.parse_args()
+
+    embed_texts = None
+    if not args.no_embed:
+        # Loads CLIP; imported here so --help stays fast
+        from shared.services.multimodal_rag_service import embed_texts
+
+    count_tokens = get_token_counter()
+    subjects = [args.subject] if args.subject else sorted(
+        d for d in os.listdir(args.pdf_root) if os.path.isdir(os.path.join(args.pdf_root, d))
+    )
+
+    report = {}
+    for subject in subjects:
+        page_texts = load_page_texts(os.path.join(args.pdf_root, subject), args.max_pages)
+        queries = sample_queries(page_texts, args.queries)
+        if not queries:
+            print(f"⚠️ {subject}: no text found, skipped")
+            continue
+        query_embeddings = embed_texts(queries) if embed_texts else None
+
+        report[subject] = [
+            evaluate(strategy, page_texts, queries, query_embeddings, args.k, count_tokens, embed_texts)
+            for strategy in STRATEGIES
+        ]
+
+        print(f"\n📚 {subject} ({len(page_texts)} pages, {len(queries)} queries)")
+        header = f"   {'strategy':<8} {'chunks':>7} {'truncated':>10} {'redundancy':>11}"
+        if embed_texts:
+            header += f" {'embed_s':>8} {'hit@' + str(args.k):>7} {'mrr':>7} {'prompt_dup':>11}"
+        print(header)
+        for row in report[subject]:
+            line = (f"   {row['strategy']:<8} {row['chunks']:>7} {row['truncated_token_share']:>10.1%} "
+                    f"{row['stored_redundancy']:>11.2f}")
+            if embed_texts:
+                line += (f" {row['embed_seconds']:>8.2f} {row[f'hit@{args.k}']:>7.3f} {row['mrr']:>7.3f} "
+                         f"{row['prompt_duplicate_share']:>11.1%}")
+            print(line)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
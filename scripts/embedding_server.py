@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Run the shared CLIP embedding server for all web workers
+
+Loads one CLIP backend (MULTIMODAL_CLIP_BACKEND / MULTIMODAL_CLIP_THREADS) and serves
+micro-batched embed requests on a Unix socket. Point the web workers at it with
+MULTIMODAL_EMBED_SERVER=<socket path>; they then load no CLIP weights of their own.
+
+Usage:
+    python scripts/embedding_server.py [--socket PATH] [--max-batch 64] [--max-wait-ms 5]
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from shared.services.clip_backends import load_clip_backend
+from shared.services.embedding_server import EmbeddingServer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared CLIP embedding server')
+    parser.add_argument('--socket', default=Config.MULTIMODAL_EMBED_SERVER or Config.MULTIMODAL_EMBED_SOCKET_PATH,
+                        help='Unix socket path')
+    parser.add_argument('--max-batch', type=int, default=Config.MULTIMODAL_EMBED_SERVER_BATCH,
+                        help='Max inputs per forward pass')
+    parser.add_argument('--max-wait-ms', type=float, default=Config.MULTIMODAL_EMBED_MAX_WAIT_MS,
+                        help='Max wait for concurrent requests to join a batch')
+    args = parser.parse_args()
+
+    if not Config.MULTIMODAL_EMBED_SERVER_AUTHKEY:
+        logger.error("❌ Set MULTIMODAL_EMBED_SERVER_AUTHKEY (the same secret in the web workers) to start the server")
+        return 1
+
+    backend = load_clip_backend(Config.MULTIMODAL_CLIP_BACKEND, Config.MULTIMODAL_CLIP_MODEL,
+                                onnx_root=Config.MULTIMODAL_CLIP_ONNX_PATH,
+                                num_threads=Config.MULTIMODAL_CLIP_THREADS)
+    backend.text_features(["warm up"])
+
+    server = EmbeddingServer(backend, args.socket, Config.MULTIMODAL_EMBED_SERVER_AUTHKEY.encode(),
+                             max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    logger.info(f"   Set MULTIMODAL_EMBED_SERVER={args.socket} for the web workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("👋 Embedding server stopped")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Measure recall and footprint of quantized mmap vector storage against float32
+
+Each collection is exported to temporary index directories in every storage mode and
+queried with the same query set. Queries are stored vectors plus Gaussian noise (no CLIP
+model needed); the ground truth is the exact float32 top-k.
+
+For each mode it reports:
+    scan MB    : size of the matrix scanned per query (vectors + int8 scales)
+    disk MB    : size of the whole index directory (including the float32 rescore copy)
+    recall@k   : share of the float32 top-k found by the mode
+    p50 / p95  : query latency in ms
+
+Usage:
+    python scripts/evaluate_quantization.py [--collection physics] [--queries 500] [--k 5] [--rescore-factor 4]
+    python scripts/evaluate_quantization.py --synthetic 20000   # clustered random vectors, no ChromaDB
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import Config
+from shared.services.vector_index import (
+    MmapVectorIndex, SCALES_FILE, VECTORS_FILE, export_chroma_collection, export_data_dir
+)
+
+# (label, dtype, rescore)
+MODES = (
+    ('float32', 'float32', False),
+    ('float16', 'float16', False),
+    ('float16+rescore', 'float16', True),
+    ('int8', 'int8', False),
+    ('int8+rescore', 'int8', True),
+)
+
+
+class SyntheticCollection:
+    """
+    In-memory stand-in for a ChromaDB collection (the part export_chroma_collection reads)
+
+    Vectors are drawn around a few hundred cluster centres sharing a common offset, like
+    CLIP embeddings of one subject, so nearest neighbours are much closer than in
+    isotropic random data and quantization error is more likely to reorder them.
+    """
+
+    def __init__(self, name: str, size: int, dim: int = 512, clusters: int = 200, seed: int = 5):
+        rng = np.random.default_rng(seed)
+        offset = rng.normal(size=dim)
+        centres = offset + rng.normal(size=(clusters, dim))
+        vectors = centres[rng.integers(0, clusters, size=size)] + rng.normal(0, 0.35, size=(size, dim))
+        self.name = name
+        self.vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+    def count(self) -> int:
+        return len(self.vectors)
+
+    def get(self, limit: int, offset: int, include=None) -> dict:
+        rows = range(offset, min(offset + limit, len(self.vectors)))
+        return {
+            "ids": [f"doc_{i}" for i in rows],
+            "embeddings": [self.vectors[i] for i in rows],
+            "documents": ["" for _ in rows],
+            "metadatas": [{"type": "text", "page": 0} for _ in rows]
+        }
+
+
+def directory_mb(directory: str, names=None) -> float:
+    """Size of the files of an index directory in MB (only ``names`` when given)"""
+    total = 0
+    for name in os.listdir(directory):
+        if names is None or name in names:
+            total += os.path.getsize(os.path.join(directory, name))
+    return total / 1e6
+
+
+def make_queries(vectors: np.ndarray, num_queries: int, noise: float, seed: int = 3) -> np.ndarray:
+    """Noisy copies of random stored vectors, unit-normalized"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vectors), size=num_queries)
+    queries = vectors[picks] + rng.normal(0, noise, size=(num_queries, vectors.shape[1]))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def evaluate_mode(directory: str, queries: np.ndarray, truth, k: int, rescore: bool, rescore_factor: int) -> dict:
+    """Query one exported index and compare with the float32 top-k"""
+    index = MmapVectorIndex(directory, rescore_factor if rescore else 0)
+    index.query(queries[0].tolist(), k)  # Warm-up (page cache)
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        docs = index.query(query.tolist(), k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(expected & {doc['id'] for doc in docs}) / max(1, len(expected)))
+
+    latencies = np.array(latencies)
+    return {
+        'scan_mb': round(directory_mb(export_data_dir(directory), {VECTORS_FILE, SCALES_FILE}), 2),
+        'disk_mb': round(directory_mb(export_data_dir(directory)), 2),
+        f'recall@{k}': round(float(np.mean(recalls)), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate float16/int8 vector storage against float32')
+    parser.add_argument('--collection', help='Only this collection (default: all)')
+    parser.add_argument('--chromadb', default=Config.MULTIMODAL_CHROMADB_PATH, help='ChromaDB persistent path')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=Config.MULTIMODAL_TOP_K_RETRIEVAL)
+    parser.add_argument('--noise', type=float, default=0.02, help='Query noise std per dimension')
+    parser.add_argument('--rescore-factor', type=int, default=Config.MULTIMODAL_RESCORE_FACTOR or 4)
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Evaluate a synthetic collection of this many clustered vectors instead of ChromaDB')
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        synthetic = SyntheticCollection('synthetic', args.synthetic)
+        names = [synthetic.name]
+        get_collection = lambda name: synthetic
+    else:
+        import chromadb
+        client = chromadb.PersistentClient(path=args.chromadb)
+        names = [args.collection] if args.collection else sorted(c.name for c in client.list_collections())
+        get_collection = client.get_collection
+    if not names:
+        print("⚠️ No collections found")
+        return 1
+
+    report = {}
+    work_root = tempfile.mkdtemp(prefix='quantization_eval_')
+    try:
+        for name in names:
+            collection = get_collection(name)
+            if collection.count() == 0:
+                continue
+
+            exported = {}
+            for label, dtype, rescore in MODES:
+                mode_root = os.path.join(work_root, label)
+                export_chroma_collection(collection, mode_root, dtype=dtype, rescore=rescore)
+                exported[label] = os.path.join(mode_root, name)
+
+            baseline = np.load(os.path.join(export_data_dir(exported['float32']), VECTORS_FILE))
+            queries = make_queries(baseline, args.queries, args.noise)
+            baseline_index = MmapVectorIndex(exported['float32'])
+            truth = [{doc['id'] for doc in baseline_index.query(query.tolist(), args.k)} for query in queries]
+
+            report[name] = {
+                label: evaluate_mode(exported[label], queries, truth, args.k, rescore, args.rescore_factor)
+                for label, _, rescore in MODES
+            }
+
+            print(f"\n📚 {name} ({len(baseline)} vectors, {len(queries)} queries, k={args.k})")
+            print(f"   {'mode':<16} {'scan MB':>8} {'disk MB':>8} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p95 ms':>8}")
+            for label, row in report[name].items():
+                print(f"   {label:<16} {row['scan_mb']:>8.2f} {row['disk_mb']:>8.2f} {row[f'recall@{args.k}']:>9.4f} "
+                      f"{row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f}")
+    finally:
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
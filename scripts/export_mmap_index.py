@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Export ChromaDB collections to memory-mapped vector indexes (MULTIMODAL_VECTOR_BACKEND=mmap)
+
+Reads embeddings, documents and metadata straight from the persistent ChromaDB store
+(no CLIP model is loaded) and writes one index directory per collection.
+
+Usage:
+    python scripts/export_mmap_index.py [--collection physics] [--chromadb PATH] [--out PATH]
+                                        [--dtype float32|float16|int8] [--rescore auto|true|false]
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chromadb
+
+from config import Config
+from shared.services.vector_index import RESCORE_MODES, VECTOR_DTYPES, export_chroma_collection, rescore_enabled
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export ChromaDB collections to mmap vector indexes')
+    parser.add_argument('--collection', help='Only export this collection')
+    parser.add_argument('--chromadb', default=Config.MULTIMODAL_CHROMADB_PATH, help='ChromaDB persistent path')
+    parser.add_argument('--out', default=Config.MULTIMODAL_MMAP_INDEX_PATH, help='Index root directory')
+    parser.add_argument('--dtype', choices=VECTOR_DTYPES, default=Config.MULTIMODAL_VECTOR_DTYPE,
+                        help='Storage of the scanned matrix')
+    parser.add_argument('--rescore', choices=RESCORE_MODES, default=Config.MULTIMODAL_VECTOR_RESCORE,
+                        help='Keep float32 vectors to re-rank candidates (auto: int8 exports only)')
+    parser.add_argument('--no-rescore', dest='rescore', action='store_const', const='false',
+                        help='Same as --rescore false (smallest disk footprint)')
+    args = parser.parse_args()
+    rescore = rescore_enabled(args.rescore, args.dtype)
+
+    client = chromadb.PersistentClient(path=args.chromadb)
+    names = [args.collection] if args.collection else [c.name for c in client.list_collections()]
+    if not names:
+        logger.warning("⚠️ No collections found")
+        return 1
+
+    os.makedirs(args.out, exist_ok=True)
+    for name in names:
+        manifest = export_chroma_collection(client.get_collection(name), args.out, dtype=args.dtype, rescore=rescore)
+        logger.info(f"   📚 {name}: {manifest['count']} vectors, dim {manifest['dim']}, {manifest['dtype']}")
+
+    logger.info(f"✅ Exported {len(names)} collections to {args.out}")
+    logger.info("   Set MULTIMODAL_VECTOR_BACKEND=mmap to serve retrieval from them")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
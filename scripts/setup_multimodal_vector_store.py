@@ -1,22 +1,38 @@
 """
 Multimodal Vector Store Setup Script
 Processes all subject PDFs, creates CLIP embeddings, and stores in ChromaDB
-This script is idempotent and safe to re-run when new PDFs are added
+This script is idempotent and safe to re-run when new PDFs are added: only PDFs whose
+checksum changed since the last run (pdfs/index_metadata.json) are re-parsed, rows use
+content-derived ids, and rows of removed/changed content are deleted
 
 Usage:
-    python scripts/setup_multimodal_vector_store.py [--reset] [--subject SUBJECT]
+    python scripts/setup_multimodal_vector_store.py [--reset] [--force] [--subject SUBJECT] [--vector-dtype DTYPE]
     
 Options:
     --reset         : Delete existing ChromaDB and rebuild from scratch
+    --force         : Re-index every PDF even if its checksum is unchanged
     --subject NAME  : Process only specific subject (e.g., physics, chemistry)
+    --vector-dtype  : Also export mmap indexes stored as float32, float16 or int8
+                      (default: only when MULTIMODAL_VECTOR_BACKEND=mmap, as MULTIMODAL_VECTOR_DTYPE)
     --verbose       : Enable verbose logging
+
+Pipeline (per subject):
+    parse  : process pool parses PDF page ranges with PyMuPDF (text chunks + decoded images)
+    embed  : single stage batching CLIP text/image forward passes
+    write  : adds rows to ChromaDB in MULTIMODAL_BATCH_SIZE chunks as they arrive
+Stages are connected by bounded queues so memory stays flat regardless of PDF size.
 """
 
 import os
 import sys
 import json
+import time
+import queue
 import logging
 import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Tuple
@@ -25,12 +41,15 @@ from typing import Dict, List, Tuple
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import Config
-from shared.services.multimodal_rag_service import (
-    MultimodalRAGService,
-    process_pdf,
-    embed_text,
-    CLIP_AVAILABLE
-)
+from shared.services.pdf_page_parser import get_page_count, parse_pdf_pages
+from shared.services.index_metadata import IndexMetadata, compute_file_checksum
+
+# NOTE: shared.services.multimodal_rag_service loads CLIP at import time, so it is
+# imported lazily below. Parser workers are spawned (Windows) and re-import this
+# module; they must not each load the model.
+
+# Ensure logs directory exists (the file handler below opens it)
+os.makedirs('logs', exist_ok=True)
 
 # Configure logging
 logging.basicConfig(
@@ -43,27 +62,58 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Ensure logs directory exists
-os.makedirs('logs', exist_ok=True)
+# End-of-stream marker passed between pipeline stages
+_STOP = object()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pages = 0
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.busy_seconds if self.busy_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'pages': self.pages,
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'pages_per_sec': round(self.pages_per_sec, 2)
+        }
 
 
 class VectorStoreSetup:
     """Setup and manage multimodal vector store initialization"""
 
-    def __init__(self, chromadb_path: str, pdf_root: str = None):
+    def __init__(self, chromadb_path: str, pdf_root: str = None, force: bool = False, vector_dtype: str = None):
         """Initialize setup manager"""
         self.chromadb_path = chromadb_path
         self.pdf_root = pdf_root or os.path.join(os.getcwd(), 'pdfs', 'subjects')
+        self.force = force
+        # mmap index export after indexing (None = skip unless the mmap backend is configured)
+        if vector_dtype is None and Config.MULTIMODAL_VECTOR_BACKEND == 'mmap':
+            vector_dtype = Config.MULTIMODAL_VECTOR_DTYPE
+        self.vector_dtype = vector_dtype
         self.service = None
+        self.index_metadata = IndexMetadata()
         self.stats = {
             'subjects_processed': 0,
             'pdfs_processed': 0,
+            'pdfs_skipped': 0,
+            'pdfs_removed': 0,
             'total_documents': 0,
             'total_images': 0,
             'errors': 0,
             'start_time': datetime.now(),
             'end_time': None,
-            'duration_seconds': 0
+            'duration_seconds': 0,
+            'stages': {}
         }
         
         logger.info("=" * 80)
@@ -77,6 +127,7 @@ class VectorStoreSetup:
         logger.info("\n📋 Verifying Prerequisites...")
         
         # Check CLIP availability
+        from shared.services.multimodal_rag_service import CLIP_AVAILABLE
         if not CLIP_AVAILABLE:
             logger.error("❌ CLIP model not available. Install: pip install torch transformers")
             return False
@@ -131,6 +182,8 @@ class VectorStoreSetup:
         """Initialize MultimodalRAGService"""
         logger.info("\n🔧 Initializing MultimodalRAGService...")
         try:
+            from shared.services.multimodal_rag_service import MultimodalRAGService
+
             self.service = MultimodalRAGService(
                 chromadb_path=self.chromadb_path,
                 ollama_model=Config.MULTIMODAL_OLLAMA_MODEL
@@ -142,76 +195,319 @@ class VectorStoreSetup:
             return False
 
     def process_subject(self, subject: str, pdf_files: List[str]) -> Tuple[int, int, int]:
-        """Process all PDFs for a subject"""
+        """Process all PDFs for a subject through the parse -> embed -> write pipeline"""
         logger.info(f"\n📚 Processing Subject: {subject}")
-        logger.info(f"   PDFs to process: {len(pdf_files)}")
-        
-        total_docs = 0
-        total_images = 0
-        error_count = 0
-        
+        logger.info(f"   PDFs found: {len(pdf_files)}")
+
+        collection = self.service.client.get_or_create_collection(
+            name=subject.lower(),
+            metadata={"description": f"Multimodal embeddings for {subject}"}
+        )
+
+        from shared.services.multimodal_rag_service import purge_legacy_doc_ids
+        purge_legacy_doc_ids(collection, subject, self.index_metadata)
+
+        # Drop rows of PDFs that were removed from the subject folder
+        current_files = {os.path.basename(pdf_path) for pdf_path in pdf_files}
+        for removed_file in set(self.index_metadata.indexed_files(subject)) - current_files:
+            stale_ids = collection.get(where={"pdf_file": removed_file}, include=[])["ids"]
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+            self.service.image_store.delete_file(subject, removed_file)
+            self.index_metadata.forget_file(subject, removed_file)
+            self.stats['pdfs_removed'] += 1
+            logger.info(f"   🗑️  Removed {len(stale_ids)} documents of deleted PDF {removed_file}")
+
+        # Only re-parse PDFs that are new or whose checksum changed
+        checksums = {}
+        changed_files = []
         for pdf_path in pdf_files:
-            try:
-                logger.info(f"   📄 Processing: {os.path.basename(pdf_path)}")
-                
-                # Process PDF
-                all_docs, all_embeddings, image_data_store = process_pdf(
-                    pdf_path,
-                    chunk_size=Config.MULTIMODAL_CHUNK_SIZE,
-                    chunk_overlap=Config.MULTIMODAL_CHUNK_OVERLAP
-                )
-                
-                # Add metadata
-                for doc in all_docs:
-                    doc['subject'] = subject
-                    doc['pdf_file'] = os.path.basename(pdf_path)
-                
-                # Store in ChromaDB
-                collection = self.service.client.get_or_create_collection(
-                    name=subject.lower(),
-                    metadata={"description": f"Multimodal embeddings for {subject}"}
-                )
-                
-                # Add documents in batches
-                ids = [f"{subject}_{i}_{datetime.now().timestamp()}" for i in range(len(all_docs))]
-                documents = [doc["content"] for doc in all_docs]
-                metadatas = [{k: str(v) for k, v in doc.items() if k != "content"} for doc in all_docs]
-                embeddings = [emb.tolist() for emb in all_embeddings]
-                
-                batch_size = Config.MULTIMODAL_BATCH_SIZE
-                for i in range(0, len(ids), batch_size):
-                    batch_end = min(i + batch_size, len(ids))
-                    collection.add(
-                        ids=ids[i:batch_end],
-                        documents=documents[i:batch_end],
-                        metadatas=metadatas[i:batch_end],
-                        embeddings=embeddings[i:batch_end]
-                    )
-                
-                # Store images
-                if image_data_store:
-                    if subject.lower() not in self.service.image_stores:
-                        self.service.image_stores[subject.lower()] = {}
-                    self.service.image_stores[subject.lower()].update(image_data_store)
-                
-                total_docs += len(all_docs)
-                total_images += len(image_data_store)
-                
-                logger.info(f"      ✅ Added {len(all_docs)} documents, {len(image_data_store)} images")
-                self.stats['pdfs_processed'] += 1
-                
-            except Exception as e:
-                logger.error(f"      ❌ Error processing {os.path.basename(pdf_path)}: {e}")
-                error_count += 1
-                self.stats['errors'] += 1
-        
+            checksums[pdf_path] = compute_file_checksum(pdf_path)
+            if self.force or self.index_metadata.is_changed(subject, pdf_path, checksums[pdf_path]):
+                changed_files.append(pdf_path)
+            else:
+                self.stats['pdfs_skipped'] += 1
+                logger.info(f"   ⏭️  Unchanged: {os.path.basename(pdf_path)}")
+
+        if not changed_files:
+            logger.info(f"   ✅ Subject {subject} up to date")
+            self.index_metadata.update_collection_info(subject, collection.name, collection.count())
+            self.index_metadata.save()
+            self.stats['subjects_processed'] += 1
+            return 0, 0, 0
+
+        logger.info(f"   PDFs to index: {len(changed_files)}")
+
+        # Ids each changed PDF had before this run, to delete what no longer exists
+        previous_ids = {
+            os.path.basename(pdf_path): set(collection.get(where={"pdf_file": os.path.basename(pdf_path)}, include=[])["ids"])
+            for pdf_path in changed_files
+        }
+
+        queue_size = Config.MULTIMODAL_PIPELINE_QUEUE_SIZE
+        parse_queue = queue.Queue(maxsize=queue_size)
+        write_queue = queue.Queue(maxsize=queue_size)
+        stages = {name: StageStats(name) for name in ('parse', 'embed', 'write')}
+        counters = {'docs': 0, 'images': 0, 'errors': 0, 'failed_files': set(), 'written_ids': {}, 'written_images': {}}
+
+        workers = [
+            threading.Thread(target=self._parse_stage, args=(changed_files, parse_queue, stages['parse'], counters),
+                             name=f"{subject}-parse", daemon=True),
+            threading.Thread(target=self._embed_stage, args=(subject, parse_queue, write_queue, stages['embed'], counters),
+                             name=f"{subject}-embed", daemon=True),
+            threading.Thread(target=self._write_stage, args=(subject, collection, write_queue, stages['write'], counters),
+                             name=f"{subject}-write", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        for stage in stages.values():
+            logger.info(f"   ⏱️  {stage.name:<5}: {stage.pages} pages, {stage.items} items, "
+                        f"{stage.pages_per_sec:.2f} pages/sec")
+
+        # Finalize files that went through cleanly: remove stale rows, record checksum
+        for pdf_path in changed_files:
+            pdf_file = os.path.basename(pdf_path)
+            if pdf_file in counters['failed_files']:
+                logger.warning(f"   ⚠️  {pdf_file} had errors; it will be re-indexed on the next run")
+                continue
+            stale_ids = sorted(previous_ids[pdf_file] - counters['written_ids'].get(pdf_file, set()))
+            for i in range(0, len(stale_ids), Config.MULTIMODAL_BATCH_SIZE):
+                collection.delete(ids=stale_ids[i:i + Config.MULTIMODAL_BATCH_SIZE])
+            stale_images = self.service.image_store.delete_file(
+                subject, pdf_file, keep=counters['written_images'].get(pdf_file, set())
+            )
+            if stale_ids or stale_images:
+                logger.info(f"   🧹 {pdf_file}: removed {len(stale_ids)} stale documents, {stale_images} stale images")
+            self.index_metadata.record_file(subject, pdf_path, checksums[pdf_path])
+
+        self.index_metadata.update_collection_info(subject, collection.name, collection.count())
+        self.index_metadata.save()
+
+        total_docs = counters['docs']
+        total_images = counters['images']
+        error_count = counters['errors']
+
         logger.info(f"   ✅ Subject {subject} complete: {total_docs} docs, {total_images} images")
         self.stats['subjects_processed'] += 1
         self.stats['total_documents'] += total_docs
         self.stats['total_images'] += total_images
-        
+        self.stats['errors'] += error_count
+        self.stats['stages'][subject] = {name: stage.to_dict() for name, stage in stages.items()}
+
         return total_docs, total_images, error_count
 
+    def _parse_stage(self, pdf_files: List[str], parse_queue: queue.Queue, stats: StageStats, counters: Dict):
+        """Stage 1: parse page ranges in a process pool, in order, with bounded in-flight tasks"""
+        pages_per_task = Config.MULTIMODAL_PARSE_PAGES_PER_TASK
+        max_workers = Config.MULTIMODAL_PARSE_WORKERS
+        started = time.time()
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                in_flight = deque()
+
+                def drain_oldest():
+                    pdf_path, future = in_flight.popleft()
+                    try:
+                        pages = future.result()
+                    except Exception as e:
+                        logger.error(f"      ❌ Error parsing {os.path.basename(pdf_path)}: {e}")
+                        counters['errors'] += 1
+                        counters['failed_files'].add(os.path.basename(pdf_path))
+                        return
+                    stats.pages += len(pages)
+                    stats.items += sum(len(p['texts']) + len(p['images']) for p in pages)
+                    parse_queue.put((pdf_path, pages))
+
+                for pdf_path in pdf_files:
+                    try:
+                        page_count = get_page_count(pdf_path)
+                    except Exception as e:
+                        logger.error(f"      ❌ Error opening {os.path.basename(pdf_path)}: {e}")
+                        counters['errors'] += 1
+                        counters['failed_files'].add(os.path.basename(pdf_path))
+                        continue
+
+                    logger.info(f"   📄 Parsing: {os.path.basename(pdf_path)} ({page_count} pages)")
+                    for start_page in range(0, page_count, pages_per_task):
+                        if len(in_flight) >= max_workers * 2:
+                            drain_oldest()
+                        future = pool.submit(
+                            parse_pdf_pages,
+                            pdf_path,
+                            start_page,
+                            start_page + pages_per_task,
+                            Config.MULTIMODAL_CHUNK_SIZE,
+                            Config.MULTIMODAL_CHUNK_OVERLAP,
+                            Config.MULTIMODAL_ENABLE_IMAGE_PROCESSING
+                        )
+                        in_flight.append((pdf_path, future))
+                    self.stats['pdfs_processed'] += 1
+
+                while in_flight:
+                    drain_oldest()
+        except Exception as e:
+            logger.error(f"      ❌ Parse stage failed: {e}", exc_info=True)
+            counters['errors'] += 1
+        finally:
+            # Wall time: the pool parses in parallel, so busy time is the stage's lifetime
+            stats.busy_seconds = time.time() - started
+            parse_queue.put(_STOP)
+
+    def _embed_stage(self, subject: str, parse_queue: queue.Queue, write_queue: queue.Queue,
+                     stats: StageStats, counters: Dict):
+        """Stage 2: batch CLIP forward passes and forward embedded rows to the writer"""
+        from shared.services.multimodal_rag_service import embed_texts, embed_images
+
+        text_batch_size = Config.MULTIMODAL_EMBED_BATCH_SIZE
+        image_batch_size = Config.MULTIMODAL_IMAGE_BATCH_SIZE
+        pending_texts = []   # (doc, text)
+        pending_images = []  # (doc, pil_image, base64)
+
+        def flush_texts():
+            if not pending_texts:
+                return
+            try:
+                embeddings = embed_texts([text for _, text in pending_texts], text_batch_size)
+                write_queue.put([
+                    {'doc': doc, 'embedding': embedding, 'image_base64': None}
+                    for (doc, _), embedding in zip(pending_texts, embeddings)
+                ])
+            except Exception as e:
+                logger.error(f"      ❌ Error embedding text batch: {e}")
+                counters['errors'] += 1
+                counters['failed_files'].update(doc['pdf_file'] for doc, _ in pending_texts)
+            pending_texts.clear()
+
+        def flush_images():
+            if not pending_images:
+                return
+            try:
+                embeddings = embed_images([image for _, image, _ in pending_images], image_batch_size)
+                write_queue.put([
+                    {'doc': doc, 'embedding': embedding, 'image_base64': img_base64}
+                    for (doc, _, img_base64), embedding in zip(pending_images, embeddings)
+                ])
+            except Exception as e:
+                logger.error(f"      ❌ Error embedding image batch: {e}")
+                counters['errors'] += 1
+                counters['failed_files'].update(doc['pdf_file'] for doc, _, _ in pending_images)
+            pending_images.clear()
+
+        try:
+            while True:
+                item = parse_queue.get()
+                if item is _STOP:
+                    break
+
+                started = time.time()
+                pdf_path, pages = item
+                pdf_file = os.path.basename(pdf_path)
+                for page in pages:
+                    windows = page.get('embed_texts', page['texts'])
+                    for chunk_idx, (chunk, window, (span_start, span_end)) in enumerate(
+                            zip(page['texts'], windows, page['spans'])):
+                        pending_texts.append(({
+                            "content": chunk,
+                            "page": page['page'],
+                            "type": "text",
+                            "chunk_index": chunk_idx,
+                            "span_start": span_start,
+                            "span_end": span_end,
+                            "subject": subject,
+                            "pdf_file": pdf_file
+                        }, window))
+                        if len(pending_texts) >= text_batch_size:
+                            flush_texts()
+
+                    for image in page['images']:
+                        pending_images.append(({
+                            "content": f"[Image: {image['image_id']}]",
+                            "page": page['page'],
+                            "type": "image",
+                            "image_id": image['image_id'],
+                            "subject": subject,
+                            "pdf_file": pdf_file
+                        }, image['image'], image['base64']))
+                        if len(pending_images) >= image_batch_size:
+                            flush_images()
+
+                    stats.pages += 1
+                    stats.items += len(page['texts']) + len(page['images'])
+                stats.busy_seconds += time.time() - started
+
+            started = time.time()
+            flush_texts()
+            flush_images()
+            stats.busy_seconds += time.time() - started
+        except Exception as e:
+            logger.error(f"      ❌ Embed stage failed: {e}", exc_info=True)
+            counters['errors'] += 1
+            # Keep draining so the parse stage never blocks on a full queue
+            while parse_queue.get() is not _STOP:
+                pass
+        finally:
+            write_queue.put(_STOP)
+
+    def _write_stage(self, subject: str, collection, write_queue: queue.Queue, stats: StageStats, counters: Dict):
+        """Stage 3: upsert rows to ChromaDB in MULTIMODAL_BATCH_SIZE chunks as they arrive"""
+        from shared.services.multimodal_rag_service import make_doc_ids
+
+        batch_size = Config.MULTIMODAL_BATCH_SIZE
+        buffer = []
+        pages_seen = set()
+
+        def add_rows(rows: List[Dict]):
+            started = time.time()
+            try:
+                image_data = {
+                    row['doc']['image_id']: row['image_base64']
+                    for row in rows if row['image_base64'] is not None
+                }
+                ids = make_doc_ids([row['doc'] for row in rows], image_data)
+                collection.upsert(
+                    ids=ids,
+                    documents=[row['doc']["content"] for row in rows],
+                    # Native int/str values, as in initialize_subject_collection (where filters compare types)
+                    metadatas=[{k: v for k, v in row['doc'].items() if k != "content"} for row in rows],
+                    embeddings=[row['embedding'].tolist() for row in rows]
+                )
+
+                images_by_file = {}
+                for row in rows:
+                    if row['image_base64'] is not None:
+                        images_by_file.setdefault(row['doc']['pdf_file'], {})[row['doc']['image_id']] = row['image_base64']
+                    pages_seen.add((row['doc']['pdf_file'], row['doc']['page']))
+                for pdf_file, images in images_by_file.items():
+                    self.service.image_store.put_many(subject, images, pdf_file=pdf_file)
+                    counters['written_images'].setdefault(pdf_file, set()).update(images)
+                    counters['images'] += len(images)
+                for row, doc_id in zip(rows, ids):
+                    counters['written_ids'].setdefault(row['doc']['pdf_file'], set()).add(doc_id)
+
+                stats.items += len(rows)
+                stats.pages = len(pages_seen)
+                counters['docs'] += len(rows)
+            except Exception as e:
+                logger.error(f"      ❌ Error writing batch to ChromaDB: {e}")
+                counters['errors'] += 1
+                counters['failed_files'].update(row['doc']['pdf_file'] for row in rows)
+            stats.busy_seconds += time.time() - started
+
+        while True:
+            rows = write_queue.get()
+            if rows is _STOP:
+                break
+            buffer.extend(rows)
+            while len(buffer) >= batch_size:
+                add_rows(buffer[:batch_size])
+                del buffer[:batch_size]
+
+        if buffer:
+            add_rows(buffer)
+
     def verify_collections(self) -> bool:
         """Verify all collections were created"""
         logger.info("\n✅ Verifying Collections...")
@@ -228,6 +524,24 @@ class VectorStoreSetup:
             logger.error(f"❌ Error verifying collections: {e}")
             return False
 
+    def export_vector_indexes(self, subjects: List[str]):
+        """Export the processed collections to mmap indexes with the configured storage dtype"""
+        from shared.services.vector_index import export_chroma_collection, rescore_enabled
+
+        logger.info(f"\n📦 Exporting mmap vector indexes ({self.vector_dtype})...")
+        os.makedirs(Config.MULTIMODAL_MMAP_INDEX_PATH, exist_ok=True)
+        for subject in subjects:
+            try:
+                collection = self.service.client.get_collection(name=subject.lower())
+                manifest = export_chroma_collection(collection, Config.MULTIMODAL_MMAP_INDEX_PATH,
+                                                    dtype=self.vector_dtype,
+                                                    rescore=rescore_enabled(Config.MULTIMODAL_VECTOR_RESCORE,
+                                                                            self.vector_dtype))
+                logger.info(f"   📚 {manifest['collection']}: {manifest['count']} vectors")
+            except Exception as e:
+                logger.error(f"   ❌ Failed to export {subject}: {e}")
+                self.stats['errors'] += 1
+
     def save_metadata(self):
         """Save setup metadata for reference"""
         logger.info("\n💾 Saving Metadata...")
@@ -236,9 +550,13 @@ class VectorStoreSetup:
             'chromadb_path': self.chromadb_path,
             'pdf_root': self.pdf_root,
             'config': {
+                'chunking': Config.MULTIMODAL_CHUNKING,
                 'chunk_size': Config.MULTIMODAL_CHUNK_SIZE,
                 'chunk_overlap': Config.MULTIMODAL_CHUNK_OVERLAP,
+                'embed_max_tokens': Config.MULTIMODAL_EMBED_MAX_TOKENS,
+                'context_chars': Config.MULTIMODAL_CONTEXT_CHARS,
                 'top_k_retrieval': Config.MULTIMODAL_TOP_K_RETRIEVAL,
+                'vector_dtype': self.vector_dtype,
                 'batch_size': Config.MULTIMODAL_BATCH_SIZE,
                 'clip_model': Config.MULTIMODAL_CLIP_MODEL,
                 'ollama_model': Config.MULTIMODAL_OLLAMA_MODEL
@@ -262,6 +580,8 @@ class VectorStoreSetup:
                 if os.path.exists(self.chromadb_path):
                     shutil.rmtree(self.chromadb_path)
                 os.makedirs(self.chromadb_path, exist_ok=True)
+                self.index_metadata.reset()
+                self.index_metadata.save()
                 logger.info("✅ ChromaDB reset")
             
             # Verify prerequisites
@@ -296,6 +616,9 @@ class VectorStoreSetup:
             if not self.verify_collections():
                 logger.warning("⚠️  No collections created")
                 return False
+
+            if self.vector_dtype:
+                self.export_vector_indexes(list(subjects.keys()))
             
             # Save metadata
             self.save_metadata()
@@ -309,9 +632,14 @@ class VectorStoreSetup:
             logger.info("=" * 80)
             logger.info(f"Subjects Processed: {self.stats['subjects_processed']}")
             logger.info(f"PDFs Processed: {self.stats['pdfs_processed']}")
+            logger.info(f"PDFs Unchanged (skipped): {self.stats['pdfs_skipped']}")
+            logger.info(f"PDFs Removed: {self.stats['pdfs_removed']}")
             logger.info(f"Total Documents: {self.stats['total_documents']}")
             logger.info(f"Total Images: {self.stats['total_images']}")
             logger.info(f"Errors: {self.stats['errors']}")
+            for subject, stages in self.stats['stages'].items():
+                rates = ", ".join(f"{name} {stage['pages_per_sec']:.2f}" for name, stage in stages.items())
+                logger.info(f"Pages/sec [{subject}]: {rates}")
             logger.info(f"Duration: {self.stats['duration_seconds']:.2f} seconds")
             logger.info("=" * 80)
             logger.info("✅ Vector store setup complete!")
@@ -331,7 +659,10 @@ def main():
         epilog=__doc__
     )
     parser.add_argument('--reset', action='store_true', help='Reset ChromaDB and rebuild')
+    parser.add_argument('--force', action='store_true', help='Re-index all PDFs even if unchanged')
     parser.add_argument('--subject', type=str, help='Process only specific subject')
+    parser.add_argument('--vector-dtype', choices=('float32', 'float16', 'int8'),
+                        help='Export mmap vector indexes with this storage dtype')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose logging')
     
     args = parser.parse_args()
@@ -341,7 +672,9 @@ def main():
     
     setup = VectorStoreSetup(
         chromadb_path=Config.MULTIMODAL_CHROMADB_PATH,
-        pdf_root=os.path.join(os.getcwd(), 'pdfs', 'subjects')
+        pdf_root=os.path.join(os.getcwd(), 'pdfs', 'subjects'),
+        force=args.force,
+        vector_dtype=args.vector_dtype
     )
     
     success = setup.run(reset=args.reset, subject_filter=args.subject)
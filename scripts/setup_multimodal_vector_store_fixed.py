@@ -183,9 +183,9 @@ class VectorStoreSetup:
 
                 # Store images
                 if image_data_store:
-                    if subject.lower() not in self.service.image_stores:
-                        self.service.image_stores[subject.lower()] = {}
-                    self.service.image_stores[subject.lower()].update(image_data_store)
+                    self.service.image_store.put_many(
+                        subject, image_data_store, pdf_file=os.path.basename(pdf_path)
+                    )
 
                 total_docs += len(all_docs)
                 total_images += len(image_data_store)
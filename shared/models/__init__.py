@@ -1,14 +1,14 @@
 # Models package initialization
 from .user import User, db
 from .course import ExamCategory, ExamCategorySubject
-from .purchase import ExamCategoryPurchase, ExamCategoryQuestion, TestAttempt, TestAnswer, MockTestAttempt, TestAttemptSession
+from .purchase import ExamCategoryPurchase, ExamCategoryQuestion, TestAttempt, TestAnswer, MockTestAttempt, TestAttemptSession, MCQGenerationJob, MockTestQuestion
 from .community import BlogPost, BlogLike, BlogComment, AIChatHistory, UserAIStats, PasswordResetToken
 from .profile import UserStats, UserAcademics, UserPurchaseHistory
 
 __all__ = [
     'User', 'db',
     'ExamCategory', 'ExamCategorySubject',
-    'ExamCategoryPurchase', 'ExamCategoryQuestion', 'TestAttempt', 'TestAnswer', 'MockTestAttempt', 'TestAttemptSession',
+    'ExamCategoryPurchase', 'ExamCategoryQuestion', 'TestAttempt', 'TestAnswer', 'MockTestAttempt', 'TestAttemptSession', 'MCQGenerationJob', 'MockTestQuestion',
     'BlogPost', 'BlogLike', 'BlogComment', 'AIChatHistory', 'UserAIStats', 'PasswordResetToken',
     'UserStats', 'UserAcademics', 'UserPurchaseHistory'
 ]
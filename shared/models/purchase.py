@@ -391,3 +391,91 @@ class TestAnswer(db.Model):
 
 
 
+
+
+class MCQGenerationJob(db.Model):
+    """Durable MCQ generation job, drained by the worker pool in AsyncMCQGenerationService"""
+    __tablename__ = 'mcq_generation_jobs'
+
+    id = db.Column(db.String(64), primary_key=True)  # generation_session_id returned to clients
+    job_type = db.Column(db.String(50), nullable=False)  # Registered handler name
+    mock_test_id = db.Column(db.Integer, db.ForeignKey('mock_test_attempts.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # None for background jobs (question bank refill)
+    subject_id = db.Column(db.Integer, db.ForeignKey('exam_category_subjects.id'), nullable=True)
+    total_questions = db.Column(db.Integer, default=50)
+    initial_questions_count = db.Column(db.Integer, default=5)
+    payload = db.Column(db.JSON, nullable=True)  # Handler arguments (subject name, batch id, ...)
+
+    # Progress tracking
+    status = db.Column(db.Enum('pending', 'running', 'completed', 'failed'), default='pending', index=True)
+    questions_generated = db.Column(db.Integer, default=0)
+    completed_chunks = db.Column(db.JSON, nullable=True)  # Chunk numbers already published (for resume)
+    questions = db.Column(db.JSON, nullable=True)  # Published questions, in publish order
+    error_message = db.Column(db.Text, nullable=True)
+
+    # Leasing (a worker owns a running job until lease_expires_at; heartbeats extend it)
+    attempts = db.Column(db.Integer, default=0)
+    lease_owner = db.Column(db.String(100), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        """Convert generation job object to dictionary"""
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'mock_test_id': self.mock_test_id,
+            'user_id': self.user_id,
+            'subject_id': self.subject_id,
+            'total_questions': self.total_questions,
+            'status': self.status,
+            'questions_generated': self.questions_generated or 0,
+            'completed_chunks': self.completed_chunks or [],
+            'error_message': self.error_message,
+            'attempts': self.attempts or 0,
+            'lease_owner': self.lease_owner,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+    def __repr__(self):
+        return f'<MCQGenerationJob {self.id}: {self.status}>'
+
+
+class MockTestQuestion(db.Model):
+    """Mapping of a mock test to the shared question-bank questions it is assembled from"""
+    __tablename__ = 'mock_test_questions'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    mock_test_id = db.Column(db.Integer, db.ForeignKey('mock_test_attempts.id', ondelete='CASCADE'), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('exam_category_questions.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # 1-based order within the test
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('mock_test_id', 'question_id', name='uq_mock_test_question'),
+    )
+
+    # Relationships
+    mock_test = db.relationship('MockTestAttempt', backref='question_links')
+    question = db.relationship('ExamCategoryQuestion', backref='mock_test_links')
+
+    def to_dict(self):
+        """Convert mock test question mapping to dictionary"""
+        return {
+            'id': self.id,
+            'mock_test_id': self.mock_test_id,
+            'question_id': self.question_id,
+            'position': self.position,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<MockTestQuestion {self.mock_test_id}#{self.position}: {self.question_id}>'
@@ -1,15 +1,32 @@
 """
 Asynchronous MCQ Generation Service
-Handles background MCQ generation with immediate return of initial questions
+Handles background MCQ generation with immediate return of initial questions.
+
+Generation sessions are durable jobs in the mcq_generation_jobs table, so any worker
+process can read their state. A fixed-size pool of worker threads per process drains
+pending jobs; a worker leases a job and renews the lease with heartbeats, and a job
+whose lease expires (worker crash/restart) is picked up again and resumes after the
+last published chunk. Every claim writes a fresh lease token to lease_owner, so a
+worker that lost its lease can never write to the job again, even when the job was
+re-claimed by another thread of the same process.
 """
 
+import os
+import json
+import uuid
+import socket
 import threading
 import logging
 import time
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
-import json
+
+from sqlalchemy import and_, or_
+
+from config import Config
+from shared.models.user import db
+from shared.models.purchase import MCQGenerationJob
 
 logger = logging.getLogger(__name__)
 
@@ -23,27 +40,47 @@ class GenerationSession:
     subject_id: int
     total_questions: int = 50
     initial_questions_count: int = 5
-    
+
     # Progress tracking
     questions_generated: int = 0
     is_complete: bool = False
     has_error: bool = False
     error_message: str = ""
-    
+
     # Questions storage
     questions: List[Dict] = None
-    
+
     # Timestamps
     created_at: datetime = None
     started_at: datetime = None
     completed_at: datetime = None
-    
+
     def __post_init__(self):
         if self.questions is None:
             self.questions = []
         if self.created_at is None:
             self.created_at = datetime.utcnow()
-    
+
+    @classmethod
+    def from_job(cls, job: MCQGenerationJob) -> 'GenerationSession':
+        """Build a session snapshot from its job row"""
+        return cls(
+            session_id=job.id,
+            mock_test_id=job.mock_test_id,
+            user_id=job.user_id,
+            subject_id=job.subject_id,
+            total_questions=job.total_questions,
+            initial_questions_count=job.initial_questions_count,
+            questions_generated=job.questions_generated or 0,
+            is_complete=job.status == 'completed',
+            has_error=job.status == 'failed',
+            error_message=job.error_message or "",
+            questions=list(job.questions or []),
+            created_at=job.created_at,
+            started_at=job.started_at,
+            completed_at=job.completed_at
+        )
+
     def to_dict(self):
         """Convert to dictionary"""
         data = asdict(self)
@@ -53,126 +90,363 @@ class GenerationSession:
         return data
 
 
+class GenerationJobContext:
+    """Handed to job handlers: job arguments, resume state and chunk publishing"""
+
+    def __init__(self, service: 'AsyncMCQGenerationService', job: MCQGenerationJob):
+        self.service = service
+        self.job_id = job.id
+        self.job_type = job.job_type
+        self.mock_test_id = job.mock_test_id
+        self.user_id = job.user_id
+        self.subject_id = job.subject_id
+        self.total_questions = job.total_questions
+        self.lease_token = job.lease_owner
+        self.payload = dict(job.payload or {})
+        self.completed_chunks = list(job.completed_chunks or [])
+        self.lease_lost = False
+
+    def publish(self, chunk_num: int, questions: List[Dict]) -> bool:
+        """
+        Publish a finished chunk: append its questions, mark the chunk done, store
+        ``payload`` (handler resume state) and renew the lease in one commit, together
+        with anything the handler added to db.session (e.g. the chunk's ExamCategoryQuestion rows)
+
+        Returns:
+            bool: False if this worker lost the lease (the chunk was not recorded)
+        """
+        if self.lease_lost:
+            db.session.rollback()
+            return False
+
+        job = db.session.get(MCQGenerationJob, self.job_id)
+        if job is None or job.lease_owner != self.lease_token:
+            logger.warning(f"⚠️ Lost lease on generation job {self.job_id}; dropping chunk {chunk_num}")
+            self.lease_lost = True
+            db.session.rollback()
+            return False
+
+        now = datetime.utcnow()
+        job.questions = list(job.questions or []) + list(questions)
+        job.questions_generated = len(job.questions)
+        job.completed_chunks = sorted(set(job.completed_chunks or []) | {chunk_num})
+        job.payload = json.loads(json.dumps(self.payload))  # New object, so the JSON column is written
+        job.heartbeat_at = now
+        job.lease_expires_at = now + timedelta(seconds=self.service.lease_seconds)
+        db.session.commit()
+
+        self.completed_chunks = job.completed_chunks
+        self.service._notify()
+        return True
+
+
 class AsyncMCQGenerationService:
-    """Service for asynchronous MCQ generation"""
-    
+    """Service for asynchronous MCQ generation backed by a durable job table"""
+
     def __init__(self):
         """Initialize the service"""
-        self.sessions: Dict[str, GenerationSession] = {}
+        self.worker_id = f"{socket.gethostname()[:60]}:{os.getpid()}"
+        self.handlers: Dict[str, Callable[[GenerationJobContext], Dict]] = {}
+        self.lease_seconds = Config.MCQ_GENERATION_LEASE_SECONDS
+        self.app = None
+        self.workers: List[threading.Thread] = []
+        self.active_jobs: Dict[str, str] = {}  # Job id -> lease token held by this process (renewed by the heartbeat)
         self.lock = threading.Lock()
-        logger.info("✅ AsyncMCQGenerationService initialized")
-    
+        # Wakes local waiters when a job of this process publishes or finishes; update_seq
+        # counts those notifications so a waiter never sleeps through one it just missed
+        self.updated = threading.Condition(self.lock)
+        self.update_seq = 0
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        logger.info(f"✅ AsyncMCQGenerationService initialized (worker id {self.worker_id})")
+
+    def register_handler(self, job_type: str, handler: Callable[[GenerationJobContext], Dict]):
+        """
+        Register the function that runs jobs of ``job_type``
+
+        The handler receives a GenerationJobContext, should call ``context.publish``
+        per finished chunk (skipping ``context.completed_chunks``) and return a result
+        dict with 'success' and optionally 'questions' / 'error'.
+        """
+        self.handlers[job_type] = handler
+
+    def start_workers(self, app, num_workers: Optional[int] = None):
+        """Start the worker pool and heartbeat thread (idempotent)"""
+        num_workers = Config.MCQ_GENERATION_WORKERS if num_workers is None else num_workers
+        with self.lock:
+            if self.workers or num_workers <= 0:
+                return
+            self.app = app
+            for i in range(num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"mcq-job-worker-{i}", daemon=True)
+                worker.start()
+                self.workers.append(worker)
+            heartbeat = threading.Thread(target=self._heartbeat_loop, name="mcq-job-heartbeat", daemon=True)
+            heartbeat.start()
+            self.workers.append(heartbeat)
+        logger.info(f"✅ Started {num_workers} MCQ generation workers")
+
+    def stop_workers(self):
+        """Ask worker threads to exit after their current job"""
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def _notify(self):
+        with self.updated:
+            self.update_seq += 1
+            self.updated.notify_all()
+
     def create_session(
         self,
         mock_test_id: int,
         user_id: int,
         subject_id: int,
         total_questions: int = 50,
-        initial_questions_count: int = 5
+        initial_questions_count: int = 5,
+        job_type: str = 'mock_test',
+        payload: Optional[Dict] = None,
+        session_id: Optional[str] = None
     ) -> GenerationSession:
         """
-        Create a new generation session
-        
+        Create a new generation session (enqueued as a pending job)
+
         Args:
             mock_test_id: ID of the mock test
             user_id: ID of the user
             subject_id: ID of the subject
             total_questions: Total questions to generate
             initial_questions_count: Number of initial questions to return immediately
-            
+            job_type: Registered handler that will run the job
+            payload: JSON-serializable handler arguments
+            session_id: Explicit job id (default: derived from mock test, user and time)
+
         Returns:
             GenerationSession: The created session
         """
-        session_id = f"gen_{mock_test_id}_{user_id}_{int(time.time() * 1000)}"
-        
-        session = GenerationSession(
-            session_id=session_id,
+        session_id = session_id or f"gen_{mock_test_id}_{user_id}_{int(time.time() * 1000)}"
+
+        job = MCQGenerationJob(
+            id=session_id,
+            job_type=job_type,
             mock_test_id=mock_test_id,
             user_id=user_id,
             subject_id=subject_id,
             total_questions=total_questions,
-            initial_questions_count=initial_questions_count
+            initial_questions_count=initial_questions_count,
+            payload=payload or {},
+            status='pending',
+            questions=[],
+            completed_chunks=[]
         )
-        
-        with self.lock:
-            self.sessions[session_id] = session
-        
-        logger.info(f"✅ Created generation session: {session_id}")
-        return session
-    
+        db.session.add(job)
+        db.session.commit()
+        self.wake_event.set()
+
+        logger.info(f"✅ Created generation session: {session_id} ({job_type})")
+        return GenerationSession.from_job(job)
+
     def get_session(self, session_id: str) -> Optional[GenerationSession]:
-        """Get a generation session by ID"""
+        """Get a generation session by ID (from any worker process)"""
+        job = db.session.get(MCQGenerationJob, session_id)
+        return GenerationSession.from_job(job) if job else None
+
+    def _new_lease_token(self) -> str:
+        """Unique lease_owner value for one claim (host, current pid and a random suffix)"""
+        return f"{socket.gethostname()[:60]}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+    def _claim_next_job(self) -> Optional[str]:
+        """Lease the oldest pending (or abandoned) job this process can run"""
+        if not self.handlers:
+            return None
+        now = datetime.utcnow()
+        candidates = MCQGenerationJob.query.filter(
+            MCQGenerationJob.job_type.in_(list(self.handlers.keys())),
+            or_(
+                MCQGenerationJob.status == 'pending',
+                and_(MCQGenerationJob.status == 'running', MCQGenerationJob.lease_expires_at < now)
+            )
+        ).order_by(MCQGenerationJob.created_at).limit(5).all()
+
+        for job in candidates:
+            lease_token = self._new_lease_token()
+            previous_owner = job.lease_owner  # The commit below expires job
+            # Conditional update: only one worker can move the job off its observed lease
+            lease_filter = (MCQGenerationJob.lease_expires_at.is_(None) if job.lease_expires_at is None
+                            else MCQGenerationJob.lease_expires_at == job.lease_expires_at)
+            claimed = MCQGenerationJob.query.filter(
+                MCQGenerationJob.id == job.id,
+                MCQGenerationJob.status == job.status,
+                lease_filter
+            ).update({
+                'status': 'running',
+                'lease_owner': lease_token,
+                'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+                'heartbeat_at': now,
+                'attempts': (job.attempts or 0) + 1,
+                'started_at': job.started_at or now
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed == 1:
+                if previous_owner:
+                    logger.warning(f"🔁 Resuming abandoned generation job {job.id} (previous owner {previous_owner})")
+                return job.id
+        return None
+
+    def _finish_job(self, job_id: str, lease_token: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        """Mark a leased job completed or failed (no-op if the lease was lost)"""
+        job = db.session.get(MCQGenerationJob, job_id)
+        if job is None or job.lease_owner != lease_token:
+            return
+
+        now = datetime.utcnow()
+        if error is None and result and result.get('success'):
+            # Questions published chunk by chunk are kept as-is
+            if not job.questions:
+                job.questions = result.get('questions', [])
+            job.questions_generated = len(job.questions or [])
+            job.status = 'completed'
+            logger.info(f"✅ Background generation complete: {job.questions_generated} questions")
+        elif error is not None and (job.attempts or 0) < Config.MCQ_GENERATION_MAX_ATTEMPTS:
+            # Crash inside the handler: release the lease so the job is retried
+            job.status = 'pending'
+            job.error_message = error
+            logger.warning(f"⚠️ Generation job {job_id} failed (attempt {job.attempts}), will retry: {error}")
+        else:
+            job.status = 'failed'
+            job.error_message = error or (result or {}).get('error', 'Unknown error')
+            logger.error(f"❌ Generation failed: {job.error_message}")
+
+        if job.status != 'pending':
+            job.completed_at = now
+        job.lease_owner = None
+        job.lease_expires_at = None
+        db.session.commit()
+
+    def _run_job(self, job_id: str):
+        """Run a leased job with its registered handler"""
+        job = db.session.get(MCQGenerationJob, job_id)
+        handler = self.handlers.get(job.job_type)
+        context = GenerationJobContext(self, job)
+
         with self.lock:
-            return self.sessions.get(session_id)
-    
-    def start_background_generation(
-        self,
-        session_id: str,
-        generation_func,
-        *args,
-        **kwargs
-    ) -> bool:
+            self.active_jobs[job_id] = context.lease_token
+        try:
+            logger.info(f"🔄 Starting background MCQ generation for session: {job_id} "
+                        f"({len(context.completed_chunks)} chunks already done)")
+            result = handler(context)
+            if context.lease_lost:
+                return
+            if result is None:
+                self._finish_job(job_id, context.lease_token, error='Generation handler returned no result')
+            else:
+                self._finish_job(job_id, context.lease_token, result=result)
+        except Exception as e:
+            logger.error(f"❌ Background generation error: {str(e)}", exc_info=True)
+            db.session.rollback()
+            self._finish_job(job_id, context.lease_token, error=str(e))
+        finally:
+            with self.lock:
+                self.active_jobs.pop(job_id, None)
+            self._notify()
+
+    def _worker_loop(self):
+        """Worker thread: claim and run jobs until stopped"""
+        while not self.stop_event.is_set():
+            job_id = None
+            with self.app.app_context():
+                try:
+                    job_id = self._claim_next_job()
+                    if job_id:
+                        self._run_job(job_id)
+                except Exception as e:
+                    logger.error(f"❌ MCQ generation worker error: {str(e)}", exc_info=True)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+            if not job_id:
+                self.wake_event.wait(Config.MCQ_GENERATION_POLL_SECONDS)
+                self.wake_event.clear()
+
+    def _heartbeat_loop(self):
+        """Renew leases of this process' running jobs and purge old finished jobs"""
+        last_purge = 0.0
+        while not self.stop_event.wait(Config.MCQ_GENERATION_HEARTBEAT_SECONDS):
+            with self.app.app_context():
+                try:
+                    with self.lock:
+                        lease_tokens = list(self.active_jobs.values())
+                    if lease_tokens:
+                        now = datetime.utcnow()
+                        MCQGenerationJob.query.filter(
+                            MCQGenerationJob.lease_owner.in_(lease_tokens)
+                        ).update({
+                            'heartbeat_at': now,
+                            'lease_expires_at': now + timedelta(seconds=self.lease_seconds)
+                        }, synchronize_session=False)
+                        db.session.commit()
+
+                    if time.time() - last_purge > 3600:
+                        self.purge_finished_sessions()
+                        last_purge = time.time()
+                except Exception as e:
+                    logger.error(f"❌ MCQ generation heartbeat error: {str(e)}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def wait_for_update(self, session_id: str, since: int = 0, timeout: float = 15.0) -> Dict:
         """
-        Start background MCQ generation in a separate thread
-        
-        Args:
-            session_id: ID of the generation session
-            generation_func: Function to call for MCQ generation
-            *args: Positional arguments for generation_func
-            **kwargs: Keyword arguments for generation_func
-            
+        Block until questions beyond ``since`` are published, the session finishes, or
+        ``timeout`` seconds pass (long-poll / SSE support)
+
+        Jobs run by this process wake the waiter on every publish. For jobs of other
+        processes only the status columns are re-read, every MCQ_GENERATION_POLL_SECONDS;
+        the questions are loaded once there is something new to return.
+
         Returns:
-            bool: True if thread started successfully
+            Dict with get_progress() fields plus 'new_questions' and 'next_index'
         """
+        deadline = time.time() + timeout
+        while True:
+            with self.updated:
+                seen_seq = self.update_seq
+            # End the read transaction so progress committed by other workers is visible
+            db.session.rollback()
+            state = db.session.query(MCQGenerationJob.questions_generated, MCQGenerationJob.status).filter(
+                MCQGenerationJob.id == session_id
+            ).first()
+            if state is None:
+                return {
+                    'success': False,
+                    'error': 'Session not found'
+                }
+            remaining = deadline - time.time()
+            if (state.questions_generated or 0) > since or state.status in ('completed', 'failed') or remaining <= 0:
+                break
+            with self.updated:
+                if self.update_seq == seen_seq:
+                    # A job run by this process notifies on every publish, so only jobs of
+                    # other processes need the (lightweight) status poll
+                    local = session_id in self.active_jobs
+                    self.updated.wait(remaining if local else min(remaining, Config.MCQ_GENERATION_POLL_SECONDS))
+
         session = self.get_session(session_id)
         if not session:
-            logger.error(f"❌ Session not found: {session_id}")
-            return False
-        
-        def _generate():
-            """Background generation worker"""
-            try:
-                session.started_at = datetime.utcnow()
-                logger.info(f"🔄 Starting background MCQ generation for session: {session_id}")
-                
-                # Call the generation function
-                result = generation_func(*args, **kwargs)
-                
-                if result.get('success'):
-                    questions = result.get('questions', [])
-                    with self.lock:
-                        session.questions = questions
-                        session.questions_generated = len(questions)
-                        session.is_complete = True
-                        session.completed_at = datetime.utcnow()
-                    
-                    logger.info(f"✅ Background generation complete: {len(questions)} questions")
-                else:
-                    with self.lock:
-                        session.has_error = True
-                        session.error_message = result.get('error', 'Unknown error')
-                        session.completed_at = datetime.utcnow()
-                    
-                    logger.error(f"❌ Generation failed: {session.error_message}")
-                    
-            except Exception as e:
-                logger.error(f"❌ Background generation error: {str(e)}")
-                with self.lock:
-                    session.has_error = True
-                    session.error_message = str(e)
-                    session.completed_at = datetime.utcnow()
-        
-        # Start background thread
-        thread = threading.Thread(target=_generate, daemon=True)
-        thread.start()
-        
-        logger.info(f"✅ Background generation thread started for session: {session_id}")
-        return True
-    
+            return {
+                'success': False,
+                'error': 'Session not found'
+            }
+        new_questions = session.questions[since:]
+        progress = self._progress(session)
+        progress['new_questions'] = new_questions
+        progress['next_index'] = since + len(new_questions)
+        return progress
+
     def get_progress(self, session_id: str) -> Dict:
         """
         Get generation progress for a session
-        
+
         Returns:
             Dict with progress information
         """
@@ -182,12 +456,14 @@ class AsyncMCQGenerationService:
                 'success': False,
                 'error': 'Session not found'
             }
-        
+        return self._progress(session)
+
+    def _progress(self, session: GenerationSession) -> Dict:
         progress_percent = (session.questions_generated / session.total_questions) * 100 if session.total_questions > 0 else 0
-        
+
         return {
             'success': True,
-            'session_id': session_id,
+            'session_id': session.session_id,
             'progress': progress_percent,
             'questions_generated': session.questions_generated,
             'total_questions': session.total_questions,
@@ -198,39 +474,54 @@ class AsyncMCQGenerationService:
             'can_use_partial': session.questions_generated >= session.initial_questions_count,
             'timestamp': datetime.utcnow().isoformat()
         }
-    
+
     def cleanup_session(self, session_id: str) -> bool:
         """
         Clean up a generation session
-        
+
         Args:
             session_id: ID of the session to clean up
-            
+
         Returns:
             bool: True if cleaned up successfully
         """
-        with self.lock:
-            if session_id in self.sessions:
-                del self.sessions[session_id]
-                logger.info(f"✅ Cleaned up session: {session_id}")
-                return True
-        
-        return False
-    
+        job = db.session.get(MCQGenerationJob, session_id)
+        if job is None:
+            return False
+        db.session.delete(job)
+        db.session.commit()
+        logger.info(f"✅ Cleaned up session: {session_id}")
+        return True
+
+    def purge_finished_sessions(self, older_than_hours: Optional[int] = None) -> int:
+        """Delete completed/failed jobs finished more than ``older_than_hours`` ago"""
+        hours = Config.MCQ_GENERATION_RETENTION_HOURS if older_than_hours is None else older_than_hours
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        deleted = MCQGenerationJob.query.filter(
+            MCQGenerationJob.status.in_(['completed', 'failed']),
+            MCQGenerationJob.completed_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            logger.info(f"🧹 Purged {deleted} finished generation sessions")
+        return deleted
+
     def get_all_sessions(self) -> List[Dict]:
         """Get all active sessions"""
-        with self.lock:
-            return [session.to_dict() for session in self.sessions.values()]
+        jobs = MCQGenerationJob.query.filter(MCQGenerationJob.status.in_(['pending', 'running'])).all()
+        return [GenerationSession.from_job(job).to_dict() for job in jobs]
 
 
 # Singleton instance
 _async_mcq_service = None
+_async_mcq_service_lock = threading.Lock()
 
 
 def get_async_mcq_generation_service() -> AsyncMCQGenerationService:
     """Get or create singleton instance"""
     global _async_mcq_service
     if _async_mcq_service is None:
-        _async_mcq_service = AsyncMCQGenerationService()
+        with _async_mcq_service_lock:
+            if _async_mcq_service is None:
+                _async_mcq_service = AsyncMCQGenerationService()
     return _async_mcq_service
-
@@ -0,0 +1,302 @@
+"""
+CLIP Inference Backends
+Interchangeable runtimes for the CLIP text and vision towers behind embed_text/embed_images
+(selected with MULTIMODAL_CLIP_BACKEND):
+
+    torch      : eager PyTorch fp32 (reference)
+    torch-int8 : PyTorch with dynamic int8 quantization of every nn.Linear
+    onnx       : text and vision towers exported to ONNX, run with ONNX Runtime
+    onnx-int8  : the ONNX export with dynamically quantized (int8) weights
+
+Every backend returns unit-norm float32 features of shape (n, projection_dim), so
+embeddings from any backend can be compared with the same cosine/L2 math. ONNX exports
+are written once per model under MULTIMODAL_CLIP_ONNX_PATH and reused by later workers.
+"""
+
+import os
+import inspect
+import logging
+from contextlib import contextmanager
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CLIP_BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+
+TEXT_ONNX_FILE = 'text_tower.onnx'
+VISION_ONNX_FILE = 'vision_tower.onnx'
+ONNX_OPSET = 14
+
+# Accepted difference between embedding a text alone (embed_text) and inside a batch
+# (embed_texts). fp32 rows differ only by BLAS summation order across batch shapes
+# (measured <= 2e-7 max abs); the int8 backends quantize activations with a scale taken
+# over the whole batch, so their rows move more and are bounded by cosine instead.
+BATCH_PARITY_ATOL = 1e-6
+BATCH_PARITY_MIN_COSINE = 0.99
+
+
+def _projected(features):
+    """Projected features tensor (transformers >= 5 wraps it in pooler_output)"""
+    return features if hasattr(features, 'numpy') else features.pooler_output
+
+
+def _normalize(features: np.ndarray) -> np.ndarray:
+    features = np.asarray(features, dtype=np.float32)
+    norms = np.linalg.norm(features, axis=-1, keepdims=True)
+    return features / np.where(norms == 0, 1.0, norms)
+
+
+class ClipBackend:
+    """Interface of a CLIP inference backend"""
+
+    name = ''
+    projection_dim = 512
+
+    def __init__(self, model_name: str, max_length: int = 77):
+        from transformers import CLIPProcessor
+        self.model_name = model_name
+        self.max_length = max_length
+        self.processor = CLIPProcessor.from_pretrained(model_name)
+
+    def _tokenize(self, texts: List[str], return_tensors: str):
+        return self.processor(text=texts, return_tensors=return_tensors, padding=True,
+                              truncation=True, max_length=self.max_length)
+
+    def text_features(self, texts: List[str]) -> np.ndarray:
+        """Unit-norm text embeddings, shape (len(texts), projection_dim)"""
+        raise NotImplementedError
+
+    def image_features(self, images: List) -> np.ndarray:
+        """Unit-norm image embeddings of RGB PIL images, shape (len(images), projection_dim)"""
+        raise NotImplementedError
+
+
+class TorchClipBackend(ClipBackend):
+    """CLIPModel in PyTorch, optionally with dynamic int8 Linear layers"""
+
+    def __init__(self, model_name: str, quantize: bool = False, num_threads: int = 0, max_length: int = 77):
+        """
+        Load the model
+
+        Args:
+            quantize: Apply torch dynamic int8 quantization to the Linear layers
+            num_threads: torch intra-op threads (0 = torch default)
+        """
+        import torch
+        from transformers import CLIPModel
+
+        super().__init__(model_name, max_length)
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+
+        model = CLIPModel.from_pretrained(model_name)
+        model.eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.torch = torch
+        self.model = model
+        self.name = 'torch-int8' if quantize else 'torch'
+        self.projection_dim = model.config.projection_dim
+
+    def text_features(self, texts: List[str]) -> np.ndarray:
+        inputs = self._tokenize(texts, "pt")
+        with self.torch.no_grad():
+            features = _projected(self.model.get_text_features(**inputs))
+        return _normalize(features.numpy())
+
+    def image_features(self, images: List) -> np.ndarray:
+        inputs = self.processor(images=images, return_tensors="pt")
+        with self.torch.no_grad():
+            features = _projected(self.model.get_image_features(**inputs))
+        return _normalize(features.numpy())
+
+
+def _model_dir(onnx_root: str, model_name: str) -> str:
+    name = model_name.strip('/\\').replace('/', '__').replace('\\', '__').replace(':', '')
+    return os.path.join(onnx_root, name)
+
+
+@contextmanager
+def _export_lock(directory: str):
+    """Exclusive inter-process lock on directory/.export.lock (one exporting worker at a time)"""
+    with open(os.path.join(directory, '.export.lock'), 'a+b') as lock_file:
+        try:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        except ImportError:  # Windows
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ~10 s; keep waiting for the exporting worker
+        yield
+
+
+def export_clip_onnx(model_name: str, onnx_root: str, quantize: bool = False) -> str:
+    """
+    Export the text and vision towers of a CLIP model to ONNX (skipped when already exported)
+
+    Each tower maps its processor inputs straight to projected features. Workers export
+    one at a time under a file lock (the others then find the finished files), and every
+    file is written under a per-process temporary name and renamed into place.
+
+    Args:
+        quantize: Also write dynamically quantized (int8 weight) copies of both towers
+
+    Returns:
+        The export directory (onnx_root/<model name>)
+    """
+    directory = _model_dir(onnx_root, model_name)
+    suffix = '.int8' if quantize else ''
+    text_path = os.path.join(directory, TEXT_ONNX_FILE.replace('.onnx', f'{suffix}.onnx'))
+    vision_path = os.path.join(directory, VISION_ONNX_FILE.replace('.onnx', f'{suffix}.onnx'))
+    if os.path.exists(text_path) and os.path.exists(vision_path):
+        return directory
+
+    os.makedirs(directory, exist_ok=True)
+    with _export_lock(directory):
+        if not (os.path.exists(text_path) and os.path.exists(vision_path)):
+            _export_towers(model_name, directory, text_path, vision_path, quantize)
+    return directory
+
+
+def _export_towers(model_name: str, directory: str, text_path: str, vision_path: str, quantize: bool):
+    """Write the ONNX towers (caller holds the export lock)"""
+    fp32_text = os.path.join(directory, TEXT_ONNX_FILE)
+    fp32_vision = os.path.join(directory, VISION_ONNX_FILE)
+    tmp_suffix = f".{os.getpid()}.tmp"
+
+    if not (os.path.exists(fp32_text) and os.path.exists(fp32_vision)):
+        import torch
+        from transformers import CLIPModel
+
+        model = CLIPModel.from_pretrained(model_name)
+        model.eval()
+
+        # The model is a registered submodule so its weights export as initializers
+        class TextTower(torch.nn.Module):
+            def __init__(self, clip):
+                super().__init__()
+                self.clip = clip
+
+            def forward(self, input_ids, attention_mask):
+                return _projected(self.clip.get_text_features(input_ids=input_ids, attention_mask=attention_mask))
+
+        class VisionTower(torch.nn.Module):
+            def __init__(self, clip):
+                super().__init__()
+                self.clip = clip
+
+            def forward(self, pixel_values):
+                return _projected(self.clip.get_image_features(pixel_values=pixel_values))
+
+        size = model.config.vision_config.image_size
+        dummy_ids = torch.ones((2, 8), dtype=torch.long)
+        # TorchScript exporter: torch >= 2.9 defaults to the dynamo exporter (needs onnxscript)
+        exporter = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+        logger.info(f"📦 Exporting {model_name} to ONNX ({directory})...")
+        with torch.no_grad():
+            torch.onnx.export(
+                TextTower(model), (dummy_ids, torch.ones_like(dummy_ids)), f"{fp32_text}{tmp_suffix}",
+                input_names=['input_ids', 'attention_mask'], output_names=['features'],
+                dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                              'attention_mask': {0: 'batch', 1: 'sequence'},
+                              'features': {0: 'batch'}},
+                opset_version=ONNX_OPSET,
+                **exporter
+            )
+            torch.onnx.export(
+                VisionTower(model), (torch.zeros((2, 3, size, size)),), f"{fp32_vision}{tmp_suffix}",
+                input_names=['pixel_values'], output_names=['features'],
+                dynamic_axes={'pixel_values': {0: 'batch'}, 'features': {0: 'batch'}},
+                opset_version=ONNX_OPSET,
+                **exporter
+            )
+        os.replace(f"{fp32_text}{tmp_suffix}", fp32_text)
+        os.replace(f"{fp32_vision}{tmp_suffix}", fp32_vision)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"📦 Quantizing ONNX towers of {model_name} to int8...")
+        for source, target in ((fp32_text, text_path), (fp32_vision, vision_path)):
+            quantize_dynamic(source, f"{target}{tmp_suffix}", weight_type=QuantType.QInt8)
+            os.replace(f"{target}{tmp_suffix}", target)
+
+    logger.info(f"✅ ONNX export ready: {directory}")
+
+
+class OnnxClipBackend(ClipBackend):
+    """CLIP towers exported to ONNX and run with ONNX Runtime on CPU"""
+
+    def __init__(self, model_name: str, onnx_root: str, quantize: bool = False, num_threads: int = 0,
+                 max_length: int = 77):
+        """
+        Export (once) and load the ONNX towers
+
+        Args:
+            onnx_root: Directory holding per-model ONNX exports
+            quantize: Run the int8 weight-quantized towers
+            num_threads: ONNX Runtime intra-op threads (0 = one per physical core)
+        """
+        import onnxruntime as ort
+
+        super().__init__(model_name, max_length)
+        directory = export_clip_onnx(model_name, onnx_root, quantize)
+        suffix = '.int8' if quantize else ''
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+
+        providers = ['CPUExecutionProvider']
+        self.text_session = ort.InferenceSession(
+            os.path.join(directory, TEXT_ONNX_FILE.replace('.onnx', f'{suffix}.onnx')), options, providers=providers)
+        self.vision_session = ort.InferenceSession(
+            os.path.join(directory, VISION_ONNX_FILE.replace('.onnx', f'{suffix}.onnx')), options, providers=providers)
+        self.name = 'onnx-int8' if quantize else 'onnx'
+        self.projection_dim = self.text_session.get_outputs()[0].shape[-1]
+
+    def text_features(self, texts: List[str]) -> np.ndarray:
+        inputs = self._tokenize(texts, "np")
+        features = self.text_session.run(['features'], {
+            'input_ids': inputs['input_ids'].astype(np.int64),
+            'attention_mask': inputs['attention_mask'].astype(np.int64)
+        })[0]
+        return _normalize(features)
+
+    def image_features(self, images: List) -> np.ndarray:
+        inputs = self.processor(images=images, return_tensors="np")
+        features = self.vision_session.run(['features'], {
+            'pixel_values': inputs['pixel_values'].astype(np.float32)
+        })[0]
+        return _normalize(features)
+
+
+def load_clip_backend(backend: str, model_name: str, onnx_root: str = None, num_threads: int = 0) -> ClipBackend:
+    """
+    Load a CLIP backend by name
+
+    An ONNX backend that cannot be loaded (onnxruntime missing, export failure) falls
+    back to PyTorch fp32 so embeddings stay available.
+    """
+    if backend not in CLIP_BACKENDS:
+        raise ValueError(f"Unsupported CLIP backend '{backend}', expected one of {CLIP_BACKENDS}")
+
+    if backend.startswith('onnx'):
+        try:
+            return OnnxClipBackend(model_name, onnx_root or os.path.join(os.getcwd(), 'models', 'clip_onnx'),
+                                   quantize=backend == 'onnx-int8', num_threads=num_threads)
+        except Exception as e:
+            logger.warning(f"⚠️ ONNX CLIP backend unavailable, using PyTorch fp32: {e}")
+            backend = 'torch'
+
+    return TorchClipBackend(model_name, quantize=backend == 'torch-int8', num_threads=num_threads)
@@ -0,0 +1,170 @@
+"""
+Query Embedding Cache
+Bounded LRU/TTL cache of normalized query text -> embedding vector, kept per worker
+process and optionally shared between workers through a local SQLite file
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Thread-safe LRU/TTL cache for query embeddings with hit/miss counters"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: int = 0,
+                 disk_path: Optional[str] = None, namespace: str = ''):
+        """
+        Initialize the cache
+
+        Args:
+            max_size: Max entries kept in memory (0 disables the cache)
+            ttl_seconds: Entry lifetime in seconds (0 = never expires)
+            disk_path: Optional SQLite file shared by all workers on this host
+            namespace: Key namespace (e.g. the embedding model name) so different
+                models never share vectors in the disk cache
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.namespace = namespace
+        self._entries = OrderedDict()  # key -> (vector, stored_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(disk_path) or '.', exist_ok=True)
+                conn = self._connection()
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS query_embeddings (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        vector BLOB NOT NULL,
+                        stored_at REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                """)
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"⚠️ Disk embedding cache disabled ({disk_path}): {e}")
+                self.disk_path = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize query text (CLIP's tokenizer lowercases and collapses whitespace anyway)"""
+        return " ".join(text.lower().split())
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def _remember(self, key: str, vector: np.ndarray, stored_at: float):
+        """Insert into the in-memory LRU (caller holds the lock)"""
+        self._entries[key] = (vector, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Get the cached embedding for a query, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        key = self.normalize(text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[1], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0].copy()
+                del self._entries[key]
+
+        if self.disk_path:
+            try:
+                row = self._connection().execute(
+                    "SELECT vector, stored_at FROM query_embeddings WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is not None and not self._is_expired(row[1], now):
+                    vector = np.frombuffer(row[0], dtype=np.float32).copy()
+                    with self._lock:
+                        self._remember(key, vector, row[1])
+                        self.hits += 1
+                        self.disk_hits += 1
+                    return vector.copy()
+            except Exception as e:
+                logger.warning(f"⚠️ Disk embedding cache read failed: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, vector: np.ndarray):
+        """Cache the embedding for a query"""
+        if not self.enabled:
+            return
+
+        key = self.normalize(text)
+        vector = np.asarray(vector, dtype=np.float32).copy()
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, vector, stored_at)
+
+        if self.disk_path:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (namespace, key, vector, stored_at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, sqlite3.Binary(vector.tobytes()), stored_at)
+                )
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"⚠️ Disk embedding cache write failed: {e}")
+
+    def clear(self):
+        """Clear the in-memory cache and reset counters (the disk cache is kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.disk_hits = 0
+
+    def stats(self) -> Dict:
+        """Get cache size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'disk_cache': self.disk_path
+            }
@@ -0,0 +1,332 @@
+"""
+Shared Embedding Server
+One local process owns the CLIP model for every web worker (MULTIMODAL_EMBED_SERVER).
+Workers talk to it over a Unix socket (multiprocessing.connection, authenticated with
+MULTIMODAL_EMBED_SERVER_AUTHKEY) through RemoteClipBackend, which implements the same
+text_features/image_features interface as the in-process backends, so embed_text,
+embed_texts, embed_image and embed_images keep their signatures.
+
+Connections unpickle what they receive, so both sides refuse to run without an
+authkey, and the socket is created owner-only (0700 directory, 0600 socket).
+
+Concurrent requests are micro-batched: a batcher thread per modality takes the first
+queued request, waits up to MULTIMODAL_EMBED_MAX_WAIT_MS for more (or until
+MULTIMODAL_EMBED_SERVER_BATCH items), runs one forward pass and splits the results.
+
+Start it before the web workers:
+    python scripts/embedding_server.py
+"""
+
+import os
+import time
+import queue
+import socket
+import struct
+import logging
+import threading
+from multiprocessing.connection import Connection, Listener, answer_challenge, deliver_challenge
+from typing import Dict, List
+
+import numpy as np
+
+from shared.services.clip_backends import ClipBackend
+
+logger = logging.getLogger(__name__)
+
+
+def _require_authkey(authkey: bytes):
+    if not authkey:
+        raise ValueError("MULTIMODAL_EMBED_SERVER_AUTHKEY must be set to use the embedding server")
+
+
+class _Request:
+    __slots__ = ('items', 'done', 'result', 'error')
+
+    def __init__(self, items: List):
+        self.items = items
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent embedding requests into batched forward passes"""
+
+    def __init__(self, name: str, embed_fn, max_batch: int = 64, max_wait_ms: float = 5.0):
+        """
+        Start the batcher thread
+
+        Args:
+            embed_fn: Callable mapping a list of inputs to an (n, dim) array
+            max_batch: Max inputs per forward pass
+            max_wait_ms: Max time the first request of a batch waits for company
+        """
+        self.name = name
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.items = 0
+        self.batches = 0
+        self.compute_seconds = 0.0
+        threading.Thread(target=self._run, name=f"embed-batcher-{name}", daemon=True).start()
+
+    def submit(self, items: List) -> np.ndarray:
+        """Embed items in the next batch and wait for the result"""
+        request = _Request(items)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        count = len(batch[0].items)
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request.items)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for request in batch for item in request.items]
+            started = time.time()
+            try:
+                features = np.concatenate([
+                    self.embed_fn(items[start:start + self.max_batch])
+                    for start in range(0, len(items), self.max_batch)
+                ])
+                offset = 0
+                for request in batch:
+                    request.result = features[offset:offset + len(request.items)]
+                    offset += len(request.items)
+            except Exception as e:
+                logger.error(f"❌ Embedding batch failed ({self.name}, {len(items)} items): {e}")
+                for request in batch:
+                    request.error = RuntimeError(f"Embedding failed: {e}")
+
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.items += len(items)
+                self.batches += 1
+                self.compute_seconds += time.time() - started
+            for request in batch:
+                request.done.set()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'requests': self.requests,
+                'items': self.items,
+                'batches': self.batches,
+                'avg_batch_size': self.items / self.batches if self.batches else 0.0,
+                'compute_seconds': round(self.compute_seconds, 3)
+            }
+
+
+class EmbeddingServer:
+    """Serves one CLIP backend to every worker process over a Unix socket"""
+
+    def __init__(self, backend: ClipBackend, address: str, authkey: bytes,
+                 max_batch: int = 64, max_wait_ms: float = 5.0):
+        """
+        Raises:
+            ValueError: authkey is empty
+        """
+        _require_authkey(authkey)
+        self.backend = backend
+        self.address = address
+        self.authkey = authkey
+        self.batchers = {
+            'text': MicroBatcher('text', backend.text_features, max_batch, max_wait_ms),
+            'image': MicroBatcher('image', backend.image_features, max_batch, max_wait_ms)
+        }
+        self.started_at = time.time()
+
+    def _handle(self, request):
+        op = request[0]
+        if op in self.batchers:
+            return self.batchers[op].submit(request[1])
+        if op == 'info':
+            return {'name': self.backend.name, 'projection_dim': self.backend.projection_dim}
+        if op == 'stats':
+            return {
+                'backend': self.backend.name,
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                **{name: batcher.stats() for name, batcher in self.batchers.items()}
+            }
+        raise ValueError(f"Unknown embedding server op: {op}")
+
+    def _serve_connection(self, conn):
+        """One thread per worker connection; requests on a connection are sequential"""
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    break
+                try:
+                    conn.send(('ok', self._handle(request)))
+                except Exception as e:
+                    conn.send(('error', str(e)))
+        except (OSError, EOFError):
+            pass
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        """Accept worker connections until the process exits"""
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # Stale socket of a previous run
+        os.makedirs(os.path.dirname(self.address) or '.', mode=0o700, exist_ok=True)
+        # The socket file is created by bind(): a restrictive umask makes it owner-only
+        # from the start (a chmod afterwards leaves a window for other users to connect)
+        previous_umask = os.umask(0o077)
+        try:
+            listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        finally:
+            os.umask(previous_umask)
+        with listener:
+            logger.info(f"🚀 Embedding server ({self.backend.name}) listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"⚠️ Rejected embedding client: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,),
+                                 name="embed-client", daemon=True).start()
+
+
+class RemoteClipBackend(ClipBackend):
+    """ClipBackend that forwards to the shared embedding server (one connection per thread)"""
+
+    def __init__(self, address: str, authkey: bytes, connect_timeout: float = 2.0, request_timeout: float = 30.0):
+        """
+        Connect to the embedding server (one attempt; the model registry retries later)
+
+        Args:
+            connect_timeout: Max seconds to connect and authenticate
+            request_timeout: Max seconds to wait for the reply to one request
+
+        Raises:
+            ValueError: authkey is empty
+            ConnectionError: The server is not reachable
+        """
+        _require_authkey(authkey)
+        # No local processor or weights: tokenization and preprocessing run in the server
+        self.address = address
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self._local = threading.local()
+
+        try:
+            info = self._call(('info',))
+        except (OSError, EOFError) as e:
+            raise ConnectionError(f"Embedding server not reachable at {address}: {e}")
+        self.name = f"remote:{info['name']}"
+        self.projection_dim = info['projection_dim']
+
+    @staticmethod
+    def _set_io_timeouts(sock: socket.socket, timeout: float):
+        """Bound blocking sends/receives on a socket with SO_SNDTIMEO/SO_RCVTIMEO"""
+        seconds = int(timeout)
+        # struct timeval {time_t tv_sec; suseconds_t tv_usec}: two native longs on Linux
+        # and macOS ('@' = native sizes and alignment)
+        timeval = struct.pack('@ll', seconds, int((timeout - seconds) * 1e6))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeval)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeval)
+
+    def _connect(self) -> Connection:
+        """Open and authenticate a connection, each step bounded by connect_timeout
+
+        Connection needs a blocking descriptor, so the handshake is bounded with kernel
+        timeouts; afterwards they are raised to request_timeout, so sending a request or
+        reading a large reply is bounded without cutting it off at connect_timeout.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(self.address)
+            sock.setblocking(True)
+            self._set_io_timeouts(sock, self.connect_timeout)
+            conn = Connection(sock.detach())
+        except BaseException:
+            sock.close()
+            raise
+        try:
+            answer_challenge(conn, self.authkey)
+            deliver_challenge(conn, self.authkey)
+            # A duplicate descriptor shares the socket's options
+            with socket.fromfd(conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as shared:
+                self._set_io_timeouts(shared, self.request_timeout)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, request):
+        """
+        Send one request, reconnecting once if the server restarted
+
+        Raises:
+            TimeoutError: No reply within request_timeout (the connection is dropped,
+                          so a late reply cannot be read as the answer to a later request)
+        """
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send(request)
+                if not conn.poll(self.request_timeout):
+                    self._drop_connection()
+                    raise TimeoutError(f"Embedding server did not answer within {self.request_timeout}s")
+                status, payload = conn.recv()
+                break
+            except TimeoutError:
+                raise
+            except (OSError, EOFError):
+                self._drop_connection()
+                if attempt:
+                    raise
+        if status == 'error':
+            raise RuntimeError(payload)
+        return payload
+
+    def text_features(self, texts: List[str]) -> np.ndarray:
+        return self._call(('text', list(texts)))
+
+    def image_features(self, images: List) -> np.ndarray:
+        return self._call(('image', list(images)))
+
+    def stats(self) -> Dict:
+        """Batching counters of the server"""
+        return self._call(('stats',))
@@ -0,0 +1,147 @@
+"""
+Persistent Image Store
+Disk-backed store for PDF images referenced by multimodal ChromaDB rows.
+Images live as PNG blobs in a SQLite table keyed by (subject, image_id) and are read
+lazily on demand through a small in-process LRU, so a worker restart keeps multimodal
+context and workers no longer hold every subject's images in RAM.
+"""
+
+import os
+import base64
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORE_FILENAME = 'image_store.sqlite3'
+
+
+class ImageStore:
+    """SQLite blob store of base64 PNG images with an LRU read cache"""
+
+    def __init__(self, db_path: str, cache_size: Optional[int] = None):
+        """
+        Initialize the image store
+
+        Args:
+            db_path: Path to the SQLite database file (created if missing)
+            cache_size: Max images kept in the LRU (default: Config.MULTIMODAL_IMAGE_CACHE_SIZE)
+        """
+        self.db_path = db_path
+        self.cache_size = cache_size if cache_size is not None else Config.MULTIMODAL_IMAGE_CACHE_SIZE
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                subject TEXT NOT NULL,
+                image_id TEXT NOT NULL,
+                pdf_file TEXT,
+                data BLOB NOT NULL,
+                PRIMARY KEY (subject, image_id)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_pdf_file ON images (subject, pdf_file)")
+        conn.commit()
+        logger.info(f"ImageStore ready at {db_path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's SQLite connection (WAL so other workers can read while one writes)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _cache_put(self, key, value: str):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def get(self, subject: str, image_id: str) -> Optional[str]:
+        """Get an image as a base64 PNG string, or None if it is not stored"""
+        key = (subject.lower(), image_id)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        row = self._connection().execute(
+            "SELECT data FROM images WHERE subject = ? AND image_id = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+
+        img_base64 = base64.b64encode(row[0]).decode()
+        self._cache_put(key, img_base64)
+        return img_base64
+
+    def put_many(self, subject: str, images: Dict[str, str], pdf_file: Optional[str] = None):
+        """Store (or replace) images given as {image_id: base64 PNG}"""
+        if not images:
+            return
+        subject_key = subject.lower()
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO images (subject, image_id, pdf_file, data) VALUES (?, ?, ?, ?)",
+            [
+                (subject_key, image_id, pdf_file, sqlite3.Binary(base64.b64decode(img_base64)))
+                for image_id, img_base64 in images.items()
+            ]
+        )
+        conn.commit()
+
+        with self._cache_lock:
+            for image_id in images:
+                self._cache.pop((subject_key, image_id), None)
+
+    def delete_file(self, subject: str, pdf_file: str, keep: Optional[Iterable[str]] = None) -> int:
+        """Delete the images of a PDF, except the image ids in ``keep``
+
+        Returns:
+            Number of images deleted
+        """
+        subject_key = subject.lower()
+        keep = set(keep or [])
+        conn = self._connection()
+        image_ids = [
+            row[0] for row in conn.execute(
+                "SELECT image_id FROM images WHERE subject = ? AND pdf_file = ?", (subject_key, pdf_file)
+            )
+            if row[0] not in keep
+        ]
+        conn.executemany(
+            "DELETE FROM images WHERE subject = ? AND image_id = ?",
+            [(subject_key, image_id) for image_id in image_ids]
+        )
+        conn.commit()
+
+        with self._cache_lock:
+            for image_id in image_ids:
+                self._cache.pop((subject_key, image_id), None)
+        return len(image_ids)
+
+    def count(self, subject: Optional[str] = None) -> int:
+        """Count stored images, optionally for one subject"""
+        conn = self._connection()
+        if subject:
+            return conn.execute("SELECT COUNT(*) FROM images WHERE subject = ?", (subject.lower(),)).fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def clear_cache(self):
+        """Drop all cached images (the on-disk store is untouched)"""
+        with self._cache_lock:
+            self._cache.clear()
@@ -0,0 +1,146 @@
+"""
+PDF Index Metadata
+Tracks per-file checksums and per-subject collection info in pdfs/index_metadata.json
+so subject collections can be re-indexed incrementally (only changed PDFs are re-parsed)
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# collection_info[subject]['id_scheme'] once legacy positional ids were purged
+CONTENT_ID_SCHEME = 'content'
+
+
+def compute_file_checksum(file_path: str, block_size: int = 1 << 20) -> str:
+    """Compute the MD5 checksum of a file"""
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexMetadata:
+    """Reads and writes the checksum/collection metadata for indexed subject PDFs"""
+
+    def __init__(self, metadata_path: Optional[str] = None):
+        """
+        Initialize index metadata
+
+        Args:
+            metadata_path: Path to the metadata JSON (default: Config.MULTIMODAL_INDEX_METADATA_PATH)
+        """
+        self.metadata_path = metadata_path or Config.MULTIMODAL_INDEX_METADATA_PATH
+        self.lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self) -> Dict:
+        """Load metadata from disk, returning an empty structure if missing or unreadable"""
+        data = {}
+        if os.path.exists(self.metadata_path):
+            try:
+                with open(self.metadata_path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not read index metadata {self.metadata_path}: {e}")
+
+        data.setdefault('last_indexed', {})
+        data.setdefault('file_checksums', {})
+        data.setdefault('collection_info', {})
+        # Keys written on Windows used os.path.join ('mathematics\\file.pdf'); normalize them to '/'
+        data['file_checksums'] = {key.replace('\\', '/'): checksum
+                                  for key, checksum in data['file_checksums'].items()}
+        return data
+
+    def save(self):
+        """Atomically write metadata to disk"""
+        with self.lock:
+            os.makedirs(os.path.dirname(self.metadata_path) or '.', exist_ok=True)
+            tmp_path = f"{self.metadata_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp_path, self.metadata_path)
+
+    @staticmethod
+    def file_key(subject: str, pdf_path: str) -> str:
+        """Key used in file_checksums for a subject PDF ('subject/file.pdf' on every OS)"""
+        pdf_file = os.path.basename(pdf_path.replace('\\', '/'))
+        return f"{subject.lower()}/{pdf_file}"
+
+    def is_changed(self, subject: str, pdf_path: str, checksum: str) -> bool:
+        """Check whether a PDF is new or its content changed since it was last indexed"""
+        with self.lock:
+            return self.data['file_checksums'].get(self.file_key(subject, pdf_path)) != checksum
+
+    def indexed_files(self, subject: str) -> List[str]:
+        """Get the PDF file names recorded as indexed for a subject"""
+        with self.lock:
+            info = self.data['collection_info'].get(subject.lower(), {})
+            return list(info.get('processed_files', []))
+
+    def record_file(self, subject: str, pdf_path: str, checksum: str):
+        """Record a PDF as indexed with the given checksum"""
+        subject_key = subject.lower()
+        pdf_file = os.path.basename(pdf_path)
+        with self.lock:
+            self.data['file_checksums'][self.file_key(subject, pdf_path)] = checksum
+            info = self.data['collection_info'].setdefault(subject_key, {'collection_name': subject_key})
+            processed = set(info.get('processed_files', []))
+            processed.add(pdf_file)
+            info['processed_files'] = sorted(processed)
+
+    def forget_file(self, subject: str, pdf_file: str):
+        """Remove a PDF from the metadata (e.g. after it was deleted from disk)"""
+        subject_key = subject.lower()
+        with self.lock:
+            self.data['file_checksums'].pop(self.file_key(subject, pdf_file), None)
+            info = self.data['collection_info'].get(subject_key)
+            if info:
+                info['processed_files'] = [f for f in info.get('processed_files', []) if f != pdf_file]
+
+    def ids_migrated(self, subject: str) -> bool:
+        """Check whether a subject's collection was already purged of legacy doc_<n> ids"""
+        with self.lock:
+            return self.data['collection_info'].get(subject.lower(), {}).get('id_scheme') == CONTENT_ID_SCHEME
+
+    def mark_ids_migrated(self, subject: str, forget_checksums: bool = False):
+        """
+        Record that a subject's collection only holds content-derived ids
+
+        Args:
+            forget_checksums: Also drop the subject's checksums so every PDF is re-indexed
+                              (its legacy rows were just deleted)
+        """
+        subject_key = subject.lower()
+        with self.lock:
+            info = self.data['collection_info'].setdefault(subject_key, {'collection_name': subject_key})
+            info['id_scheme'] = CONTENT_ID_SCHEME
+            if forget_checksums:
+                self.data['file_checksums'] = {key: checksum for key, checksum in self.data['file_checksums'].items()
+                                               if not key.startswith(f"{subject_key}/")}
+
+    def update_collection_info(self, subject: str, collection_name: str, total_chunks: int):
+        """Update the collection summary for a subject after indexing"""
+        subject_key = subject.lower()
+        now = datetime.now().isoformat()
+        with self.lock:
+            info = self.data['collection_info'].setdefault(subject_key, {})
+            info['collection_name'] = collection_name
+            info['total_chunks'] = total_chunks
+            info.setdefault('processed_files', [])
+            info['last_updated'] = now
+            self.data['last_indexed'][subject_key] = now
+
+    def reset(self):
+        """Forget all indexed files and collections"""
+        with self.lock:
+            self.data = {'last_indexed': {}, 'file_checksums': {}, 'collection_info': {}}
@@ -0,0 +1,138 @@
+"""
+MCQ Output Schema and Generation Stats
+Defines the JSON schema passed to Ollama's ``format`` parameter so the model's decoder
+is constrained to the MCQ array shape, the compiled validator every generated object
+goes through, and per-model counters for parse failures and chunk retries.
+"""
+
+import logging
+import threading
+from typing import Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+logger = logging.getLogger(__name__)
+
+
+class MCQQuestion(BaseModel):
+    """One generated multiple-choice question"""
+
+    model_config = ConfigDict(str_strip_whitespace=True, extra='ignore')
+
+    question: str = Field(min_length=1)
+    option_a: str = Field(min_length=1)
+    option_b: str = Field(min_length=1)
+    option_c: str = Field(min_length=1)
+    option_d: str = Field(min_length=1)
+    correct_answer: Literal['A', 'B', 'C', 'D']
+    explanation: str = ''
+
+    @field_validator('correct_answer', mode='before')
+    @classmethod
+    def normalize_answer(cls, value):
+        """Accept the usual variants ("b", "B)", "Option B") and keep the letter"""
+        if isinstance(value, str):
+            text = value.strip().upper()
+            if text.startswith('OPTION'):
+                text = text[len('OPTION'):].strip(' _:')
+            if text and text[0] in 'ABCD' and (len(text) == 1 or not text[1].isalpha()):
+                return text[0]
+        return value
+
+
+def mcq_array_schema(num_questions: int) -> Dict:
+    """JSON schema for an array of exactly ``num_questions`` MCQ objects"""
+    item_schema = MCQQuestion.model_json_schema()
+    item_schema.pop('title', None)
+    return {
+        'type': 'array',
+        'items': item_schema,
+        'minItems': num_questions,
+        'maxItems': num_questions
+    }
+
+
+def validate_question(obj) -> Optional[Dict]:
+    """Validate one parsed object; returns the normalized question dict or None"""
+    if not isinstance(obj, dict):
+        return None
+    try:
+        return MCQQuestion.model_validate(obj).model_dump()
+    except ValidationError as e:
+        logger.warning(f"⚠️ Rejected invalid MCQ object: {e.errors()[0].get('loc')} {e.errors()[0].get('msg')}")
+        return None
+
+
+def validate_questions(objects) -> Tuple[List[Dict], int]:
+    """Validate a parsed list of objects; returns (valid questions, invalid count)"""
+    if not isinstance(objects, list):
+        return [], 1 if objects else 0
+    valid = [q for q in (validate_question(obj) for obj in objects) if q is not None]
+    return valid, len(objects) - len(valid)
+
+
+class MCQGenerationStats:
+    """Thread-safe per-model counters for MCQ chunk generation"""
+
+    _FIELDS = ('attempts', 'chunks_succeeded', 'chunks_failed', 'retries', 'fallback_parses',
+               'questions_valid', 'questions_invalid')
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, bool], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, model: str, structured: bool) -> Dict[str, int]:
+        key = (model, structured)
+        if key not in self._counters:
+            self._counters[key] = dict.fromkeys(self._FIELDS, 0)
+        return self._counters[key]
+
+    def record_attempt(self, model: str, structured: bool, valid: int, invalid: int,
+                       used_fallback: bool, is_retry: bool):
+        """Record one generation call for a chunk"""
+        with self._lock:
+            bucket = self._bucket(model, structured)
+            bucket['attempts'] += 1
+            bucket['questions_valid'] += valid
+            bucket['questions_invalid'] += invalid
+            if used_fallback:
+                bucket['fallback_parses'] += 1
+            if is_retry:
+                bucket['retries'] += 1
+
+    def record_chunk(self, model: str, structured: bool, success: bool):
+        """Record the final outcome of a chunk (after any retries)"""
+        with self._lock:
+            self._bucket(model, structured)['chunks_succeeded' if success else 'chunks_failed'] += 1
+
+    def snapshot(self) -> List[Dict]:
+        """
+        Counters per (model, mode) with derived rates
+
+        ``regeneration_rate`` is the share of Ollama calls that were retries; comparing
+        the structured and prompt-only rows of a model shows the traffic saved by the schema.
+        """
+        with self._lock:
+            items = [(key, dict(counters)) for key, counters in self._counters.items()]
+
+        report = []
+        for (model, structured), counters in sorted(items):
+            chunks = counters['chunks_succeeded'] + counters['chunks_failed']
+            attempts = counters['attempts']
+            report.append({
+                'model': model,
+                'mode': 'structured' if structured else 'prompt_only',
+                **counters,
+                'parse_failure_rate': round((attempts - counters['chunks_succeeded']) / attempts, 4) if attempts else 0.0,
+                'regeneration_rate': round(counters['retries'] / attempts, 4) if attempts else 0.0,
+                'calls_per_chunk': round(attempts / chunks, 3) if chunks else 0.0
+            })
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+# Global stats (one per process)
+mcq_generation_stats = MCQGenerationStats()
@@ -0,0 +1,144 @@
+"""
+Incremental MCQ JSON Parser
+Consumes streamed LLM output chunk by chunk and emits each complete JSON object as soon
+as its closing brace arrives. Text outside objects (array brackets, commas, markdown
+fences, prose) is ignored, and a malformed object is repaired or dropped on its own
+instead of invalidating the whole array.
+
+Two resync rules stop one broken object from swallowing the ones after it:
+  - a '{' right after a ',' directly inside an object (never valid JSON) means the
+    object was left unclosed: it is closed and decoded, and a new object starts there
+  - '}' ',' '{' '"' read while inside a string means a string was left unterminated:
+    the object ends at that '}' (and is usually dropped), and a new object starts
+"""
+
+import re
+import json
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+_INVALID_ESCAPE = re.compile(r'\\([^"\\/bfnrtu])')
+_UNTERMINATED_STRING_BOUNDARY = re.compile(r'\}\s*,\s*\{\s*"$')
+_BOUNDARY_WINDOW = 64  # Characters searched for that boundary (only the buffer tail can match)
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def _repair_object(text: str) -> str:
+    """Fix the common LLM JSON slips inside one object (trailing commas, invalid escapes like \\_)"""
+    text = _TRAILING_COMMA.sub(r'\1', text)
+    return _INVALID_ESCAPE.sub(r'\1', text)
+
+
+class IncrementalMCQParser:
+    """Streaming parser that yields top-level JSON objects from partial text"""
+
+    def __init__(self):
+        self._buffer = []        # Characters of the object being read
+        self._stack = []         # Open '{' / '[' inside the current object (empty = between objects)
+        self._in_string = False
+        self._escaped = False
+        self._last_token = ''    # Last non-whitespace character outside strings
+        self.objects_parsed = 0
+        self.objects_repaired = 0
+        self.objects_dropped = 0
+        self.resyncs = 0
+
+    def _start_object(self, prefix: str = '{', in_string: bool = False):
+        self._buffer = list(prefix)
+        self._stack = ['{']
+        self._in_string = in_string
+        self._escaped = False
+        self._last_token = '{'
+
+    def feed(self, text: str) -> List[Dict]:
+        """
+        Consume the next piece of streamed text
+
+        Returns:
+            Question dicts completed by this piece (possibly empty)
+        """
+        completed = []
+        for char in text:
+            if not self._stack:
+                if char == '{':
+                    self._start_object()
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    tail = ''.join(self._buffer[-_BOUNDARY_WINDOW:])
+                    boundary = _UNTERMINATED_STRING_BOUNDARY.search(tail)
+                    if boundary:
+                        # Unterminated string: the previous object ended at the '}'
+                        self.resyncs += 1
+                        end = len(self._buffer) - len(tail) + boundary.start() + 1
+                        completed.extend(self._emit(''.join(self._buffer[:end])))
+                        self._start_object('{"', in_string=True)
+                    else:
+                        self._in_string = False
+                        self._last_token = char
+                continue
+
+            if char.isspace():
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char == '{' and self._stack[-1] == '{' and self._last_token == ',':
+                # Unclosed object: close what was read so far and start over at this brace
+                self.resyncs += 1
+                head = ''.join(self._buffer[:-1]).rstrip().rstrip(',')
+                completed.extend(self._emit(head + ''.join(_CLOSERS[c] for c in reversed(self._stack))))
+                self._start_object()
+                continue
+            elif char in '{[':
+                self._stack.append(char)
+            elif char in '}]':
+                self._stack.pop()
+                if not self._stack:
+                    completed.extend(self._emit(''.join(self._buffer)))
+                    self._buffer = []
+            self._last_token = char
+        return completed
+
+    def _emit(self, raw: str) -> List[Dict]:
+        """Decode one complete object, repairing it if needed"""
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError:
+            try:
+                obj = json.loads(_repair_object(raw))
+                self.objects_repaired += 1
+            except json.JSONDecodeError as e:
+                self.objects_dropped += 1
+                logger.warning(f"⚠️ Dropped malformed MCQ object: {str(e)[:80]}")
+                return []
+
+        # Wrapper objects such as {"questions": [...]} carry the MCQs in a list
+        if isinstance(obj, dict) and 'question' not in obj:
+            for value in obj.values():
+                if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+                    self.objects_parsed += len(value)
+                    return value
+            self.objects_dropped += 1
+            return []
+
+        self.objects_parsed += 1
+        return [obj]
+
+    @property
+    def has_partial(self) -> bool:
+        """Whether an object was still open when the stream ended"""
+        return bool(self._stack)
+
+
+def parse_mcq_objects(text: str) -> List[Dict]:
+    """Parse every recoverable question object from a complete response"""
+    return IncrementalMCQParser().feed(text)
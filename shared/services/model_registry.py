@@ -0,0 +1,198 @@
+"""
+Model Registry
+Lazily loaded, process-wide heavy components (CLIP weights, the ChromaDB-backed RAG
+service). Each component is built at most once: the first caller of get() runs its
+loader under the component's lock while concurrent callers wait for the same result.
+
+warm_up() loads components on a background thread at boot so the first request does
+not pay for them; status() reports each component as not_loaded / warming / ready /
+failed for /health and the /ready readiness signal. This module imports nothing heavy,
+so those endpoints can read it without loading any model.
+
+Forked children (gunicorn workers forked after the master touched the registry) get
+fresh locks, and components the parent was still warming are reset to not_loaded:
+the thread loading them does not exist in the child. Loaded values are kept.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = 'not_loaded'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class _Component:
+    def __init__(self, name: str, loader: Callable, retry: bool, retry_after: float):
+        self.name = name
+        self.loader = loader
+        self.retry = retry
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.state = NOT_LOADED
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.retry_at = 0.0  # time.monotonic() before which a failed load is not retried
+
+
+class ModelRegistry:
+    """Thread-safe registry of lazily built components"""
+
+    def __init__(self):
+        self._components: Dict[str, _Component] = {}
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    def register(self, name: str, loader: Callable, retry: bool = False, retry_after: float = 0.0) -> bool:
+        """
+        Register a component loader (no-op when the name is already registered)
+
+        Args:
+            retry: Run the loader again after a failure (otherwise a failure is
+                   remembered until reset())
+            retry_after: Seconds after a failure during which get() fails fast
+                   instead of running the loader again
+
+        Returns:
+            True if the loader was registered by this call
+        """
+        if name in self._components:
+            return False
+        with self._lock:
+            if name in self._components:
+                return False
+            self._components[name] = _Component(name, loader, retry, retry_after)
+            return True
+
+    def get(self, name: str):
+        """
+        Get a component, loading it on first use
+
+        Raises:
+            KeyError: The component is not registered
+            RuntimeError: The loader failed (now, or on an earlier attempt that is not
+                          due for a retry yet)
+        """
+        component = self._components[name]
+        if component.state != READY and not self._failed_recently(component):
+            with component.lock:
+                if component.state != READY and not self._failed_recently(component):
+                    self._load(component)
+        if component.state == FAILED:
+            raise RuntimeError(f"{name} failed to load: {component.error}")
+        return component.value
+
+    @staticmethod
+    def _failed_recently(component: _Component) -> bool:
+        """A failure that is remembered (no retry) or still inside its retry backoff"""
+        return component.state == FAILED and (not component.retry or time.monotonic() < component.retry_at)
+
+    @staticmethod
+    def _load(component: _Component):
+        """Run a loader (caller holds the component lock)"""
+        component.state = WARMING
+        started = time.time()
+        logger.info(f"⏳ Loading {component.name}...")
+        try:
+            component.value = component.loader()
+            component.load_seconds = round(time.time() - started, 2)
+            component.state = READY
+            logger.info(f"✅ {component.name} ready in {component.load_seconds}s")
+        except Exception as e:
+            component.error = str(e)
+            component.load_seconds = round(time.time() - started, 2)
+            component.state = FAILED
+            component.retry_at = time.monotonic() + component.retry_after
+            logger.error(f"❌ Failed to load {component.name}: {e}")
+
+    def is_ready(self, name: str) -> bool:
+        component = self._components.get(name)
+        return component is not None and component.state == READY
+
+    def reset(self, name: str):
+        """Forget a loaded or failed component so the next get() loads it again"""
+        component = self._components.get(name)
+        if component is not None:
+            with component.lock:
+                component.state = NOT_LOADED
+                component.value = None
+                component.error = None
+                component.load_seconds = None
+                component.retry_at = 0.0
+
+    def warm_up(self, names: Optional[List[str]] = None) -> threading.Thread:
+        """
+        Load components on a daemon thread, in order (default: every registered one)
+
+        Components still loading show as 'warming'; requests that need one meanwhile
+        wait on its lock instead of loading a second copy. Failed components registered
+        with retry are loaded again after their backoff until they are ready (e.g. an
+        embedding server that starts after the web workers), so readiness recovers
+        without waiting for a request.
+        """
+        with self._lock:
+            if self._warmup_thread is not None and self._warmup_thread.is_alive():
+                return self._warmup_thread
+            names = list(names or self._components.keys())
+
+            def run():
+                pending = names
+                while pending:
+                    for name in pending:
+                        try:
+                            self.get(name)
+                        except Exception:
+                            pass  # Recorded as failed in status()
+                    pending = [name for name in pending
+                               if self._components[name].state == FAILED and self._components[name].retry]
+                    if pending:
+                        next_retry = min(self._components[name].retry_at for name in pending)
+                        time.sleep(max(1.0, next_retry - time.monotonic()))
+                logger.info(f"🔥 Warm-up finished: {self.overall_state()}")
+
+            # Mark queued components so readiness reports them as warming right away
+            for name in names:
+                component = self._components[name]
+                if component.state == NOT_LOADED:
+                    component.state = WARMING
+            self._warmup_thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+            self._warmup_thread.start()
+            return self._warmup_thread
+
+    def _after_fork_in_child(self):
+        """Reset locks and in-flight state copied from the parent (only this thread survives a fork)"""
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+        for component in self._components.values():
+            component.lock = threading.Lock()
+            if component.state == WARMING:
+                component.state = NOT_LOADED
+
+    def status(self) -> Dict[str, Dict]:
+        """Per-component state, load time and error"""
+        return {
+            name: {'state': c.state, 'load_seconds': c.load_seconds, 'error': c.error}
+            for name, c in list(self._components.items())
+        }
+
+    def overall_state(self) -> str:
+        """'warming' while any component loads, 'failed' if any failed, else 'ready'"""
+        states = {c.state for c in list(self._components.values())}
+        if WARMING in states:
+            return WARMING
+        if FAILED in states:
+            return FAILED
+        return READY
+
+
+model_registry = ModelRegistry()
+
+if hasattr(os, 'register_at_fork'):  # POSIX
+    os.register_at_fork(after_in_child=model_registry._after_fork_in_child)
@@ -4,16 +4,17 @@ Processes PDFs with text and images, creates unified embeddings, and generates M
 """
 
 import os
-import io
-import base64
+import re
 import json
+import time
+import heapq
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import fitz  # PyMuPDF
-import torch
 from PIL import Image
-from transformers import CLIPModel, CLIPProcessor
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterator, Callable
 import ollama
 
 # Fix ChromaDB Pydantic validation issue BEFORE importing chromadb
@@ -37,19 +38,98 @@ os.environ['PYTHONWARNINGS'] = 'ignore::DeprecationWarning'
 import chromadb
 from chromadb.utils.embedding_functions import EmbeddingFunction
 
+from config import Config
+from shared.services.pdf_page_parser import (chunk_page_text, decode_pdf_image, make_doc_id, make_image_id,
+                                             merge_overlapping_chunks)
+from shared.services.index_metadata import IndexMetadata, compute_file_checksum
+from shared.services.image_store import ImageStore, IMAGE_STORE_FILENAME
+from shared.services.embedding_cache import EmbeddingCache
+from shared.services.semantic_response_cache import SemanticResponseCache
+from shared.services.clip_backends import load_clip_backend
+from shared.services.embedding_server import RemoteClipBackend
+from shared.services.model_registry import model_registry
+from shared.services.vector_index import (ChromaVectorIndex, VectorIndex, export_chroma_collection, open_vector_index,
+                                          rescore_enabled)
+from shared.services.mcq_stream_parser import IncrementalMCQParser
+from shared.services.ollama_health_service import get_ollama_health_service
+from shared.services.ollama_pool import get_ollama_pool
+from shared.services.mcq_schema import mcq_array_schema, mcq_generation_stats, validate_question, validate_questions
+
 logger = logging.getLogger(__name__)
 
-# Initialize CLIP Model for unified embeddings
-try:
-    logger.info("Loading CLIP model...")
-    clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-    clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-    clip_model.eval()
-    CLIP_AVAILABLE = True
-    logger.info("✅ CLIP model loaded successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to load CLIP model: {e}")
-    CLIP_AVAILABLE = False
+CLIP_COMPONENT = 'clip'
+VECTOR_STORE_COMPONENT = 'vector_store'
+
+
+def _load_clip():
+    """Load the CLIP backend (MULTIMODAL_CLIP_BACKEND) and run one warm-up forward pass
+
+    With MULTIMODAL_EMBED_SERVER set, embeddings come from the shared embedding server
+    instead and this process loads no weights.
+    """
+    if Config.MULTIMODAL_EMBED_SERVER:
+        backend = RemoteClipBackend(Config.MULTIMODAL_EMBED_SERVER, Config.MULTIMODAL_EMBED_SERVER_AUTHKEY.encode(),
+                                    connect_timeout=Config.MULTIMODAL_EMBED_CONNECT_TIMEOUT,
+                                    request_timeout=Config.MULTIMODAL_EMBED_REQUEST_TIMEOUT)
+        logger.info(f"✅ Using shared embedding server at {Config.MULTIMODAL_EMBED_SERVER} ({backend.name})")
+        return backend
+
+    backend = load_clip_backend(
+        Config.MULTIMODAL_CLIP_BACKEND,
+        Config.MULTIMODAL_CLIP_MODEL,
+        onnx_root=Config.MULTIMODAL_CLIP_ONNX_PATH,
+        num_threads=Config.MULTIMODAL_CLIP_THREADS
+    )
+    backend.text_features(["warm up"])
+    logger.info(f"✅ CLIP model loaded successfully ({backend.name})")
+    return backend
+
+
+# CLIP weights are loaded on first use (or by warm_up_multimodal), not at import
+# A remote server that is still starting is retried, at most every MULTIMODAL_LOAD_RETRY_SECONDS
+model_registry.register(CLIP_COMPONENT, _load_clip, retry=bool(Config.MULTIMODAL_EMBED_SERVER),
+                        retry_after=Config.MULTIMODAL_LOAD_RETRY_SECONDS)
+
+
+def get_clip_backend():
+    """Get the process-wide CLIP backend, loading it on first use"""
+    try:
+        return model_registry.get(CLIP_COMPONENT)
+    except RuntimeError as e:
+        raise RuntimeError(f"CLIP model not available: {e}")
+
+
+def clip_available() -> bool:
+    """Load CLIP if needed and report whether it is usable"""
+    try:
+        get_clip_backend()
+        return True
+    except RuntimeError:
+        return False
+
+
+def __getattr__(name):
+    # CLIP_AVAILABLE used to be set at import; resolve it lazily for existing importers
+    if name == 'CLIP_AVAILABLE':
+        return clip_available()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Per-worker cache of query embeddings (subject names, repeated chatbot questions)
+query_embedding_cache = EmbeddingCache(
+    max_size=Config.MULTIMODAL_QUERY_CACHE_SIZE,
+    ttl_seconds=Config.MULTIMODAL_QUERY_CACHE_TTL,
+    disk_path=Config.MULTIMODAL_QUERY_CACHE_DISK_PATH or None,
+    # Quantized backends produce slightly different vectors, so they get their own entries
+    namespace=Config.MULTIMODAL_CLIP_MODEL if Config.MULTIMODAL_CLIP_BACKEND == 'torch'
+    else f"{Config.MULTIMODAL_CLIP_MODEL}:{Config.MULTIMODAL_CLIP_BACKEND}"
+)
+
+# Per-worker semantic cache of chatbot answers, keyed on the CLIP query embedding
+chat_response_cache = SemanticResponseCache(
+    max_size=Config.CHAT_RESPONSE_CACHE_SIZE,
+    ttl_seconds=Config.CHAT_RESPONSE_CACHE_TTL,
+    threshold=Config.CHAT_RESPONSE_CACHE_THRESHOLD
+)
 
 
 class CLIPEmbeddingFunction(EmbeddingFunction):
@@ -57,10 +137,15 @@ class CLIPEmbeddingFunction(EmbeddingFunction):
 
     def __call__(self, input: List[str]) -> List[List[float]]:
         """Embed texts using CLIP"""
+        try:
+            return embed_texts(list(input)).tolist()
+        except Exception as e:
+            logger.warning(f"Batched embedding failed, falling back to per-text embedding: {e}")
+
         embeddings = []
         for text in input:
             try:
-                embedding = embed_text(text)
+                embedding = embed_text(text, use_cache=False)
                 embeddings.append(embedding.tolist())
             except Exception as e:
                 logger.error(f"Error embedding text: {e}")
@@ -70,119 +155,266 @@ class CLIPEmbeddingFunction(EmbeddingFunction):
 
 def embed_image(image_data) -> np.ndarray:
     """Embed image using CLIP"""
-    if not CLIP_AVAILABLE:
-        raise RuntimeError("CLIP model not available")
-    
+    clip_backend = get_clip_backend()
+
     if isinstance(image_data, str):
         image = Image.open(image_data).convert("RGB")
     else:
         image = image_data
 
-    inputs = clip_processor(images=image, return_tensors="pt")
-    with torch.no_grad():
-        features = clip_model.get_image_features(**inputs)
-        features = features / features.norm(dim=-1, keepdim=True)
-    return features.squeeze().numpy()
+    return clip_backend.image_features([image])[0]
 
 
-def embed_text(text: str) -> np.ndarray:
-    """Embed text using CLIP"""
-    if not CLIP_AVAILABLE:
-        raise RuntimeError("CLIP model not available")
-    
-    inputs = clip_processor(
-        text=text,
-        return_tensors="pt",
-        padding=True,
-        truncation=True,
-        max_length=77
-    )
-    with torch.no_grad():
-        features = clip_model.get_text_features(**inputs)
-        features = features / features.norm(dim=-1, keepdim=True)
-    return features.squeeze().numpy()
+def embed_images(images: List, batch_size: Optional[int] = None) -> np.ndarray:
+    """Embed a list of images (PIL images or file paths) using CLIP, one forward pass per batch
+
+    Returns an array of shape (len(images), dim) in input order.
+    """
+    clip_backend = get_clip_backend()
+
+    if not images:
+        return np.empty((0, clip_backend.projection_dim), dtype=np.float32)
+
+    batch_size = batch_size or Config.MULTIMODAL_IMAGE_BATCH_SIZE
+    batches = []
+    for start in range(0, len(images), batch_size):
+        batch = [
+            Image.open(image).convert("RGB") if isinstance(image, str) else image
+            for image in images[start:start + batch_size]
+        ]
+        batches.append(clip_backend.image_features(batch))
+
+    return np.concatenate(batches, axis=0)
+
+
+def embed_text(text: str, use_cache: bool = True) -> np.ndarray:
+    """Embed text using CLIP
+
+    Results are served from / stored in query_embedding_cache when ``use_cache`` is set;
+    indexing paths pass use_cache=False so document chunks don't evict hot queries.
+    """
+    if use_cache:
+        cached = query_embedding_cache.get(text)
+        if cached is not None:
+            return cached
+
+    embedding = get_clip_backend().text_features([text])[0]
+
+    if use_cache:
+        query_embedding_cache.put(text, embedding)
+    return embedding
+
+
+def get_query_cache_stats() -> Dict:
+    """Get hit/miss counters of the query embedding cache"""
+    return query_embedding_cache.stats()
+
 
+def get_chat_cache_stats() -> Dict:
+    """Get hit/miss counters of the semantic chat response cache"""
+    return chat_response_cache.stats()
 
-def chunk_text(text: str, chunk_size: int = 500, chunk_overlap: int = 100) -> List[str]:
-    """Chunk text using character-based splitting"""
-    chunks = []
-    start = 0
-    text_len = len(text)
 
-    while start < text_len:
-        end = start + chunk_size
-        chunk = text[start:end]
-        if chunk.strip():
-            chunks.append(chunk)
-        start += chunk_size - chunk_overlap
+def embed_texts(texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+    """Embed a list of texts using CLIP, one tokenizer call and one forward pass per batch
 
-    return chunks
+    Returns an array of shape (len(texts), dim) in input order. Padding positions
+    are masked out by CLIP, so each row matches embed_text() for the same text within
+    clip_backends.BATCH_PARITY_ATOL (fp32 backends) or BATCH_PARITY_MIN_COSINE (int8).
+    """
+    clip_backend = get_clip_backend()
 
+    if not texts:
+        return np.empty((0, clip_backend.projection_dim), dtype=np.float32)
 
-def process_pdf(pdf_path: str, chunk_size: int = 500, chunk_overlap: int = 100) -> Tuple[List[Dict], List[np.ndarray], Dict]:
-    """Process PDF and extract text and images with embeddings"""
+    batch_size = batch_size or Config.MULTIMODAL_EMBED_BATCH_SIZE
+    batches = []
+    for start in range(0, len(texts), batch_size):
+        batches.append(clip_backend.text_features(texts[start:start + batch_size]))
+
+    return np.concatenate(batches, axis=0)
+
+
+def process_pdf(pdf_path: str, chunk_size: int = 500, chunk_overlap: int = 100,
+                embed_batch_size: Optional[int] = None,
+                image_batch_size: Optional[int] = None) -> Tuple[List[Dict], List[np.ndarray], Dict]:
+    """Process PDF and extract text and images with embeddings
+
+    Text is chunked with Config.MULTIMODAL_CHUNKING (see chunk_page_text); each chunk's
+    embedding window is queued and embedded in batches of ``embed_batch_size``
+    (default: Config.MULTIMODAL_EMBED_BATCH_SIZE). Images are decoded and
+    base64-encoded in a thread pool and embedded in batches of
+    ``image_batch_size`` (default: Config.MULTIMODAL_IMAGE_BATCH_SIZE).
+    Document order is preserved.
+    """
     logger.info(f"📄 Processing PDF: {pdf_path}")
     
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF not found: {pdf_path}")
     
+    embed_batch_size = embed_batch_size or Config.MULTIMODAL_EMBED_BATCH_SIZE
+    image_batch_size = image_batch_size or Config.MULTIMODAL_IMAGE_BATCH_SIZE
+    pdf_file = os.path.basename(pdf_path)
     doc = fitz.open(pdf_path)
     all_docs = []
     all_embeddings = []
     image_data_store = {}
 
+    # Text chunks waiting for a batched forward pass: (slot in all_docs, text)
+    pending_texts = []
+
+    def flush_texts():
+        if not pending_texts:
+            return
+        slots = [slot for slot, _ in pending_texts]
+        texts = [text for _, text in pending_texts]
+        try:
+            embeddings = embed_texts(texts, embed_batch_size)
+            for slot, embedding in zip(slots, embeddings):
+                all_embeddings[slot] = embedding
+        except Exception as e:
+            logger.warning(f"Batched text embedding failed, retrying per chunk: {e}")
+            for slot, text in pending_texts:
+                try:
+                    all_embeddings[slot] = embed_text(text, use_cache=False)
+                except Exception as chunk_error:
+                    logger.error(f"Error processing text chunk: {chunk_error}")
+        pending_texts.clear()
+
+    # Images being decoded in the pool: (slot in all_docs, image_id, future)
+    pending_images = []
+
+    def flush_images(limit: Optional[int] = None):
+        """Embed the oldest ``limit`` pending images (all when limit is None)"""
+        batch = pending_images[:limit] if limit else list(pending_images)
+        del pending_images[:len(batch)]
+        ready = []
+        for slot, image_id, future in batch:
+            try:
+                pil_image, img_base64 = future.result()
+                image_data_store[image_id] = img_base64
+                ready.append((slot, pil_image))
+            except Exception as e:
+                logger.error(f"Error decoding image {image_id}: {e}")
+        if not ready:
+            return
+        try:
+            embeddings = embed_images([pil_image for _, pil_image in ready], image_batch_size)
+            for (slot, _), embedding in zip(ready, embeddings):
+                all_embeddings[slot] = embedding
+        except Exception as e:
+            logger.warning(f"Batched image embedding failed, retrying per image: {e}")
+            for slot, pil_image in ready:
+                try:
+                    all_embeddings[slot] = embed_image(pil_image)
+                except Exception as image_error:
+                    logger.error(f"Error embedding image: {image_error}")
+
+    decode_pool = ThreadPoolExecutor(
+        max_workers=Config.MULTIMODAL_IMAGE_DECODE_WORKERS,
+        thread_name_prefix="pdf-image-decode"
+    )
+
     for i, page in enumerate(doc):
         logger.info(f"Processing page {i+1}/{len(doc)}")
 
         # Process text
         text = page.get_text()
         if text.strip():
-            text_chunks = chunk_text(text, chunk_size, chunk_overlap)
-            for chunk_idx, chunk in enumerate(text_chunks):
-                try:
-                    embedding = embed_text(chunk)
-                    all_embeddings.append(embedding)
-                    all_docs.append({
-                        "content": chunk,
-                        "page": i,
-                        "type": "text",
-                        "chunk_index": chunk_idx
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing text chunk: {e}")
+            text_chunks = chunk_page_text(text, chunk_size, chunk_overlap)
+            for chunk_idx, (window, chunk, (span_start, span_end)) in enumerate(text_chunks):
+                pending_texts.append((len(all_docs), window))
+                all_embeddings.append(None)
+                all_docs.append({
+                    "content": chunk,
+                    "page": i,
+                    "type": "text",
+                    "chunk_index": chunk_idx,
+                    "span_start": span_start,
+                    "span_end": span_end,
+                    "pdf_file": pdf_file
+                })
+                if len(pending_texts) >= embed_batch_size:
+                    flush_texts()
 
-        # Process images
+        # Process images: extraction stays on this thread (PyMuPDF documents are
+        # not thread-safe); decode, RGB conversion and base64 run in the pool
         for img_index, img in enumerate(page.get_images(full=True)):
             try:
                 xref = img[0]
                 base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                pil_image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-                image_id = f"page_{i}_img_{img_index}"
-
-                # Store as base64
-                buffered = io.BytesIO()
-                pil_image.save(buffered, format="PNG")
-                img_base64 = base64.b64encode(buffered.getvalue()).decode()
-                image_data_store[image_id] = img_base64
-
-                # Embed image
-                embedding = embed_image(pil_image)
-                all_embeddings.append(embedding)
+                image_id = make_image_id(pdf_file, i, img_index)
+                future = decode_pool.submit(decode_pdf_image, base_image["image"])
+                pending_images.append((len(all_docs), image_id, future))
+                all_embeddings.append(None)
                 all_docs.append({
                     "content": f"[Image: {image_id}]",
                     "page": i,
                     "type": "image",
-                    "image_id": image_id
+                    "image_id": image_id,
+                    "pdf_file": pdf_file
                 })
+                # Keep one batch decoding in the pool while the previous one is embedded
+                if len(pending_images) >= 2 * image_batch_size:
+                    flush_images(image_batch_size)
             except Exception as e:
                 logger.error(f"Error processing image {img_index} on page {i}: {e}")
 
+    flush_texts()
+    flush_images()
+    decode_pool.shutdown(wait=True)
     doc.close()
+
+    # Drop chunks and images whose embedding failed so docs and embeddings stay aligned
+    kept = [idx for idx, embedding in enumerate(all_embeddings) if embedding is not None]
+    all_docs = [all_docs[idx] for idx in kept]
+    all_embeddings = [all_embeddings[idx] for idx in kept]
+
     logger.info(f"✅ Processed {len(all_docs)} documents")
     return all_docs, all_embeddings, image_data_store
 
 
+def make_doc_ids(all_docs: List[Dict], image_data_store: Dict) -> List[str]:
+    """Build stable content-derived ids (file + page + chunk hash) for processed documents"""
+    ids = []
+    for doc in all_docs:
+        if doc["type"] == "image":
+            chunk_key = f"image:{doc['image_id']}"
+            content = image_data_store.get(doc["image_id"], doc["content"])
+        else:
+            chunk_key = f"text:{doc.get('chunk_index', 0)}"
+            content = doc["content"]
+        ids.append(make_doc_id(doc.get("pdf_file", ""), doc["page"], chunk_key, content))
+    return ids
+
+
+LEGACY_DOC_ID = re.compile(r"doc_\d+")
+
+
+def purge_legacy_doc_ids(collection, subject: str, index_metadata: IndexMetadata) -> int:
+    """One-time removal of the positional doc_<n> ids written before content-derived ids
+
+    Those rows are never matched by an upsert, so they would otherwise be served next to
+    their re-indexed copies. When any are deleted, the subject's checksums are forgotten
+    so its PDFs are re-indexed under the new ids on this run.
+
+    Returns:
+        Number of rows deleted (0 once the subject is marked as migrated)
+    """
+    if index_metadata.ids_migrated(subject):
+        return 0
+
+    legacy_ids = [doc_id for doc_id in collection.get(include=[])["ids"] if LEGACY_DOC_ID.fullmatch(doc_id)]
+    batch_size = Config.MULTIMODAL_BATCH_SIZE
+    for i in range(0, len(legacy_ids), batch_size):
+        collection.delete(ids=legacy_ids[i:i + batch_size])
+    if legacy_ids:
+        logger.info(f"🧹 Purged {len(legacy_ids)} legacy doc_<n> rows from {collection.name}; re-indexing {subject}")
+    index_metadata.mark_ids_migrated(subject, forget_checksums=bool(legacy_ids))
+    index_metadata.save()
+    return len(legacy_ids)
+
+
 class MultimodalRAGService:
     """Main multimodal RAG service"""
 
@@ -205,7 +437,15 @@ class MultimodalRAGService:
             raise
 
         self.collections = {}
-        self.image_stores = {}
+        self.vector_indexes: Dict[str, VectorIndex] = {}  # Per-collection search backend (Config.MULTIMODAL_VECTOR_BACKEND)
+        self._vector_index_retry_at: Dict[str, float] = {}  # Collections served by a ChromaDB fallback -> next mmap check
+        self._collection_version = None  # (version, computed_at) memo for the chat response cache
+        # Shared pool for concurrent per-collection queries (retrieve_across_collections)
+        self._retrieval_executor = ThreadPoolExecutor(
+            max_workers=Config.MULTIMODAL_RETRIEVAL_WORKERS, thread_name_prefix="collection-query"
+        )
+        # Images referenced by image rows, persisted next to the ChromaDB data
+        self.image_store = ImageStore(os.path.join(chromadb_path, IMAGE_STORE_FILENAME))
 
         # Load existing collections from ChromaDB
         self._load_existing_collections()
@@ -234,73 +474,225 @@ class MultimodalRAGService:
                         )
 
                     self.collections[collection_name] = col
-                    doc_count = col.count()
-                    logger.info(f"✅ Loaded collection: {collection_name} with {doc_count} documents")
+                    logger.info(f"✅ Loaded collection: {collection_name}")
                 except Exception as e:
                     logger.warning(f"Failed to load collection {collection_name}: {e}")
         except Exception as e:
             logger.warning(f"Error loading existing collections: {e}")
 
-    def initialize_subject_collection(self, subject: str, pdf_path: str, chunk_size: int = 500, chunk_overlap: int = 100):
-        """Initialize ChromaDB collection for a subject"""
-        logger.info(f"Initializing collection for subject: {subject}")
-        
-        # Process PDF
-        all_docs, all_embeddings, image_data_store = process_pdf(pdf_path, chunk_size, chunk_overlap)
-        
-        # Create collection
+    def initialize_subject_collection(self, subject: str, pdf_path: str, chunk_size: int = 500, chunk_overlap: int = 100,
+                                      index_metadata: Optional[IndexMetadata] = None, force: bool = False) -> Dict:
+        """Index a subject PDF into its ChromaDB collection, incrementally
+
+        The PDF is skipped when its checksum matches pdfs/index_metadata.json. Otherwise it
+        is re-parsed, its rows are upserted under content-derived ids, and rows from the
+        previous version of the file that no longer exist are deleted.
+
+        Returns:
+            Dict with status ('skipped' or 'indexed') and added/deleted row counts
+        """
+        subject_key = subject.lower()
+        pdf_file = os.path.basename(pdf_path)
+        index_metadata = index_metadata or IndexMetadata()
+        logger.info(f"Initializing collection for subject: {subject} ({pdf_file})")
+
         collection = self.client.get_or_create_collection(
-            name=subject.lower(),
+            name=subject_key,
             embedding_function=CLIPEmbeddingFunction(),
             metadata={"description": f"Multimodal embeddings for {subject}"}
         )
+        self.collections[subject_key] = collection
+        purge_legacy_doc_ids(collection, subject, index_metadata)
 
-        # Add to ChromaDB
-        ids = [f"doc_{i}" for i in range(len(all_docs))]
+        checksum = compute_file_checksum(pdf_path)
+        if not force and not index_metadata.is_changed(subject, pdf_path, checksum):
+            logger.info(f"⏭️ {pdf_file} unchanged since last index, skipping")
+            return {"success": True, "status": "skipped", "added": 0, "deleted": 0}
+
+        # Process PDF
+        all_docs, all_embeddings, image_data_store = process_pdf(pdf_path, chunk_size, chunk_overlap)
+
+        ids = make_doc_ids(all_docs, image_data_store)
         documents = [doc["content"] for doc in all_docs]
         metadatas = [{k: v for k, v in doc.items() if k != "content"} for doc in all_docs]
         embeddings = [emb.tolist() for emb in all_embeddings]
 
-        batch_size = 100
+        # Ids of this file's rows from the previous index run
+        previous_ids = set(collection.get(where={"pdf_file": pdf_file}, include=[])["ids"])
+
+        batch_size = Config.MULTIMODAL_BATCH_SIZE
         for i in range(0, len(ids), batch_size):
             batch_end = min(i + batch_size, len(ids))
-            collection.add(
+            collection.upsert(
                 ids=ids[i:batch_end],
                 documents=documents[i:batch_end],
                 metadatas=metadatas[i:batch_end],
                 embeddings=embeddings[i:batch_end]
             )
 
-        self.collections[subject.lower()] = collection
-        self.image_stores[subject.lower()] = image_data_store
-        logger.info(f"✅ Collection initialized for {subject} with {len(all_docs)} documents")
+        stale_ids = sorted(previous_ids - set(ids))
+        for i in range(0, len(stale_ids), batch_size):
+            collection.delete(ids=stale_ids[i:i + batch_size])
+
+        self.image_store.put_many(subject_key, image_data_store, pdf_file=pdf_file)
+        self.image_store.delete_file(subject_key, pdf_file, keep=image_data_store.keys())
 
-    def retrieve_multimodal(self, query: str, subject: str, k: int = 5) -> List[Dict]:
-        """Retrieve relevant documents using CLIP embeddings"""
+        index_metadata.record_file(subject, pdf_path, checksum)
+        index_metadata.update_collection_info(subject, collection.name, collection.count())
+        index_metadata.save()
+        self._collection_version = None
+        self._refresh_vector_index(subject_key)
+
+        logger.info(f"✅ Collection updated for {subject}: {len(ids)} documents upserted, "
+                    f"{len(stale_ids)} stale documents removed")
+        return {"success": True, "status": "indexed", "added": len(ids), "deleted": len(stale_ids)}
+
+    def remove_pdf_from_collection(self, subject: str, pdf_file: str,
+                                   index_metadata: Optional[IndexMetadata] = None) -> int:
+        """Delete all rows of a PDF that was removed from the subject folder"""
+        subject_key = subject.lower()
+        pdf_file = os.path.basename(pdf_file)
+        index_metadata = index_metadata or IndexMetadata()
+
+        deleted = 0
+        collection = self.collections.get(subject_key)
+        if collection is not None:
+            stale_ids = collection.get(where={"pdf_file": pdf_file}, include=[])["ids"]
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+            deleted = len(stale_ids)
+            index_metadata.update_collection_info(subject, collection.name, collection.count())
+
+        self.image_store.delete_file(subject_key, pdf_file)
+        index_metadata.forget_file(subject, pdf_file)
+        index_metadata.save()
+        self._collection_version = None
+        self._refresh_vector_index(subject_key)
+        logger.info(f"🗑️ Removed {deleted} documents of {pdf_file} from {subject_key}")
+        return deleted
+
+    def _vector_index(self, collection_name: str) -> VectorIndex:
+        """Get the vector index of a collection for the configured backend (opened once)
+
+        A ChromaDB fallback for a missing or unreadable mmap export is only kept for
+        MULTIMODAL_MMAP_RETRY_SECONDS; the export is looked for again after that.
+        """
+        index = self.vector_indexes.get(collection_name)
+        if index is None or (collection_name in self._vector_index_retry_at
+                             and time.time() >= self._vector_index_retry_at[collection_name]):
+            index = open_vector_index(Config.MULTIMODAL_VECTOR_BACKEND, self.collections[collection_name],
+                                      Config.MULTIMODAL_MMAP_INDEX_PATH, Config.MULTIMODAL_RESCORE_FACTOR)
+            if Config.MULTIMODAL_VECTOR_BACKEND == 'mmap' and isinstance(index, ChromaVectorIndex):
+                self._vector_index_retry_at[collection_name] = time.time() + Config.MULTIMODAL_MMAP_RETRY_SECONDS
+            else:
+                self._vector_index_retry_at.pop(collection_name, None)
+            self.vector_indexes[collection_name] = index
+        return index
+
+    def _refresh_vector_index(self, collection_name: str):
+        """Re-export a changed collection for the mmap backend and drop its cached index"""
+        if Config.MULTIMODAL_VECTOR_BACKEND == 'mmap' and collection_name in self.collections:
+            try:
+                export_chroma_collection(self.collections[collection_name], Config.MULTIMODAL_MMAP_INDEX_PATH,
+                                         dtype=Config.MULTIMODAL_VECTOR_DTYPE,
+                                         rescore=rescore_enabled(Config.MULTIMODAL_VECTOR_RESCORE,
+                                                                 Config.MULTIMODAL_VECTOR_DTYPE))
+            except Exception as e:
+                logger.error(f"❌ Failed to export mmap index for {collection_name}: {e}")
+        self.vector_indexes.pop(collection_name, None)
+
+    def _query_collection(self, collection_name: str, query_embedding: List[float], k: int,
+                          where: Optional[Dict] = None, rescore: Optional[bool] = None) -> List[Dict]:
+        """Query one collection with a precomputed embedding"""
+        return self._vector_index(collection_name).query(query_embedding, k, where, rescore)
+
+    def retrieve_multimodal(self, query: str, subject: str, k: int = 5, where: Optional[Dict] = None,
+                            rescore: Optional[bool] = None) -> List[Dict]:
+        """Retrieve relevant documents using CLIP embeddings
+
+        Args:
+            where: Optional metadata filter on ``type``/``page`` (ChromaDB where syntax)
+            rescore: Re-rank quantized mmap candidates with float32 scores
+                     (None = on when MULTIMODAL_RESCORE_FACTOR > 0)
+        """
         subject_key = subject.lower()
         if subject_key not in self.collections:
             logger.warning(f"Collection not found for subject: {subject}")
             return []
 
         query_embedding = embed_text(query)
-        collection = self.collections[subject_key]
-        
-        results = collection.query(
-            query_embeddings=[query_embedding.tolist()],
-            n_results=k
+        return self._query_collection(subject_key, query_embedding.tolist(), k, where, rescore)
+
+    def retrieve_across_collections(self, query: str, k: int = 5,
+                                    collections: Optional[List[str]] = None) -> List[Dict]:
+        """Retrieve the global top-k documents over several collections
+
+        The query is embedded once, every collection is queried concurrently for its own
+        top-k, and the results are merged by distance, so the best matches win regardless
+        of which collection they come from.
+
+        Args:
+            query: Query text
+            k: Number of documents to return
+            collections: Collection names to search (default: all)
+        """
+        names = [name for name in (collections or list(self.collections.keys())) if name in self.collections]
+        if not names:
+            return []
+
+        query_embedding = embed_text(query).tolist()
+
+        def search(collection_name: str) -> List[Dict]:
+            try:
+                return self._query_collection(collection_name, query_embedding, k)
+            except Exception as e:
+                logger.warning(f"  ❌ Error searching {collection_name}: {e}")
+                return []
+
+        per_collection = list(self._retrieval_executor.map(search, names))
+        candidates = (doc for docs in per_collection for doc in docs)
+        return heapq.nsmallest(
+            k, candidates,
+            key=lambda doc: doc["distance"] if doc["distance"] is not None else float("inf")
         )
 
-        retrieved_docs = []
-        for i in range(len(results["ids"][0])):
-            retrieved_docs.append({
-                "content": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i],
-                "distance": results["distances"][0][i] if "distances" in results else None
-            })
+    def retrieve_mcq_context(self, query: str, subject: str, k: int = 5) -> List[Dict]:
+        """Retrieve MCQ context from the subject collection, falling back to all collections"""
+        retrieved_docs = self.retrieve_multimodal(query, subject, k=k)
+
+        # If no docs found in specific subject, search across all collections
+        if not retrieved_docs:
+            logger.warning(f"⚠️ No docs found in '{subject}', searching across all collections...")
+            retrieved_docs = self.retrieve_across_collections(query, k=k)
 
         return retrieved_docs
 
-    def generate_mcq_chunk(self, query: str, subject: str, num_questions: int = 5, chunk_num: int = 1) -> Dict:
+    @staticmethod
+    def partition_context(docs: List[Dict], num_chunks: int, per_chunk: int) -> List[List[Dict]]:
+        """Split a ranked candidate pool into one context slice per chunk
+
+        Slices are strided (chunk i gets ranks i, i + num_chunks, ...) so every chunk
+        mixes strong and weaker matches and no two chunks share a doc while the pool
+        is large enough. Smaller pools wrap around so every chunk still gets context.
+        """
+        if not docs:
+            return [[] for _ in range(num_chunks)]
+
+        slices = []
+        for chunk_idx in range(num_chunks):
+            picked = []
+            seen = set()
+            for j in range(per_chunk):
+                pos = (chunk_idx + j * num_chunks) % len(docs)
+                if pos not in seen:
+                    seen.add(pos)
+                    picked.append(docs[pos])
+            slices.append(picked)
+        return slices
+
+    def generate_mcq_chunk(self, query: str, subject: str, num_questions: int = 5, chunk_num: int = 1,
+                           context_docs: Optional[List[Dict]] = None,
+                           on_question: Optional[Callable[[Dict], None]] = None) -> Dict:
         """Generate a chunk of MCQ questions (5 at a time to avoid timeout)
 
         Args:
@@ -308,33 +700,21 @@ class MultimodalRAGService:
             subject: Subject name
             num_questions: Number of questions to generate (default 5)
             chunk_num: Chunk number for logging
+            context_docs: Pre-retrieved context for this chunk; retrieved here if None
+            on_question: Called with each question as soon as it is parsed from the stream
         """
         try:
-            subject_key = subject.lower()
-
             logger.info(f"🔄 Generating chunk {chunk_num}: {num_questions} questions for {subject}...")
 
-            # Retrieve docs for this chunk
-            retrieved_docs = self.retrieve_multimodal(query, subject, k=5)
-
-            # If no docs found in specific subject, search across all collections
+            # Retrieve docs for this chunk unless the caller already did
+            retrieved_docs = context_docs
             if not retrieved_docs:
-                logger.warning(f"⚠️ No docs found in '{subject}', searching across all collections...")
-
-                all_docs = []
-                for collection_name in self.collections.keys():
-                    try:
-                        docs = self.retrieve_multimodal(query, collection_name, k=3)
-                        if docs:
-                            all_docs.extend(docs)
-                    except Exception as e:
-                        logger.warning(f"  ❌ Error searching {collection_name}: {e}")
+                retrieved_docs = merge_overlapping_chunks(
+                    self.retrieve_mcq_context(query, subject, k=Config.MULTIMODAL_TOP_K_RETRIEVAL))
 
-                retrieved_docs = all_docs[:5]
-
-                if not retrieved_docs:
-                    logger.error(f"❌ No content found for chunk {chunk_num}")
-                    return {"success": False, "error": f"No content found for subject: {subject}"}
+            if not retrieved_docs:
+                logger.error(f"❌ No content found for chunk {chunk_num}")
+                return {"success": False, "error": f"No content found for subject: {subject}"}
 
             # Create prompt for this chunk - SIMPLIFIED for better JSON output
             prompt_parts = [
@@ -357,8 +737,10 @@ class MultimodalRAGService:
                     prompt_parts.append(f"{doc['content']}\n")
                 elif doc["metadata"].get("type") == "image":
                     image_id = doc["metadata"].get("image_id")
-                    if image_id and image_id in self.image_stores.get(subject_key, {}):
-                        images.append(self.image_stores[subject_key][image_id])
+                    # Fallback docs from retrieve_across_collections live in other collections
+                    img_base64 = self.image_store.get(doc["collection"], image_id) if image_id else None
+                    if img_base64:
+                        images.append(img_base64)
 
             prompt_text = "".join(prompt_parts)
 
@@ -372,79 +754,62 @@ class MultimodalRAGService:
                         "image_url": f"data:image/png;base64,{img_b64}"
                     })
 
-            response = ollama.chat(model=self.ollama_model, messages=messages)
-            answer = response["message"]["content"]
-
-            logger.info(f"📝 Raw response length: {len(answer)} chars")
-
-            # Parse JSON - try multiple approaches
-            questions = None
-            import re
-
-            # Approach 1: Direct JSON parsing
-            try:
-                questions = json.loads(answer)
-                logger.info(f"✅ Direct JSON parsing successful")
-            except json.JSONDecodeError as e:
-                logger.warning(f"⚠️ Direct JSON parsing failed: {str(e)[:100]}")
-
-                # Approach 2: Remove markdown code blocks
-                try:
-                    cleaned = answer.replace("```json", "").replace("```", "").strip()
-                    questions = json.loads(cleaned)
-                    logger.info(f"✅ Cleaned markdown JSON parsing successful")
-                except json.JSONDecodeError:
-                    logger.warning(f"⚠️ Cleaned markdown parsing failed")
-
-                # Approach 3: Extract JSON array with regex
-                if not questions:
-                    try:
-                        # Find the first [ and last ]
-                        start_idx = answer.find('[')
-                        end_idx = answer.rfind(']')
-                        if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                            json_str = answer[start_idx:end_idx+1]
-                            questions = json.loads(json_str)
-                            logger.info(f"✅ Extracted JSON array successfully")
-                    except json.JSONDecodeError:
-                        logger.warning(f"⚠️ JSON array extraction failed")
-
-                # Approach 4: Try to fix common JSON issues (trailing commas, single quotes, escaped backslashes)
-                if not questions:
-                    try:
-                        # Remove trailing commas before ] or }
-                        cleaned = re.sub(r',(\s*[}\]])', r'\1', answer)
-                        # Replace single quotes with double quotes (but be careful)
-                        cleaned = cleaned.replace("'", '"')
-                        # Fix escaped underscores and other characters in JSON (e.g., \_ becomes _)
-                        # This handles cases where Ollama escapes special characters
-                        cleaned = re.sub(r'\\_', '_', cleaned)  # \_ -> _
-                        cleaned = re.sub(r'\\-', '-', cleaned)  # \- -> -
-                        cleaned = re.sub(r'\\:', ':', cleaned)  # \: -> :
-                        cleaned = re.sub(r'\\.', '.', cleaned)  # \. -> .
-                        questions = json.loads(cleaned)
-                        logger.info(f"✅ Fixed JSON syntax successfully")
-                    except json.JSONDecodeError:
-                        logger.warning(f"⚠️ JSON syntax fixing failed")
-
-                # Approach 5: Extract just the first valid JSON object/array
+            # Constrain decoding to the MCQ array schema; the prompt format stays as a hint
+            structured = Config.MULTIMODAL_STRUCTURED_OUTPUT
+            chat_kwargs = {"format": mcq_array_schema(num_questions)} if structured else {}
+
+            max_attempts = 1 + max(0, Config.MULTIMODAL_MCQ_CHUNK_RETRIES)
+            questions, answer = [], ""
+            for attempt in range(max_attempts):
+                if attempt:
+                    logger.warning(f"🔁 Retrying chunk {chunk_num} (attempt {attempt + 1}/{max_attempts})")
+
+                # Stream the response and collect each valid question as soon as its object closes
+                parser = IncrementalMCQParser()
+                questions = []
+                invalid = 0
+                answer_parts = []
+                for part in get_ollama_pool().chat(model=self.ollama_model, messages=messages, stream=True, **chat_kwargs):
+                    content = part["message"]["content"]
+                    if not content:
+                        continue
+                    answer_parts.append(content)
+                    for obj in parser.feed(content):
+                        question = validate_question(obj)
+                        if question is None:
+                            invalid += 1
+                            continue
+                        questions.append(question)
+                        if on_question:
+                            on_question(question)
+                answer = "".join(answer_parts)
+
+                logger.info(f"📝 Raw response length: {len(answer)} chars "
+                            f"({parser.objects_parsed} objects parsed, {parser.objects_repaired} repaired, "
+                            f"{parser.objects_dropped} dropped, {invalid} invalid)")
+
+                # Rare path: nothing recoverable object-by-object, fall back to whole-response repairs
+                used_fallback = False
                 if not questions:
-                    try:
-                        # Try to find valid JSON by looking for complete objects
-                        matches = re.findall(r'\[.*?\]', answer, re.DOTALL)
-                        if matches:
-                            for match in matches:
-                                try:
-                                    questions = json.loads(match)
-                                    logger.info(f"✅ Extracted first valid JSON array")
-                                    break
-                                except:
-                                    continue
-                    except Exception as e:
-                        logger.warning(f"⚠️ Regex extraction failed: {str(e)[:100]}")
+                    fallback = self._parse_mcq_response(answer)
+                    if fallback:
+                        used_fallback = True
+                        questions, fallback_invalid = validate_questions(fallback)
+                        invalid += fallback_invalid
+                        if on_question:
+                            for question in questions:
+                                on_question(question)
+
+                mcq_generation_stats.record_attempt(
+                    self.ollama_model, structured, valid=len(questions), invalid=invalid + parser.objects_dropped,
+                    used_fallback=used_fallback, is_retry=attempt > 0
+                )
+                if questions:
+                    break
 
-            # If we got questions, validate and return them
-            if questions and isinstance(questions, list) and len(questions) > 0:
+            mcq_generation_stats.record_chunk(self.ollama_model, structured, success=bool(questions))
+
+            if questions:
                 logger.info(f"✅ Chunk {chunk_num} generated: {len(questions)} questions")
                 return {"success": True, "questions": questions, "model_used": self.ollama_model}
             else:
@@ -452,10 +817,88 @@ class MultimodalRAGService:
                 logger.error(f"Raw response (first 300 chars): {answer[:300]}")
                 return {"success": False, "error": "Failed to parse MCQ JSON", "raw_response": answer[:300]}
 
+        except ConnectionError as e:
+            # The ollama client raises ConnectionError when the server is unreachable
+            get_ollama_health_service().report_failure(str(e))
+            logger.error(f"Error generating MCQ chunk {chunk_num}: {e}")
+            return {"success": False, "error": str(e)}
         except Exception as e:
             logger.error(f"Error generating MCQ chunk {chunk_num}: {e}")
             return {"success": False, "error": str(e)}
 
+    @staticmethod
+    def _parse_mcq_response(answer: str) -> Optional[List[Dict]]:
+        """Parse a complete MCQ response with increasingly aggressive whole-text repairs
+
+        Only reached when the streaming parser recovered nothing, e.g. single-quoted
+        objects, which the quote replacement below still repairs.
+        """
+        questions = None
+
+        # Approach 1: Direct JSON parsing
+        try:
+            questions = json.loads(answer)
+            logger.info(f"✅ Direct JSON parsing successful")
+        except json.JSONDecodeError as e:
+            logger.warning(f"⚠️ Direct JSON parsing failed: {str(e)[:100]}")
+
+            # Approach 2: Remove markdown code blocks
+            try:
+                cleaned = answer.replace("```json", "").replace("```", "").strip()
+                questions = json.loads(cleaned)
+                logger.info(f"✅ Cleaned markdown JSON parsing successful")
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ Cleaned markdown parsing failed")
+
+            # Approach 3: Extract JSON array with regex
+            if not questions:
+                try:
+                    # Find the first [ and last ]
+                    start_idx = answer.find('[')
+                    end_idx = answer.rfind(']')
+                    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
+                        json_str = answer[start_idx:end_idx+1]
+                        questions = json.loads(json_str)
+                        logger.info(f"✅ Extracted JSON array successfully")
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ JSON array extraction failed")
+
+            # Approach 4: Try to fix common JSON issues (trailing commas, single quotes, escaped backslashes)
+            if not questions:
+                try:
+                    # Remove trailing commas before ] or }
+                    cleaned = re.sub(r',(\s*[}\]])', r'\1', answer)
+                    # Replace single quotes with double quotes (but be careful)
+                    cleaned = cleaned.replace("'", '"')
+                    # Fix escaped underscores and other characters in JSON (e.g., \_ becomes _)
+                    # This handles cases where Ollama escapes special characters
+                    cleaned = re.sub(r'\\_', '_', cleaned)  # \_ -> _
+                    cleaned = re.sub(r'\\-', '-', cleaned)  # \- -> -
+                    cleaned = re.sub(r'\\:', ':', cleaned)  # \: -> :
+                    cleaned = re.sub(r'\\.', '.', cleaned)  # \. -> .
+                    questions = json.loads(cleaned)
+                    logger.info(f"✅ Fixed JSON syntax successfully")
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ JSON syntax fixing failed")
+
+            # Approach 5: Extract just the first valid JSON object/array
+            if not questions:
+                try:
+                    # Try to find valid JSON by looking for complete objects
+                    matches = re.findall(r'\[.*?\]', answer, re.DOTALL)
+                    if matches:
+                        for match in matches:
+                            try:
+                                questions = json.loads(match)
+                                logger.info(f"✅ Extracted first valid JSON array")
+                                break
+                            except:
+                                continue
+                except Exception as e:
+                    logger.warning(f"⚠️ Regex extraction failed: {str(e)[:100]}")
+
+        return questions
+
     def generate_mcq_initial(self, query: str, subject: str, num_questions: int = 10) -> Dict:
         """Generate initial batch of MCQ questions (10 questions)
 
@@ -486,47 +929,109 @@ class MultimodalRAGService:
             logger.error(f"Error in initial MCQ generation: {e}", exc_info=True)
             return {"success": False, "error": str(e)}
 
-    def generate_mcq(self, query: str, subject: str, num_questions: int = 50) -> Dict:
+    def generate_mcq(self, query: str, subject: str, num_questions: int = 50,
+                     max_parallel: Optional[int] = None,
+                     on_chunk: Optional[Callable[[int, int, List[Dict]], None]] = None,
+                     skip_chunks: Optional[List[int]] = None) -> Dict:
         """Generate MCQ questions in chunks (5 questions per chunk)
 
         Generates questions in chunks to avoid timeout issues with Ollama.
-        For 50 questions: generates 10 chunks of 5 questions each.
+        For 50 questions: generates 10 chunks of 5 questions each. Context is
+        retrieved once (top Config.MULTIMODAL_MCQ_CONTEXT_POOL docs) and split into
+        distinct slices per chunk. Up to ``max_parallel`` chunks (default:
+        Config.MULTIMODAL_MAX_PARALLEL_CHUNKS) are requested concurrently; questions
+        are returned in chunk order and failed chunks are skipped.
+
+        ``on_chunk(chunk_num, start_index, questions)`` is called on the calling thread
+        as soon as each successful chunk finishes (in completion order), where
+        ``start_index`` is the chunk's position in the final question list, so callers
+        can save and publish questions before the whole test is generated.
+        Chunk numbers in ``skip_chunks`` (already generated by an earlier, interrupted
+        run) are not requested again.
         """
         try:
             subject_key = subject.lower()
+            chunk_size = 5
+            num_chunks = (num_questions + chunk_size - 1) // chunk_size  # Ceiling division
+            max_parallel = max(1, min(max_parallel or Config.MULTIMODAL_MAX_PARALLEL_CHUNKS, num_chunks))
 
             # Log available collections for debugging
             logger.info(f"📚 Available collections: {list(self.collections.keys())}")
             logger.info(f"🔍 Looking for collection: {subject_key}")
-            logger.info(f"🎯 Generating {num_questions} questions in chunks of 5...")
-
-            all_questions = []
-            chunk_size = 5
-            num_chunks = (num_questions + chunk_size - 1) // chunk_size  # Ceiling division
-
-            # Generate questions in chunks
-            for chunk_num in range(1, num_chunks + 1):
+            logger.info(f"🎯 Generating {num_questions} questions in chunks of 5 ({max_parallel} in parallel)...")
+
+            # Retrieve once and give every chunk its own slice of the candidate pool
+            per_chunk = Config.MULTIMODAL_TOP_K_RETRIEVAL
+            pool_size = max(Config.MULTIMODAL_MCQ_CONTEXT_POOL, per_chunk)
+            candidate_pool = merge_overlapping_chunks(
+                self.retrieve_mcq_context(query, subject, k=min(pool_size, num_chunks * per_chunk)))
+            if not candidate_pool:
+                logger.error(f"❌ No content found for subject: {subject}")
+                return {"success": False, "error": f"No content found for subject: {subject}"}
+            context_slices = self.partition_context(candidate_pool, num_chunks, per_chunk)
+            logger.info(f"📚 Retrieved {len(candidate_pool)} candidate docs for {num_chunks} chunks")
+
+            def run_chunk(chunk_num: int) -> Dict:
                 logger.info(f"\n📝 Chunk {chunk_num}/{num_chunks}...")
+                try:
+                    return self.generate_mcq_chunk(
+                        query=query,
+                        subject=subject,
+                        num_questions=min(chunk_size, num_questions - (chunk_num - 1) * chunk_size),
+                        chunk_num=chunk_num,
+                        context_docs=context_slices[chunk_num - 1]
+                    )
+                except Exception as e:
+                    return {"success": False, "error": str(e)}
 
-                result = self.generate_mcq_chunk(
-                    query=query,
-                    subject=subject,
-                    num_questions=chunk_size,
-                    chunk_num=chunk_num
-                )
+            def publish_chunk(chunk_num: int, result: Dict):
+                if on_chunk and result.get('success') and result.get('questions'):
+                    try:
+                        on_chunk(chunk_num, (chunk_num - 1) * chunk_size, result['questions'])
+                    except Exception as e:
+                        logger.error(f"❌ on_chunk callback failed for chunk {chunk_num}: {e}", exc_info=True)
+
+            # Generate questions in chunks, keeping results in chunk order
+            skipped = set(skip_chunks or [])
+            chunk_numbers = [chunk_num for chunk_num in range(1, num_chunks + 1) if chunk_num not in skipped]
+            if skipped:
+                logger.info(f"⏭️ Resuming: skipping {len(skipped)} already generated chunks")
+            if max_parallel == 1:
+                results = []
+                for chunk_num in chunk_numbers:
+                    results.append(run_chunk(chunk_num))
+                    publish_chunk(chunk_num, results[-1])
+            else:
+                results_by_chunk = {}
+                with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="mcq-chunk") as pool:
+                    futures = {pool.submit(run_chunk, chunk_num): chunk_num for chunk_num in chunk_numbers}
+                    for future in as_completed(futures):
+                        chunk_num = futures[future]
+                        results_by_chunk[chunk_num] = future.result()
+                        publish_chunk(chunk_num, results_by_chunk[chunk_num])
+                results = [results_by_chunk[chunk_num] for chunk_num in chunk_numbers]
 
+            all_questions = []
+            failed_chunks = []
+            for chunk_num, result in zip(chunk_numbers, results):
                 if result.get('success') and result.get('questions'):
                     all_questions.extend(result['questions'])
-                    logger.info(f"✅ Total questions so far: {len(all_questions)}")
                 else:
                     error_msg = result.get('error', 'Unknown error')
                     logger.warning(f"⚠️ Chunk {chunk_num} failed: {error_msg}")
+                    failed_chunks.append(chunk_num)
                     # Continue with next chunk even if one fails
 
             # Return all generated questions
-            if all_questions:
-                logger.info(f"\n✅ MCQ generation complete: {len(all_questions)} questions generated")
-                return {"success": True, "questions": all_questions, "model_used": self.ollama_model}
+            if all_questions or (skipped and not chunk_numbers):
+                logger.info(f"\n✅ MCQ generation complete: {len(all_questions)} questions generated "
+                            f"({len(failed_chunks)}/{num_chunks} chunks failed)")
+                return {
+                    "success": True,
+                    "questions": all_questions,
+                    "model_used": self.ollama_model,
+                    "failed_chunks": failed_chunks
+                }
             else:
                 logger.error(f"❌ No questions generated after {num_chunks} chunks")
                 return {"success": False, "error": f"Failed to generate questions after {num_chunks} attempts"}
@@ -535,54 +1040,83 @@ class MultimodalRAGService:
             logger.error(f"Error in chunked MCQ generation: {e}", exc_info=True)
             return {"success": False, "error": str(e)}
 
-    def generate_chat_response(self, query: str, subject: str = None) -> Dict:
-        """Generate chat response using multimodal context from all available collections
+    def get_collection_version(self) -> str:
+        """Fingerprint of the indexed content (row counts + index metadata mtime)
 
-        For chatbot use case: searches across ALL collections to answer any educational question
-        This supports multi-subject queries like "Compare Newton's Laws with atomic structure"
+        Re-indexing in any worker changes it, which invalidates cached chat answers.
+        Memoized for Config.CHAT_RESPONSE_CACHE_VERSION_SECONDS.
         """
+        memo = self._collection_version
+        if memo is not None and time.time() - memo[1] < Config.CHAT_RESPONSE_CACHE_VERSION_SECONDS:
+            return memo[0]
+
+        parts = []
+        for name, collection in sorted(self.collections.items()):
+            try:
+                parts.append(f"{name}:{collection.count()}")
+            except Exception:
+                parts.append(f"{name}:?")
         try:
-            logger.info(f"🤖 Generating chat response for query: {query[:80]}...")
-            logger.info(f"📚 Available collections: {list(self.collections.keys())}")
+            parts.append(str(os.stat(Config.MULTIMODAL_INDEX_METADATA_PATH).st_mtime_ns))
+        except OSError:
+            pass
+        version = "|".join(parts)
+        self._collection_version = (version, time.time())
+        return version
+
+    def _lookup_chat_cache(self, query: str) -> Tuple[Optional[np.ndarray], Optional[str], Optional[Dict]]:
+        """Look a chat query up in the semantic response cache
+
+        Returns:
+            (query embedding, collection version, cached response or None); the embedding
+            is None when the cache is disabled or unavailable
+        """
+        if not chat_response_cache.enabled or not clip_available():
+            return None, None, None
+        try:
+            embedding = embed_text(query)
+            version = self.get_collection_version()
+            return embedding, version, chat_response_cache.get(embedding, version, query)
+        except Exception as e:
+            logger.warning(f"⚠️ Chat response cache lookup failed: {e}")
+            return None, None, None
 
-            # For chat, search across ALL collections to get comprehensive context
-            # This allows answering multi-subject questions
-            all_docs = []
-            docs_by_collection = {}
+    def _build_chat_prompt(self, query: str) -> Dict:
+        """Retrieve context from all collections and build the chat prompt
 
-            for collection_name in self.collections.keys():
-                try:
-                    docs = self.retrieve_multimodal(query, collection_name, k=3)
-                    if docs:
-                        all_docs.extend(docs)
-                        docs_by_collection[collection_name] = len(docs)
-                        logger.info(f"  ✅ {collection_name}: {len(docs)} relevant docs")
-                    else:
-                        logger.info(f"  ⚠️ {collection_name}: no relevant docs")
-                except Exception as e:
-                    logger.warning(f"  ❌ Error searching {collection_name}: {e}")
+        Returns:
+            {"success", "prompt", "sources_used", "docs_count"} or {"success": False, "error"}
+        """
+        logger.info(f"📚 Available collections: {list(self.collections.keys())}")
 
-            if not all_docs:
-                logger.error(f"❌ No relevant content found in any collection")
-                return {"success": False, "error": "No relevant content found in any collection"}
+        # For chat, search across ALL collections to get comprehensive context
+        # This allows answering multi-subject questions
+        # Overlapping payloads of neighbouring chunks are merged so no passage is sent twice
+        retrieved_docs = merge_overlapping_chunks(self.retrieve_across_collections(query, k=5))
 
-            # Get top 5 most relevant docs from all collections combined
-            # This ensures we have diverse context from multiple subjects if available
-            retrieved_docs = all_docs[:5]
+        if not retrieved_docs:
+            logger.error(f"❌ No relevant content found in any collection")
+            return {"success": False, "error": "No relevant content found in any collection"}
 
-            logger.info(f"✅ Retrieved {len(retrieved_docs)} relevant docs from {len(docs_by_collection)} collections")
+        # Sources are the collections that made it into the global top-k, best match first
+        docs_by_collection = {}
+        for doc in retrieved_docs:
+            docs_by_collection[doc["collection"]] = docs_by_collection.get(doc["collection"], 0) + 1
 
-            # Build context with collection information for better understanding
-            context_parts = []
-            for doc in retrieved_docs:
-                collection = doc.get("metadata", {}).get("collection", "unknown")
-                content = doc["content"]
-                context_parts.append(f"[{collection.upper()}] {content}")
+        logger.info(f"✅ Retrieved {len(retrieved_docs)} relevant docs from {len(docs_by_collection)} collections: "
+                    f"{docs_by_collection}")
+
+        # Build context with collection information for better understanding
+        context_parts = []
+        for doc in retrieved_docs:
+            collection = doc.get("collection") or doc.get("metadata", {}).get("collection", "unknown")
+            content = doc["content"]
+            context_parts.append(f"[{collection.upper()}] {content}")
 
-            context = "\n\n".join(context_parts)
+        context = "\n\n".join(context_parts)
 
-            # Enhanced prompt for multi-subject educational queries
-            prompt = f"""You are an expert educational tutor for competitive exams (JEE, NEET, etc.).
+        # Enhanced prompt for multi-subject educational queries
+        prompt = f"""You are an expert educational tutor for competitive exams (JEE, NEET, etc.).
 Answer the following question comprehensively using the provided educational context.
 If the question involves multiple subjects, provide answers for each subject mentioned.
 Keep the answer clear, concise, and suitable for exam preparation.
@@ -594,30 +1128,119 @@ Question: {query}
 
 Answer:"""
 
-            response = ollama.chat(model=self.ollama_model, messages=[{"role": "user", "content": prompt}])
+        return {
+            "success": True,
+            "prompt": prompt,
+            "sources_used": list(docs_by_collection.keys()),
+            "docs_count": len(retrieved_docs)
+        }
 
-            sources_used = list(docs_by_collection.keys())
+    def generate_chat_response(self, query: str, subject: str = None) -> Dict:
+        """Generate chat response using multimodal context from all available collections
+
+        For chatbot use case: searches across ALL collections to answer any educational question
+        This supports multi-subject queries like "Compare Newton's Laws with atomic structure"
+        """
+        try:
+            logger.info(f"🤖 Generating chat response for query: {query[:80]}...")
+
+            embedding, version, cached = self._lookup_chat_cache(query)
+            if cached:
+                logger.info(f"⚡ Chat response served from cache (similarity {cached['similarity']})")
+                return {"success": True, **cached, "cached": True}
 
-            return {
-                "success": True,
+            built = self._build_chat_prompt(query)
+            if not built["success"]:
+                return built
+
+            response = get_ollama_pool().chat(model=self.ollama_model, messages=[{"role": "user", "content": built["prompt"]}])
+
+            result = {
                 "response": response["message"]["content"],
                 "model_used": self.ollama_model,
-                "sources_used": sources_used,
-                "docs_count": len(retrieved_docs)
+                "sources_used": built["sources_used"],
+                "docs_count": built["docs_count"]
             }
+            if embedding is not None:
+                chat_response_cache.put(embedding, result, version, query)
+            return {"success": True, **result, "cached": False}
 
         except Exception as e:
             logger.error(f"Error generating chat response: {e}", exc_info=True)
             return {"success": False, "error": str(e)}
 
+    def stream_chat_response(self, query: str, subject: str = None) -> Iterator[Dict]:
+        """Stream a chat response token by token (same retrieval and prompt as generate_chat_response)
 
-# Global service instance
-_multimodal_service = None
+        Yields event dicts:
+            {"type": "meta", "model_used", "sources_used", "docs_count", "cached"} once context is retrieved
+            {"type": "token", "content"} for every chunk streamed by Ollama
+            {"type": "done", "response", "model_used", "sources_used", "docs_count", "cached"} at the end
 
+        A semantic cache hit yields meta, the whole answer as one token, and done.
+            {"type": "error", "error"} if retrieval or generation fails (always the last event)
+        """
+        try:
+            logger.info(f"🤖 Streaming chat response for query: {query[:80]}...")
+
+            embedding, version, cached = self._lookup_chat_cache(query)
+            if cached:
+                logger.info(f"⚡ Chat response served from cache (similarity {cached['similarity']})")
+                info = {key: cached[key] for key in ("model_used", "sources_used", "docs_count")}
+                yield {"type": "meta", **info, "cached": True}
+                yield {"type": "token", "content": cached["response"]}
+                yield {"type": "done", "response": cached["response"], **info, "cached": True}
+                return
+
+            built = self._build_chat_prompt(query)
+            if not built["success"]:
+                yield {"type": "error", "error": built["error"]}
+                return
+
+            info = {
+                "model_used": self.ollama_model,
+                "sources_used": built["sources_used"],
+                "docs_count": built["docs_count"]
+            }
+            yield {"type": "meta", **info, "cached": False}
+
+            parts = []
+            stream = get_ollama_pool().chat(
+                model=self.ollama_model,
+                messages=[{"role": "user", "content": built["prompt"]}],
+                stream=True
+            )
+            for chunk in stream:
+                content = chunk["message"]["content"]
+                if content:
+                    parts.append(content)
+                    yield {"type": "token", "content": content}
+
+            answer = "".join(parts)
+            if embedding is not None:
+                chat_response_cache.put(embedding, {"response": answer, **info}, version, query)
+            yield {"type": "done", "response": answer, **info, "cached": False}
+
+        except ConnectionError as e:
+            get_ollama_health_service().report_failure(str(e))
+            logger.error(f"Error streaming chat response: {e}")
+            yield {"type": "error", "error": str(e)}
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {e}", exc_info=True)
+            yield {"type": "error", "error": str(e)}
+
+
+# Global service instance
 def get_multimodal_rag_service(chromadb_path: str, ollama_model: str = "llava") -> MultimodalRAGService:
-    """Get or create global multimodal RAG service"""
-    global _multimodal_service
-    if _multimodal_service is None:
-        _multimodal_service = MultimodalRAGService(chromadb_path, ollama_model)
-    return _multimodal_service
+    """Get or create global multimodal RAG service (built once, even under concurrent first requests)"""
+    model_registry.register(VECTOR_STORE_COMPONENT, lambda: MultimodalRAGService(chromadb_path, ollama_model),
+                            retry=True, retry_after=Config.MULTIMODAL_LOAD_RETRY_SECONDS)
+    return model_registry.get(VECTOR_STORE_COMPONENT)
+
+
+def warm_up_multimodal(chromadb_path: str, ollama_model: str = "llava") -> threading.Thread:
+    """Load CLIP and open the ChromaDB collections on a background thread"""
+    model_registry.register(VECTOR_STORE_COMPONENT, lambda: MultimodalRAGService(chromadb_path, ollama_model),
+                            retry=True, retry_after=Config.MULTIMODAL_LOAD_RETRY_SECONDS)
+    return model_registry.warm_up([CLIP_COMPONENT, VECTOR_STORE_COMPONENT])
 
@@ -1,15 +1,24 @@
 """
 Ollama Health Check and Model Management Service
 Handles Ollama server health checks, model availability verification, and auto-pulling missing models
+
+A background monitor probes /api/tags on an interval (faster while the server is down)
+and keeps a cached snapshot of server status and the model list, so request handlers
+read health in O(1) instead of making HTTP round trips per request. Probes cover every
+host of the Ollama pool and drive its per-host eviction.
 """
 
 import requests
 import subprocess
 import logging
+import threading
 import time
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 
+from config import Config
+from .ollama_pool import get_ollama_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +35,15 @@ class OllamaHealthService:
         self.ollama_base_url = ollama_base_url
         self.health_endpoint = f"{ollama_base_url}/api/tags"
         self.timeout = 5  # seconds
+
+        # Background monitor state; the snapshot is replaced whole, never mutated
+        self._snapshot: Optional[Dict] = None
+        self._model_names = frozenset()
+        self._consecutive_failures = 0
+        self._monitor_thread = None
+        self._wake = threading.Event()
+        self._pulling = set()
+        self._pull_lock = threading.Lock()
         
     def check_server_health(self) -> Tuple[bool, str]:
         """
@@ -184,31 +202,162 @@ class OllamaHealthService:
     def get_health_status(self) -> Dict:
         """
         Get comprehensive health status
-        
+
+        Served from the monitor snapshot when the monitor is running.
+
         Returns:
             Dict with server health, available models, and status
         """
-        is_healthy, health_msg = self.check_server_health()
-        success, models, models_msg = self.get_available_models()
-        
-        return {
-            'server_healthy': is_healthy,
-            'server_message': health_msg,
-            'models_available': success,
-            'models': models if success else [],
-            'models_count': len(models) if success else 0,
-            'timestamp': datetime.utcnow().isoformat()
+        return self.get_snapshot()
+
+    def probe(self) -> Dict:
+        """
+        Probe every pool host once and replace the cached snapshot
+
+        The server counts as healthy while at least one host is in rotation; the model
+        list is the union over healthy hosts.
+        """
+        started = time.time()
+        hosts = get_ollama_pool().refresh()
+        healthy_hosts = [host for host in hosts if host['healthy']]
+        models = sorted({model for host in healthy_hosts for model in host['models']})
+        healthy = bool(healthy_hosts)
+        if len(hosts) == 1 or not healthy:
+            message = hosts[0]['message'] if len(hosts) == 1 else "No Ollama host is reachable"
+        else:
+            message = f"{len(healthy_hosts)}/{len(hosts)} Ollama hosts are running"
+
+        was_healthy = self._snapshot['server_healthy'] if self._snapshot else None
+        if healthy:
+            self._consecutive_failures = 0
+        else:
+            self._consecutive_failures += 1
+        if was_healthy is not healthy:
+            log = logger.info if healthy else logger.error
+            log(f"{'✅' if healthy else '❌'} Ollama health changed: {message} ({len(models)} models)")
+
+        self._publish(healthy, message, models, latency_ms=round((time.time() - started) * 1000, 1), hosts=hosts)
+        return self._snapshot
+
+    def _publish(self, healthy: bool, message: str, models: List[str], latency_ms: Optional[float] = None,
+                 hosts: Optional[List[Dict]] = None):
+        names = set()
+        for model in models:
+            names.add(model)
+            names.add(model.split(':')[0])
+        self._model_names = frozenset(names)
+        self._snapshot = {
+            'server_healthy': healthy,
+            'server_message': message,
+            'models_available': healthy,
+            'models': models,
+            'models_count': len(models),
+            'timestamp': datetime.utcnow().isoformat(),
+            'checked_at': time.time(),
+            'latency_ms': latency_ms,
+            'consecutive_failures': self._consecutive_failures,
+            'hosts': hosts if hosts is not None else get_ollama_pool().snapshot()
         }
 
+    def report_failure(self, message: str):
+        """
+        Mark the server down immediately after a real request failed to connect
+
+        The monitor is woken to re-probe, so recovery is picked up on its fast interval.
+        """
+        if self._snapshot and not self._snapshot['server_healthy']:
+            return
+        self._consecutive_failures += 1
+        self._publish(False, f"Ollama request failed: {message}", [])
+        logger.error(f"❌ Ollama marked unhealthy after failed request: {message}")
+        self._wake.set()
+
+    def get_snapshot(self) -> Dict:
+        """
+        Get the cached health snapshot in O(1)
+
+        Without a running monitor (or before its first probe) this probes synchronously.
+        A snapshot older than Config.OLLAMA_HEALTH_MAX_AGE is reported as unhealthy, so
+        a wedged monitor cannot keep serving "healthy".
+        """
+        snapshot = self._snapshot
+        if snapshot is None or (self._monitor_thread is None
+                                and time.time() - snapshot['checked_at'] > Config.OLLAMA_HEALTH_PROBE_SECONDS):
+            snapshot = self.probe()
+
+        age = time.time() - snapshot['checked_at']
+        result = dict(snapshot)
+        result['age_seconds'] = round(age, 1)
+        result['monitor_running'] = self._monitor_thread is not None
+        result['models_pulling'] = sorted(self._pulling)
+        if age > Config.OLLAMA_HEALTH_MAX_AGE:
+            result['server_healthy'] = False
+            result['models_available'] = False
+            result['server_message'] = f"Ollama health snapshot is stale ({int(age)}s old)"
+        return result
+
+    def is_healthy_cached(self) -> Tuple[bool, str]:
+        """Server health from the snapshot: (is_healthy, message)"""
+        snapshot = self.get_snapshot()
+        return snapshot['server_healthy'], snapshot['server_message']
+
+    def is_model_available_cached(self, model_name: str) -> bool:
+        """Whether a model (``name`` or ``name:tag``) is in the snapshot's model list"""
+        names = self._model_names
+        return model_name in names or model_name.split(':')[0] in names
+
+    def request_model_pull(self, model_name: str) -> bool:
+        """
+        Pull a missing model in the background (at most one pull per model)
+
+        Returns:
+            True if a pull is now running for the model
+        """
+        with self._pull_lock:
+            if model_name in self._pulling:
+                return True
+            self._pulling.add(model_name)
+
+        def _pull():
+            try:
+                self.pull_model(model_name)
+            finally:
+                with self._pull_lock:
+                    self._pulling.discard(model_name)
+                self._wake.set()
+
+        threading.Thread(target=_pull, name=f"ollama-pull-{model_name}", daemon=True).start()
+        return True
+
+    def start_monitor(self):
+        """Start the background probe thread (idempotent)"""
+        if self._monitor_thread is not None:
+            return
+
+        def _monitor():
+            while True:
+                try:
+                    self.probe()
+                except Exception as e:
+                    logger.error(f"❌ Ollama health monitor error: {str(e)}")
+                healthy = self._snapshot is not None and self._snapshot['server_healthy']
+                interval = Config.OLLAMA_HEALTH_PROBE_SECONDS if healthy else Config.OLLAMA_HEALTH_DOWN_PROBE_SECONDS
+                self._wake.wait(interval)
+                self._wake.clear()
+
+        self._monitor_thread = threading.Thread(target=_monitor, name="ollama-health-monitor", daemon=True)
+        self._monitor_thread.start()
+        logger.info("✅ Ollama health monitor started")
+
 
 # Singleton instance
 _ollama_health_service = None
 
 
-def get_ollama_health_service(ollama_base_url: str = "http://localhost:11434") -> OllamaHealthService:
+def get_ollama_health_service(ollama_base_url: Optional[str] = None) -> OllamaHealthService:
     """Get or create singleton instance of OllamaHealthService"""
     global _ollama_health_service
     if _ollama_health_service is None:
-        _ollama_health_service = OllamaHealthService(ollama_base_url)
+        _ollama_health_service = OllamaHealthService(ollama_base_url or Config.OLLAMA_BASE_URL)
     return _ollama_health_service
 
@@ -0,0 +1,248 @@
+"""
+Ollama Host Pool - Least-loaded routing over several Ollama servers
+
+Hosts come from Config.OLLAMA_HOSTS. Each chat call goes to the healthy host with the
+model that has the fewest requests in flight, preferring hosts where the model is
+already loaded in memory (/api/ps). A host that fails to connect is evicted for at
+least Config.OLLAMA_POOL_EVICT_SECONDS and re-admitted by the next probe (driven by the
+Ollama health monitor) that sees it respond; the failed call is retried on the next
+host if it had not produced output yet.
+
+Each host serves at most Config.OLLAMA_NUM_PARALLEL requests at a time (the server's own
+OLLAMA_NUM_PARALLEL). The cap is process-wide: calls from every test, chat and thread
+wait in the pool for a free slot instead of queueing inside the Ollama server.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional
+
+import ollama
+import requests
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _model_names(models: List[str]) -> frozenset:
+    """Names plus untagged base names, so 'llava' matches 'llava:latest'"""
+    names = set()
+    for model in models:
+        names.add(model)
+        names.add(model.split(':')[0])
+    return frozenset(names)
+
+
+class OllamaHost:
+    """One Ollama server and its routing state"""
+
+    def __init__(self, url: str, request_timeout: Optional[float] = None, max_in_flight: int = 4):
+        self.url = url.rstrip('/')
+        self.client = ollama.Client(host=self.url, timeout=request_timeout)
+        self.in_flight = 0
+        self.max_in_flight = max_in_flight
+        self.healthy = True          # Optimistic until the first probe or failure
+        self.message = "Not probed yet"
+        self.models: List[str] = []
+        self.model_names = frozenset()
+        self.loaded_names = frozenset()
+        self.evicted_until = 0.0
+        self.failures = 0
+        self.requests_served = 0
+        self.checked_at = 0.0
+
+    def has_model(self, model: str) -> bool:
+        # Before the first successful probe the model list is unknown, so don't exclude the host
+        return not self.models or model in self.model_names or model.split(':')[0] in self.model_names
+
+    def has_loaded(self, model: str) -> bool:
+        return model in self.loaded_names or model.split(':')[0] in self.loaded_names
+
+    def to_dict(self) -> Dict:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'message': self.message,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'models': self.models,
+            'loaded_models': sorted(self.loaded_names),
+            'failures': self.failures,
+            'requests_served': self.requests_served,
+            'evicted_for_seconds': max(0, round(self.evicted_until - time.time(), 1)),
+            'checked_at': self.checked_at
+        }
+
+
+class OllamaPool:
+    """Routes Ollama chat calls across hosts by in-flight load and health"""
+
+    def __init__(self, hosts: List[str], probe_timeout: Optional[float] = None,
+                 evict_seconds: Optional[int] = None, request_timeout: Optional[float] = None,
+                 max_in_flight: Optional[int] = None):
+        """
+        Initialize the pool
+
+        Args:
+            hosts: Ollama base URLs
+            probe_timeout: Timeout of each /api/tags and /api/ps probe
+            evict_seconds: Minimum time a failed host stays out of rotation
+            request_timeout: Timeout of chat requests (None = client default)
+            max_in_flight: Max concurrent requests per host (default Config.OLLAMA_NUM_PARALLEL)
+        """
+        if not hosts:
+            raise ValueError("OllamaPool needs at least one host")
+        max_in_flight = max(1, max_in_flight if max_in_flight is not None else Config.OLLAMA_NUM_PARALLEL)
+        self.hosts = [OllamaHost(url, request_timeout, max_in_flight) for url in hosts]
+        self.probe_timeout = probe_timeout if probe_timeout is not None else Config.OLLAMA_HEALTH_TIMEOUT
+        self.evict_seconds = evict_seconds if evict_seconds is not None else Config.OLLAMA_POOL_EVICT_SECONDS
+        self.lock = threading.Lock()
+        self.slot_freed = threading.Condition(self.lock)
+
+    def _probe_host(self, host: OllamaHost):
+        """Probe one host's model list and loaded models"""
+        try:
+            response = requests.get(f"{host.url}/api/tags", timeout=self.probe_timeout)
+            if response.status_code != 200:
+                raise ConnectionError(f"Ollama server error: {response.status_code}")
+            models = [model['name'] for model in response.json().get('models', [])]
+            loaded = []
+            try:
+                ps = requests.get(f"{host.url}/api/ps", timeout=self.probe_timeout)
+                if ps.status_code == 200:
+                    loaded = [model['name'] for model in ps.json().get('models', [])]
+            except requests.exceptions.RequestException:
+                pass  # Older servers have no /api/ps; routing just ignores load state
+
+            with self.lock:
+                host.models = models
+                host.model_names = _model_names(models)
+                host.loaded_names = _model_names(loaded)
+                if time.time() < host.evicted_until:
+                    host.message = "Ollama server is responding again (eviction pending)"
+                    return
+                if not host.healthy:
+                    logger.info(f"✅ Ollama host {host.url} is back in rotation")
+                host.healthy = True
+                host.message = "Ollama server is running"
+
+        except requests.exceptions.Timeout:
+            self._evict(host, "Ollama server is not responding (timeout)")
+        except requests.exceptions.ConnectionError:
+            self._evict(host, "Cannot connect to Ollama server. Is it running?")
+        except Exception as e:
+            self._evict(host, f"Error checking Ollama: {str(e)}")
+        finally:
+            host.checked_at = time.time()
+
+    def refresh(self) -> List[Dict]:
+        """Probe every host concurrently and return their status"""
+        threads = [threading.Thread(target=self._probe_host, args=(host,), daemon=True) for host in self.hosts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.snapshot()
+
+    def _evict(self, host: OllamaHost, message: str):
+        with self.lock:
+            if host.healthy:
+                logger.error(f"❌ Evicting Ollama host {host.url}: {message}")
+            host.healthy = False
+            host.message = message
+            host.failures += 1
+            host.evicted_until = time.time() + self.evict_seconds
+
+    def _acquire(self, model: str, exclude: set) -> Optional[OllamaHost]:
+        """Pick and reserve the least-loaded eligible host, waiting while all of them are full"""
+        with self.lock:
+            while True:
+                candidates = [h for h in self.hosts if h.url not in exclude and h.healthy and h.has_model(model)]
+                if not candidates:
+                    # Every host is evicted or lacks the model: try whatever is left rather than fail outright
+                    candidates = [h for h in self.hosts if h.url not in exclude]
+                    candidates.sort(key=lambda h: h.evicted_until)
+                    candidates = candidates[:1]
+                if not candidates:
+                    return None
+                free = [h for h in candidates if h.in_flight < h.max_in_flight]
+                if free:
+                    host = min(free, key=lambda h: (not h.has_loaded(model), h.in_flight))
+                    host.in_flight += 1
+                    host.requests_served += 1
+                    return host
+                # Re-check at least every second: a probe may re-admit another host meanwhile
+                self.slot_freed.wait(timeout=1.0)
+
+    def _release(self, host: OllamaHost):
+        with self.lock:
+            host.in_flight -= 1
+            self.slot_freed.notify()
+
+    def chat(self, model: str, messages: List[Dict], stream: bool = False, **kwargs):
+        """
+        ollama.chat routed to the least-loaded host
+
+        Same arguments and return value as ``ollama.chat``. A host that cannot be
+        reached is evicted and the call moves to the next host; ConnectionError is
+        raised once every host has been tried.
+        """
+        if stream:
+            return self._chat_stream(model, messages, **kwargs)
+
+        tried = set()
+        while True:
+            host = self._acquire(model, tried)
+            if host is None:
+                raise ConnectionError(f"No Ollama host available (tried {len(tried)})")
+            tried.add(host.url)
+            try:
+                return host.client.chat(model=model, messages=messages, **kwargs)
+            except ConnectionError as e:
+                self._evict(host, str(e))
+            finally:
+                self._release(host)
+
+    def _chat_stream(self, model: str, messages: List[Dict], **kwargs) -> Iterator:
+        tried = set()
+        while True:
+            host = self._acquire(model, tried)
+            if host is None:
+                raise ConnectionError(f"No Ollama host available (tried {len(tried)})")
+            tried.add(host.url)
+            started = False
+            try:
+                for part in host.client.chat(model=model, messages=messages, stream=True, **kwargs):
+                    started = True
+                    yield part
+                return
+            except ConnectionError as e:
+                self._evict(host, str(e))
+                if started:
+                    raise
+            finally:
+                self._release(host)
+
+    def snapshot(self) -> List[Dict]:
+        """Status of every host"""
+        with self.lock:
+            return [host.to_dict() for host in self.hosts]
+
+
+# Global pool (one per process)
+_ollama_pool = None
+_ollama_pool_lock = threading.Lock()
+
+
+def get_ollama_pool() -> OllamaPool:
+    """Get or create the process-wide Ollama pool over Config.OLLAMA_HOSTS"""
+    global _ollama_pool
+    if _ollama_pool is None:
+        with _ollama_pool_lock:
+            if _ollama_pool is None:
+                _ollama_pool = OllamaPool(Config.OLLAMA_HOSTS, request_timeout=Config.OLLAMA_REQUEST_TIMEOUT)
+                logger.info(f"✅ Ollama pool over {len(Config.OLLAMA_HOSTS)} hosts: {Config.OLLAMA_HOSTS} "
+                            f"({Config.OLLAMA_NUM_PARALLEL} requests in flight per host)")
+    return _ollama_pool
@@ -0,0 +1,331 @@
+"""
+PDF Page Parser
+Lightweight PyMuPDF page parsing and text chunking shared by the multimodal RAG service
+and the vector store setup pipeline. Deliberately free of torch/CLIP imports so it can
+run inside process-pool workers without each worker loading the model.
+"""
+
+import io
+import os
+import re
+import base64
+import hashlib
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+_APPROX_TOKEN = re.compile(r"[a-z]+|[0-9]|[^\sa-z0-9]")
+
+
+def chunk_text_spans(text: str, chunk_size: int = 500, chunk_overlap: int = 100) -> List[Tuple[str, Tuple[int, int]]]:
+    """Chunk text using character-based splitting, with each chunk's (start, end) offsets in text"""
+    chunks = []
+    start = 0
+    text_len = len(text)
+
+    while start < text_len:
+        end = min(start + chunk_size, text_len)
+        chunk = text[start:end]
+        if chunk.strip():
+            chunks.append((chunk, (start, end)))
+        start += chunk_size - chunk_overlap
+
+    return chunks
+
+
+def chunk_text(text: str, chunk_size: int = 500, chunk_overlap: int = 100) -> List[str]:
+    """Chunk text using character-based splitting"""
+    return [chunk for chunk, _ in chunk_text_spans(text, chunk_size, chunk_overlap)]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split page text into whitespace-normalized sentences"""
+    sentences = (" ".join(part.split()) for part in _SENTENCE_BREAK.split(text))
+    return [sentence for sentence in sentences if sentence]
+
+
+_token_counter = None
+
+
+def get_token_counter() -> Callable[[List[str]], List[int]]:
+    """
+    Get a function counting embedding-model tokens per text (special tokens excluded)
+
+    Uses the CLIP tokenizer only (no model weights), loaded once per process. Falls back
+    to a word/punctuation approximation if the tokenizer cannot be loaded.
+    """
+    global _token_counter
+    if _token_counter is None:
+        try:
+            from transformers import CLIPTokenizerFast
+            tokenizer = CLIPTokenizerFast.from_pretrained(Config.MULTIMODAL_CLIP_MODEL)
+
+            def count_tokens(texts: List[str]) -> List[int]:
+                if not texts:
+                    return []
+                return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+        except Exception as e:
+            logger.warning(f"⚠️ CLIP tokenizer unavailable, approximating token counts: {e}")
+
+            def count_tokens(texts: List[str]) -> List[int]:
+                # BPE splits long words, so charge one extra token per 8 letters
+                return [sum(1 + len(tok) // 8 for tok in _APPROX_TOKEN.findall(text.lower())) for text in texts]
+        _token_counter = count_tokens
+    return _token_counter
+
+
+def chunk_text_windows(text: str, max_tokens: Optional[int] = None, context_chars: Optional[int] = None,
+                       count_tokens: Optional[Callable[[List[str]], List[int]]] = None
+                       ) -> List[Tuple[str, str, Tuple[int, int]]]:
+    """
+    Chunk text into sentence-aligned windows that fit the embedding model's token limit
+
+    Each window is embedded whole (nothing is lost to truncation) and carries a larger
+    context payload - the window grown by neighbouring sentences up to ``context_chars``
+    - which is what gets stored and put into prompts. Payloads of neighbouring windows
+    overlap; their (start, end) offsets in the whitespace-normalized page text (the
+    sentences joined by single spaces) let retrieval merge overlapping payloads.
+
+    Args:
+        text: Page text
+        max_tokens: Embedding model context length incl. start/end tokens
+            (default: Config.MULTIMODAL_EMBED_MAX_TOKENS)
+        context_chars: Target size of the context payload (default: Config.MULTIMODAL_CONTEXT_CHARS)
+        count_tokens: Token counter (default: get_token_counter())
+
+    Returns:
+        List of (embed_text, context, (start, end)) tuples
+    """
+    budget = (max_tokens or Config.MULTIMODAL_EMBED_MAX_TOKENS) - 2
+    context_chars = context_chars if context_chars is not None else Config.MULTIMODAL_CONTEXT_CHARS
+    count_tokens = count_tokens or get_token_counter()
+
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+
+    # Units are whole sentences, or word runs of sentences longer than the budget
+    units, unit_tokens = [], []
+    for sentence, tokens in zip(sentences, count_tokens(sentences)):
+        if tokens <= budget:
+            units.append(sentence)
+            unit_tokens.append(tokens)
+            continue
+        piece, piece_tokens = [], 0
+        for word, word_tokens in zip(sentence.split(), count_tokens(sentence.split())):
+            if piece and piece_tokens + word_tokens > budget:
+                units.append(" ".join(piece))
+                unit_tokens.append(piece_tokens)
+                piece, piece_tokens = [], 0
+            piece.append(word)
+            piece_tokens += word_tokens
+        if piece:
+            units.append(" ".join(piece))
+            unit_tokens.append(piece_tokens)
+
+    # Greedily pack units into windows; summed counts can only overestimate the joined text
+    spans = []
+    start, tokens = 0, 0
+    for i, unit_count in enumerate(unit_tokens):
+        if i > start and tokens + unit_count > budget:
+            spans.append((start, i))
+            start, tokens = i, 0
+        tokens += unit_count
+    spans.append((start, len(units)))
+
+    offsets = [0]
+    for unit in units:
+        offsets.append(offsets[-1] + len(unit) + 1)
+
+    windows = []
+    for start, end in spans:
+        lo, hi = start, end
+        length = sum(len(unit) + 1 for unit in units[start:end])
+        while length < context_chars and (lo > 0 or hi < len(units)):
+            if hi < len(units):
+                length += len(units[hi]) + 1
+                hi += 1
+            if length < context_chars and lo > 0:
+                lo -= 1
+                length += len(units[lo]) + 1
+        windows.append((" ".join(units[start:end]), " ".join(units[lo:hi]), (offsets[lo], offsets[hi] - 1)))
+    return windows
+
+
+def chunk_page_text(text: str, chunk_size: int = 500, chunk_overlap: int = 100,
+                    chunking: Optional[str] = None) -> List[Tuple[str, str, Tuple[int, int]]]:
+    """
+    Chunk page text with the configured strategy
+
+    Args:
+        chunking: 'token' (sentence windows sized to the embedding model) or 'char'
+            (fixed-size character chunks); default Config.MULTIMODAL_CHUNKING
+
+    Returns:
+        List of (embed_text, content, (start, end)) tuples; for 'char' embed_text and
+        content are the same chunk. Offsets locate content in the page text (see
+        chunk_text_windows for 'token'), so overlapping chunks can be merged.
+    """
+    if (chunking or Config.MULTIMODAL_CHUNKING) == 'token':
+        return chunk_text_windows(text)
+    return [(chunk, chunk, span) for chunk, span in chunk_text_spans(text, chunk_size, chunk_overlap)]
+
+
+def merge_overlapping_chunks(docs: List[Dict]) -> List[Dict]:
+    """
+    Merge retrieved text chunks whose stored spans overlap, so prompts get each passage once
+
+    Consecutive chunks of a page share text (character overlap, or the neighbouring
+    sentences of token-window payloads). Text chunks of the same collection, PDF and
+    page whose (span_start, span_end) overlap become one doc holding the union of their
+    text, ranked where its best chunk was. Chunks indexed before span offsets were
+    stored are only deduplicated by identical content; images pass through unchanged.
+
+    Args:
+        docs: Retrieved docs ({"content", "metadata", ...}), best match first
+
+    Returns:
+        The merged docs, best match first (input docs are not modified)
+    """
+    ranked = []  # (rank, doc)
+    groups = {}  # (collection, pdf_file, page) -> [(rank, doc)] of chunks with spans
+    seen = set()
+    for rank, doc in enumerate(docs):
+        metadata = doc.get("metadata") or {}
+        if metadata.get("type") != "text":
+            ranked.append((rank, doc))
+            continue
+        key = (doc.get("collection") or metadata.get("subject"), metadata.get("pdf_file"), metadata.get("page"))
+        if key + (doc["content"],) in seen:
+            continue
+        seen.add(key + (doc["content"],))
+        if metadata.get("span_start") is None or metadata.get("span_end") is None:
+            ranked.append((rank, doc))
+        else:
+            groups.setdefault(key, []).append((rank, doc))
+
+    for chunks in groups.values():
+        chunks.sort(key=lambda item: item[1]["metadata"]["span_start"])
+        cluster = []
+        for rank, doc in chunks + [(None, None)]:
+            if cluster and (doc is None or doc["metadata"]["span_start"] >= cluster_end):
+                best_rank, best = min(cluster, key=lambda item: item[0])
+                if len(cluster) == 1:
+                    ranked.append((best_rank, best))
+                else:
+                    start = cluster[0][1]["metadata"]["span_start"]
+                    ranked.append((best_rank, {
+                        **best,
+                        "content": text,
+                        "metadata": {**best["metadata"], "span_start": start, "span_end": cluster_end}
+                    }))
+                cluster = []
+            if doc is None:
+                break
+            start, end = doc["metadata"]["span_start"], doc["metadata"]["span_end"]
+            if not cluster:
+                text, cluster_end = doc["content"], end
+            elif end > cluster_end:
+                text += doc["content"][cluster_end - start:]
+                cluster_end = end
+            cluster.append((rank, doc))
+
+    ranked.sort(key=lambda item: item[0])
+    return [doc for _, doc in ranked]
+
+
+def make_doc_id(pdf_file: str, page: int, chunk_key: str, content: str) -> str:
+    """Build a stable, content-derived ChromaDB id for a chunk or image
+
+    The same file, page, chunk position and content always map to the same id,
+    so re-indexing a file upserts in place instead of duplicating rows.
+    """
+    digest = hashlib.sha1(f"{pdf_file}|{page}|{chunk_key}|{content}".encode("utf-8")).hexdigest()[:16]
+    return f"{os.path.splitext(pdf_file)[0]}_p{page}_{digest}"
+
+
+def make_image_id(pdf_file: str, page: int, img_index: int) -> str:
+    """Build the image-store key for an image (unique across PDFs of a subject)"""
+    return f"{os.path.splitext(pdf_file)[0]}_page_{page}_img_{img_index}"
+
+
+def decode_pdf_image(image_bytes: bytes) -> Tuple[Image.Image, str]:
+    """Decode raw PDF image bytes to an RGB PIL image and its base64 PNG encoding"""
+    pil_image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    buffered = io.BytesIO()
+    pil_image.save(buffered, format="PNG")
+    return pil_image, base64.b64encode(buffered.getvalue()).decode()
+
+
+def get_page_count(pdf_path: str) -> int:
+    """Get the number of pages in a PDF"""
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def parse_pdf_pages(
+    pdf_path: str,
+    start_page: int,
+    end_page: int,
+    chunk_size: int = 500,
+    chunk_overlap: int = 100,
+    include_images: bool = True,
+    chunking: Optional[str] = None
+) -> List[Dict]:
+    """
+    Parse a page range of a PDF into text chunks and decoded images
+
+    Args:
+        pdf_path: Path to the PDF file
+        start_page: First page index (inclusive)
+        end_page: Last page index (exclusive)
+        chunk_size: Characters per text chunk ('char' chunking)
+        chunk_overlap: Characters shared by consecutive chunks ('char' chunking)
+        include_images: Whether to extract and decode page images
+        chunking: Chunking strategy (see chunk_page_text)
+
+    Returns:
+        List of {"page", "texts", "embed_texts", "spans", "images"} dicts, one per page,
+        where "texts" are the stored chunk contents, "embed_texts" the aligned texts to
+        embed, "spans" the (start, end) offsets of each content in the page text, and
+        each image is {"image_id", "image" (RGB PIL image), "base64" (PNG)}
+    """
+    pages = []
+    pdf_file = os.path.basename(pdf_path)
+    with fitz.open(pdf_path) as doc:
+        for i in range(start_page, min(end_page, len(doc))):
+            page = doc[i]
+
+            text = page.get_text()
+            chunks = chunk_page_text(text, chunk_size, chunk_overlap, chunking) if text.strip() else []
+
+            images = []
+            if include_images:
+                for img_index, img in enumerate(page.get_images(full=True)):
+                    try:
+                        base_image = doc.extract_image(img[0])
+                        pil_image, img_base64 = decode_pdf_image(base_image["image"])
+                        images.append({
+                            "image_id": make_image_id(pdf_file, i, img_index),
+                            "image": pil_image,
+                            "base64": img_base64
+                        })
+                    except Exception as e:
+                        logger.error(f"Error processing image {img_index} on page {i}: {e}")
+
+            pages.append({
+                "page": i,
+                "texts": [content for _, content, _ in chunks],
+                "embed_texts": [embed_text for embed_text, _, _ in chunks],
+                "spans": [span for _, _, span in chunks],
+                "images": images
+            })
+
+    return pages
@@ -0,0 +1,294 @@
+"""
+Question Bank Service - Per-subject pool of pre-generated MCQs
+
+A background producer keeps each subject's bank at Config.QUESTION_BANK_TARGET_DEPTH
+questions (refill jobs run on the MCQ generation worker pool). Mock tests are assembled
+by reference from the bank through the mock_test_questions mapping, so starting a test
+is a DB read and LLM load no longer scales with the number of students.
+"""
+
+import random
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from ..models.user import db
+from ..models.purchase import ExamCategoryQuestion, MockTestAttempt, MockTestQuestion, MCQGenerationJob
+from ..models.course import ExamCategorySubject
+from .question_dedup_service import generate_deduplicated
+
+logger = logging.getLogger(__name__)
+
+BANK_GENERATION_METHOD = 'question_bank'
+REFILL_JOB_TYPE = 'question_bank_refill'
+
+
+class QuestionBankService:
+    """Service class for the per-subject question bank"""
+
+    _producer_thread = None
+
+    @staticmethod
+    def bank_query(subject_id: int):
+        """Query for the bank questions of a subject"""
+        return ExamCategoryQuestion.query.filter(
+            ExamCategoryQuestion.subject_id == subject_id,
+            ExamCategoryQuestion.generation_method == BANK_GENERATION_METHOD,
+            ExamCategoryQuestion.mock_test_id.is_(None)
+        )
+
+    @staticmethod
+    def get_bank_size(subject_id: int) -> int:
+        """Number of bank questions for a subject"""
+        return QuestionBankService.bank_query(subject_id).count()
+
+    @staticmethod
+    def can_assemble(subject_id: int, num_questions: int = 50) -> bool:
+        """Whether the bank holds enough questions to assemble a full test"""
+        return Config.QUESTION_BANK_ENABLED and QuestionBankService.get_bank_size(subject_id) >= num_questions
+
+    @staticmethod
+    def get_mock_test_questions(mock_test_id: int) -> List[ExamCategoryQuestion]:
+        """
+        Get the questions of a mock test in order
+
+        Bank-assembled tests are read through the mapping; tests generated live
+        (legacy) have rows linked directly by mock_test_id.
+        """
+        mapped = ExamCategoryQuestion.query.join(
+            MockTestQuestion, MockTestQuestion.question_id == ExamCategoryQuestion.id
+        ).filter(
+            MockTestQuestion.mock_test_id == mock_test_id
+        ).order_by(MockTestQuestion.position).all()
+        if mapped:
+            return mapped
+
+        return ExamCategoryQuestion.query.filter_by(
+            mock_test_id=mock_test_id
+        ).order_by(ExamCategoryQuestion.batch_sequence, ExamCategoryQuestion.id).all()
+
+    @staticmethod
+    def assemble_test(mock_test: MockTestAttempt, num_questions: int = 50) -> Dict:
+        """
+        Assemble a mock test from the subject's bank by reference
+
+        Questions the student has not seen in their other tests of the subject are
+        preferred; already-seen ones are only used if the bank runs short. The mock test
+        row is locked while assembling, so concurrent Start Test clicks assemble it once
+        and the others return the same questions.
+
+        Args:
+            mock_test: Mock test card to fill
+            num_questions: Questions per test
+
+        Returns:
+            Dict with 'success' and 'questions' (ExamCategoryQuestion list) or 'error'
+        """
+        try:
+            # Serialize assembly of this test (SELECT ... FOR UPDATE until the commit below)
+            MockTestAttempt.query.filter_by(id=mock_test.id).with_for_update().first()
+            existing = QuestionBankService.get_mock_test_questions(mock_test.id)
+            if existing:
+                db.session.rollback()
+                return {'success': True, 'questions': existing, 'already_assembled': True}
+
+            bank_ids = [row[0] for row in QuestionBankService.bank_query(mock_test.subject_id)
+                        .with_entities(ExamCategoryQuestion.id).all()]
+            if len(bank_ids) < num_questions:
+                db.session.rollback()
+                return {'success': False, 'error': f'Question bank has {len(bank_ids)}/{num_questions} questions'}
+
+            seen_ids = {row[0] for row in db.session.query(MockTestQuestion.question_id).join(
+                MockTestAttempt, MockTestAttempt.id == MockTestQuestion.mock_test_id
+            ).filter(
+                MockTestAttempt.user_id == mock_test.user_id,
+                MockTestAttempt.subject_id == mock_test.subject_id
+            ).all()}
+
+            unseen = [qid for qid in bank_ids if qid not in seen_ids]
+            selected = random.sample(unseen, min(num_questions, len(unseen)))
+            if len(selected) < num_questions:
+                seen = [qid for qid in bank_ids if qid in seen_ids]
+                selected += random.sample(seen, num_questions - len(selected))
+
+            for position, question_id in enumerate(selected, start=1):
+                db.session.add(MockTestQuestion(
+                    mock_test_id=mock_test.id,
+                    question_id=question_id,
+                    position=position
+                ))
+            mock_test.questions_generated = True
+            db.session.commit()
+
+            logger.info(f"✅ Assembled mock test {mock_test.id} from question bank "
+                        f"({len(unseen)} unseen of {len(bank_ids)} bank questions)")
+            return {'success': True, 'questions': QuestionBankService.get_mock_test_questions(mock_test.id)}
+
+        except IntegrityError:
+            # A concurrent request (on a database without row locks) assembled it first
+            db.session.rollback()
+            existing = QuestionBankService.get_mock_test_questions(mock_test.id)
+            if existing:
+                return {'success': True, 'questions': existing, 'already_assembled': True}
+            return {'success': False, 'error': 'Failed to assemble test from question bank: concurrent assembly'}
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Failed to assemble mock test {mock_test.id} from bank: {str(e)}")
+            return {'success': False, 'error': f'Failed to assemble test from question bank: {str(e)}'}
+
+    @staticmethod
+    def ensure_refill(subject_id: int, exclude_job_id: Optional[str] = None) -> Optional[str]:
+        """
+        Enqueue a refill job if the subject's bank is below target and none is queued
+
+        The subject row is locked while checking for a queued refill, so concurrent
+        callers (every Start Test click, chained refills, the producer) queue one job.
+
+        Returns:
+            The new job id, or None if no refill was needed
+        """
+        if not Config.QUESTION_BANK_ENABLED or Config.QUESTION_BANK_TARGET_DEPTH <= 0:
+            return None
+
+        missing = Config.QUESTION_BANK_TARGET_DEPTH - QuestionBankService.get_bank_size(subject_id)
+        if missing <= 0:
+            return None
+
+        try:
+            # Serialize check-then-create per subject (SELECT ... FOR UPDATE until create_session commits)
+            subject = ExamCategorySubject.query.filter_by(id=subject_id).with_for_update().first()
+            if not subject:
+                db.session.rollback()
+                return None
+
+            # Locking read, so a job committed by the previous lock holder is seen
+            active = MCQGenerationJob.query.filter(
+                MCQGenerationJob.job_type == REFILL_JOB_TYPE,
+                MCQGenerationJob.subject_id == subject_id,
+                MCQGenerationJob.status.in_(['pending', 'running'])
+            )
+            if exclude_job_id:
+                active = active.filter(MCQGenerationJob.id != exclude_job_id)
+            if active.with_for_update().first():
+                db.session.rollback()
+                return None
+
+            from .async_mcq_generation_service import get_async_mcq_generation_service
+            session = get_async_mcq_generation_service().create_session(
+                mock_test_id=None,
+                user_id=None,
+                subject_id=subject_id,
+                total_questions=min(Config.QUESTION_BANK_REFILL_BATCH, missing),
+                initial_questions_count=0,
+                job_type=REFILL_JOB_TYPE,
+                payload={'subject_name': subject.subject_name, 'exam_category_id': subject.exam_category_id},
+                session_id=f"bank_{subject_id}_{int(time.time() * 1000)}"
+            )
+        except IntegrityError:
+            # Same job id queued concurrently (databases without row locks)
+            db.session.rollback()
+            return None
+        logger.info(f"📦 Queued question bank refill for {subject.subject_name}: {session.total_questions} questions "
+                    f"({missing} below target)")
+        return session.session_id
+
+    @staticmethod
+    def run_refill_job(job) -> Dict:
+        """Generation job handler: generate questions into a subject's bank, chunk by chunk"""
+        from .multimodal_rag_service import get_multimodal_rag_service
+        multimodal_service = get_multimodal_rag_service(
+            chromadb_path=current_app.config.get('MULTIMODAL_CHROMADB_PATH'),
+            ollama_model=current_app.config.get('MULTIMODAL_OLLAMA_MODEL', 'llava')
+        )
+        subject_name = job.payload['subject_name']
+
+        def save_chunk(chunk_num, start_index, questions):
+            saved = []
+            for q_data in questions:
+                question = ExamCategoryQuestion(
+                    exam_category_id=job.payload['exam_category_id'],
+                    subject_id=job.subject_id,
+                    question=q_data.get('question', ''),
+                    option_1=q_data.get('option_a', ''),
+                    option_2=q_data.get('option_b', ''),
+                    option_3=q_data.get('option_c', ''),
+                    option_4=q_data.get('option_d', ''),
+                    correct_answer=q_data.get('correct_answer', ''),
+                    explanation=q_data.get('explanation', ''),
+                    is_ai_generated=True,
+                    ai_model_used=multimodal_service.ollama_model,
+                    difficulty_level='hard',
+                    generation_batch_id=job.job_id,
+                    batch_sequence=start_index + len(saved) + 1,
+                    chromadb_collection=subject_name.lower(),
+                    multimodal_source_type='mixed',
+                    generation_method=BANK_GENERATION_METHOD
+                )
+                db.session.add(question)
+                saved.append(question)
+
+            db.session.flush()
+            if not job.publish(chunk_num, [q.to_dict(include_answer=False) for q in saved]):
+                return []
+            return saved
+
+        # Near-duplicates of questions already in the subject are dropped and regenerated
+        result = generate_deduplicated(
+            multimodal_service,
+            query=subject_name,
+            subject=subject_name,
+            subject_id=job.subject_id,
+            num_questions=job.total_questions,
+            save_chunk=save_chunk,
+            skip_chunks=job.completed_chunks,
+            dedup_state=job.payload.setdefault('dedup', {})
+        )
+
+        if result.get('success'):
+            logger.info(f"✅ Question bank refill for {subject_name}: {len(result.get('questions', []))} questions")
+            # Chain the next refill while the bank is still below target
+            QuestionBankService.ensure_refill(job.subject_id, exclude_job_id=job.job_id)
+        return result
+
+    @staticmethod
+    def refill_all_subjects() -> int:
+        """Queue refill jobs for every active subject below target depth"""
+        queued = 0
+        subjects = ExamCategorySubject.query.filter(
+            db.or_(ExamCategorySubject.is_deleted.is_(False), ExamCategorySubject.is_deleted.is_(None))
+        ).all()
+        for subject in subjects:
+            if QuestionBankService.ensure_refill(subject.id):
+                queued += 1
+        return queued
+
+    @staticmethod
+    def start_producer(app):
+        """Start the background thread that keeps every subject's bank at target depth"""
+        if (QuestionBankService._producer_thread is not None
+                or not Config.QUESTION_BANK_ENABLED or Config.QUESTION_BANK_TARGET_DEPTH <= 0):
+            return
+
+        def _produce():
+            while True:
+                with app.app_context():
+                    try:
+                        queued = QuestionBankService.refill_all_subjects()
+                        if queued:
+                            logger.info(f"📦 Question bank producer queued {queued} refill jobs")
+                    except Exception as e:
+                        logger.error(f"❌ Question bank producer error: {str(e)}")
+                        db.session.rollback()
+                    finally:
+                        db.session.remove()
+                time.sleep(Config.QUESTION_BANK_CHECK_SECONDS)
+
+        QuestionBankService._producer_thread = threading.Thread(target=_produce, name="question-bank-producer", daemon=True)
+        QuestionBankService._producer_thread.start()
+        logger.info("✅ Question bank producer started")
@@ -0,0 +1,296 @@
+"""
+Question Dedup Service - Near-duplicate MCQ detection before ExamCategoryQuestion inserts
+
+Each subject gets an in-memory MinHash/LSH index over normalized question text (word
+3-gram shingles). A lookup hashes the question once and probes a handful of LSH band
+buckets, so checks stay well under a millisecond regardless of table size. The index
+is loaded lazily from the database, synced incrementally by question id, and bounded
+per subject (oldest questions are evicted first).
+"""
+
+import re
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from ..models.purchase import ExamCategoryQuestion
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+NUM_BANDS = 8
+_ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+_MERSENNE_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase and strip punctuation/extra whitespace from question text"""
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint64 values) of a question's word 3-gram shingles"""
+    words = normalize_question(text).split()
+    if not words:
+        return None
+    if len(words) < 3:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def _band_keys(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [
+        (band, signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND].tobytes())
+        for band in range(NUM_BANDS)
+    ]
+
+
+class _SubjectIndex:
+    """LSH buckets and signatures for one subject (caller holds the lock)"""
+
+    def __init__(self):
+        self.signatures = OrderedDict()  # question id -> signature, oldest first
+        self.buckets: Dict[Tuple[int, bytes], set] = {}
+        self.max_id = 0
+        self.synced_at = 0.0
+
+    def add(self, question_id: int, signature: np.ndarray, max_size: int):
+        if question_id in self.signatures:
+            return
+        self.signatures[question_id] = signature
+        for key in _band_keys(signature):
+            self.buckets.setdefault(key, set()).add(question_id)
+        self.max_id = max(self.max_id, question_id)
+
+        while len(self.signatures) > max_size:
+            old_id, old_signature = self.signatures.popitem(last=False)
+            for key in _band_keys(old_signature):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def find(self, signature: np.ndarray, threshold: float) -> Optional[int]:
+        candidates = set()
+        for key in _band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+        for question_id in candidates:
+            if float(np.mean(self.signatures[question_id] == signature)) >= threshold:
+                return question_id
+        return None
+
+
+class QuestionDedupIndex:
+    """Per-subject near-duplicate index over saved ExamCategoryQuestion rows"""
+
+    def __init__(self, threshold: Optional[float] = None, max_per_subject: Optional[int] = None,
+                 sync_seconds: Optional[int] = None):
+        """
+        Initialize the dedup index
+
+        Args:
+            threshold: Estimated Jaccard similarity at/above which questions are duplicates
+            max_per_subject: Max questions indexed per subject (oldest evicted first)
+            sync_seconds: How often to pull questions saved by other processes
+        """
+        self.threshold = threshold if threshold is not None else Config.QUESTION_DEDUP_THRESHOLD
+        self.max_per_subject = max_per_subject or Config.QUESTION_DEDUP_MAX_PER_SUBJECT
+        self.sync_seconds = sync_seconds if sync_seconds is not None else Config.QUESTION_DEDUP_SYNC_SECONDS
+        self.subjects: Dict[int, _SubjectIndex] = {}
+        self.lock = threading.Lock()
+
+    def _subject_index(self, subject_id: int) -> _SubjectIndex:
+        """Get a subject's index, loading/syncing new rows from the database when due"""
+        with self.lock:
+            index = self.subjects.get(subject_id)
+            if index is not None and time.time() - index.synced_at < self.sync_seconds:
+                return index
+            since_id = index.max_id if index is not None else 0
+
+        # Newest rows first so the bound keeps the most recent questions
+        rows = ExamCategoryQuestion.query.with_entities(
+            ExamCategoryQuestion.id, ExamCategoryQuestion.question
+        ).filter(
+            ExamCategoryQuestion.subject_id == subject_id,
+            ExamCategoryQuestion.id > since_id
+        ).order_by(ExamCategoryQuestion.id.desc()).limit(self.max_per_subject).all()
+        signatures = [(qid, minhash_signature(text)) for qid, text in reversed(rows)]
+
+        with self.lock:
+            index = self.subjects.setdefault(subject_id, _SubjectIndex())
+            for question_id, signature in signatures:
+                if signature is not None:
+                    index.add(question_id, signature, self.max_per_subject)
+            index.synced_at = time.time()
+            if since_id == 0:
+                logger.info(f"🔎 Dedup index loaded for subject {subject_id}: {len(index.signatures)} questions")
+            return index
+
+    def find_duplicate(self, subject_id: int, text: str) -> Optional[int]:
+        """Get the id of an existing near-duplicate of ``text`` in the subject, if any"""
+        signature = minhash_signature(text)
+        if signature is None:
+            return None
+        index = self._subject_index(subject_id)
+        with self.lock:
+            return index.find(signature, self.threshold)
+
+    def add(self, subject_id: int, question_id: int, text: str):
+        """Index a newly saved question"""
+        signature = minhash_signature(text)
+        if signature is None:
+            return
+        index = self._subject_index(subject_id)
+        with self.lock:
+            index.add(question_id, signature, self.max_per_subject)
+
+    def filter_new(self, subject_id: int, questions: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Split generated questions into (unique, duplicates)
+
+        Questions are checked against the subject's saved questions and against the
+        questions accepted earlier in the same batch.
+        """
+        index = self._subject_index(subject_id)
+        unique, duplicates = [], []
+        batch = _SubjectIndex()
+        for position, q_data in enumerate(questions):
+            signature = minhash_signature(q_data.get('question', ''))
+            if signature is None:
+                duplicates.append(q_data)
+                continue
+            with self.lock:
+                is_duplicate = index.find(signature, self.threshold) is not None
+            if is_duplicate or batch.find(signature, self.threshold) is not None:
+                duplicates.append(q_data)
+                continue
+            batch.add(-(position + 1), signature, len(questions))
+            unique.append(q_data)
+        return unique, duplicates
+
+
+def generate_deduplicated(
+    multimodal_service,
+    query: str,
+    subject: str,
+    subject_id: int,
+    num_questions: int,
+    save_chunk: Callable[[int, int, List[Dict]], List[ExamCategoryQuestion]],
+    skip_chunks: Optional[List[int]] = None,
+    max_rounds: Optional[int] = None,
+    dedup_state: Optional[Dict] = None
+) -> Dict:
+    """
+    Run MultimodalRAGService.generate_mcq with a dedup stage in front of the inserts
+
+    ``save_chunk(chunk_num, start_index, questions)`` receives only unique questions and
+    must return the rows it committed (empty when nothing was committed, e.g. the job
+    lost its lease); only those are added to the dedup index. Duplicates are dropped and
+    only the missing count is regenerated, for up to ``max_rounds`` top-up rounds;
+    top-up chunks are numbered from 1000 * round.
+
+    Args:
+        dedup_state: Dict holding the missing count, top-up round and next position. It is
+                     updated before each save_chunk call, so a job that persists it with
+                     the chunk (GenerationJobContext.payload) resumes mid top-up after a restart
+    """
+    if not Config.QUESTION_DEDUP_ENABLED:
+        return multimodal_service.generate_mcq(
+            query=query, subject=subject, num_questions=num_questions,
+            on_chunk=save_chunk, skip_chunks=skip_chunks
+        )
+
+    dedup_index = get_question_dedup_index()
+    max_rounds = Config.QUESTION_DEDUP_MAX_TOPUP_ROUNDS if max_rounds is None else max_rounds
+    skip_chunks = skip_chunks or []
+    state = dedup_state if dedup_state is not None else {}
+    state.setdefault('missing', 0)
+    state.setdefault('next_index', num_questions)
+    state.setdefault('duplicates', 0)
+    state.setdefault('round', 0)         # Current top-up round (0 = the requested questions)
+    state.setdefault('round_target', 0)  # Questions the current top-up round regenerates
+    all_questions = []
+
+    def make_on_chunk(chunk_offset: int, topup: bool):
+        def on_chunk(chunk_num, start_index, questions):
+            unique, duplicates = dedup_index.filter_new(subject_id, questions)
+            if duplicates:
+                state['missing'] += len(duplicates)
+                state['duplicates'] += len(duplicates)
+                logger.info(f"♻️ Dropped {len(duplicates)} near-duplicate questions from chunk {chunk_num}")
+            if topup:
+                # Top-up questions are appended after the originally requested positions
+                position = state['next_index']
+                state['next_index'] += len(unique)
+            else:
+                position = start_index
+            saved = save_chunk(chunk_offset + chunk_num, position, unique)
+            for question in saved or []:
+                dedup_index.add(subject_id, question.id, question.question)
+            all_questions.extend(unique)
+        return on_chunk
+
+    if state['round'] == 0:
+        result = multimodal_service.generate_mcq(
+            query=query, subject=subject, num_questions=num_questions,
+            on_chunk=make_on_chunk(0, topup=False),
+            skip_chunks=[c for c in skip_chunks if c < 1000]
+        )
+        if not result.get('success'):
+            return result
+    else:
+        logger.info(f"⏭️ Resuming duplicate top-up round {state['round']}")
+        result = {'success': True, 'model_used': multimodal_service.ollama_model}
+
+    while True:
+        if state['round'] > 0 and state['round_target'] > 0:
+            offset = 1000 * state['round']
+            multimodal_service.generate_mcq(
+                query=query, subject=subject, num_questions=state['round_target'],
+                on_chunk=make_on_chunk(offset, topup=True),
+                skip_chunks=[c - offset for c in skip_chunks if offset <= c < offset + 1000]
+            )
+            state['round_target'] = 0
+        if state['missing'] <= 0 or state['round'] >= max_rounds:
+            break
+        state['round'] += 1
+        state['round_target'] = state['missing']
+        state['missing'] = 0
+        logger.info(f"🔁 Regenerating {state['round_target']} questions replaced as duplicates (round {state['round']})")
+
+    result = dict(result)
+    result['questions'] = all_questions
+    result['duplicates_dropped'] = state['duplicates']
+    return result
+
+
+# Global dedup index (one per process)
+_question_dedup_index = None
+_question_dedup_index_lock = threading.Lock()
+
+
+def get_question_dedup_index() -> QuestionDedupIndex:
+    """Get or create the process-wide question dedup index"""
+    global _question_dedup_index
+    if _question_dedup_index is None:
+        with _question_dedup_index_lock:
+            if _question_dedup_index is None:
+                _question_dedup_index = QuestionDedupIndex()
+    return _question_dedup_index
@@ -0,0 +1,208 @@
+"""
+Semantic Response Cache
+Bounded LRU/TTL cache of chatbot answers keyed on the query embedding. A lookup is one
+matrix-vector product against the cached (unit-norm) query vectors; a cached query is a
+hit when its cosine similarity reaches the threshold AND it passes a lexical guard:
+both queries mention the same numbers and content words in the same order (lexical_key).
+CLIP text embeddings rate "atomic number of sodium" and "atomic number of potassium",
+or "2 moles" and "3 moles", as near-duplicates, so similarity alone serves wrong answers.
+
+Entries are tagged with the collection version they were generated against, and a
+version change drops the cache.
+"""
+
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\d+(?:\.\d+)?|[a-z]+")
+
+# Words that do not change what a question asks for: function words and the verbs
+# students use to phrase the request ("what is", "explain", "tell me about")
+STOPWORDS = frozenset("""
+a an the of in on at to for from by with about into as and or is are was were be been being
+do does did can could would should will shall may might must it its this that these those
+me my you your i we our us please kindly briefly brief short simple simply detail detailed
+what whats explain explanation define definition describe description tell give show state
+meaning mean means concept idea notes note know understand help question answer
+""".split())
+
+
+def lexical_key(text: str) -> Tuple[str, ...]:
+    """
+    Numbers and content words of a query in order: what two queries must share to be paraphrases
+
+    Lowercased; stopwords, possessives and plural "s" are dropped, so "What are Newton's
+    laws?" and "explain newton law" share a key. Order is kept ("celsius to fahrenheit"
+    is not "fahrenheit to celsius"), as are single letters (variables and units such as
+    x or g). Numbers are compared by value ("2.50" == "2.5").
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower().replace("'s", "")):
+        if token[0].isdigit():
+            token = token.rstrip('0').rstrip('.') if '.' in token else token.lstrip('0') or '0'
+        elif token in STOPWORDS:
+            continue
+        elif len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tuple(tokens)
+
+
+class SemanticResponseCache:
+    """Thread-safe semantic cache of chat responses with hit/miss counters"""
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: int = 0, threshold: float = 0.95):
+        """
+        Initialize the cache
+
+        Args:
+            max_size: Max cached responses (0 disables the cache)
+            ttl_seconds: Entry lifetime in seconds (0 = never expires)
+            threshold: Min cosine similarity between query embeddings for a hit
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries = OrderedDict()  # entry id -> (row, lexical key, response, stored_at), oldest first
+        self._matrix = None            # One unit-norm query vector per row, allocated on first put
+        self._row_ids = []             # Entry id of every row (None = free row, zero vector)
+        self._free_rows = []
+        self._next_id = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lexical_rejections = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _reset(self):
+        """Drop every entry (caller holds the lock)"""
+        self._entries.clear()
+        self._matrix = None
+        self._row_ids = []
+        self._free_rows = []
+
+    def _check_version(self, version: str):
+        """Drop every entry when the collections changed (caller holds the lock)"""
+        if version != self._version:
+            if self._entries:
+                logger.info(f"♻️ Chat response cache invalidated ({len(self._entries)} entries, collections changed)")
+                self.invalidations += 1
+            self._reset()
+            self._version = version
+
+    def _delete(self, entry_id: int):
+        """Remove an entry and free its matrix row (caller holds the lock)"""
+        row = self._entries.pop(entry_id)[0]
+        self._matrix[row] = 0.0
+        self._row_ids[row] = None
+        self._free_rows.append(row)
+
+    def _add_row(self, vector: np.ndarray, entry_id: int) -> int:
+        """Write a vector into a free row, growing the matrix geometrically (caller holds the lock)"""
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self._row_ids)
+            self._row_ids.append(None)
+            if self._matrix is None:
+                self._matrix = np.zeros((min(64, self.max_size), vector.shape[0]), dtype=np.float32)
+            elif row >= self._matrix.shape[0]:
+                grown = np.zeros((min(2 * self._matrix.shape[0], self.max_size), vector.shape[0]), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+        self._matrix[row] = vector
+        self._row_ids[row] = entry_id
+        return row
+
+    def get(self, embedding: np.ndarray, version: str, query: str) -> Optional[Dict]:
+        """
+        Get the cached response for the most similar earlier query, or None on a miss
+
+        Args:
+            query: Text of the query, checked against the candidate's lexical key
+
+        Returns:
+            A copy of the cached response dict with ``similarity`` added
+        """
+        if not self.enabled:
+            return None
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        key = lexical_key(query)
+        with self._lock:
+            self._check_version(version)
+            if self._entries:
+                scores = self._matrix[:len(self._row_ids)] @ vector
+                candidates = np.flatnonzero(scores >= self.threshold)
+                for row in candidates[np.argsort(-scores[candidates])]:
+                    entry_id = self._row_ids[row]
+                    if entry_id is None:
+                        continue
+                    _, entry_key, response, stored_at = self._entries[entry_id]
+                    if self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds:
+                        self._delete(entry_id)
+                        continue
+                    if entry_key != key:
+                        self.lexical_rejections += 1
+                        continue
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return {**response, 'similarity': round(float(scores[row]), 4)}
+
+            self.misses += 1
+            return None
+
+    def put(self, embedding: np.ndarray, response: Dict, version: str, query: str):
+        """Cache a response for a query (its embedding and text)"""
+        if not self.enabled:
+            return
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        key = lexical_key(query)
+        with self._lock:
+            self._check_version(version)
+            while len(self._entries) >= self.max_size:
+                self._delete(next(iter(self._entries)))
+            entry_id = self._next_id
+            self._next_id += 1
+            row = self._add_row(vector, entry_id)
+            self._entries[entry_id] = (row, key, dict(response), time.time())
+
+    def clear(self):
+        """Clear the cache and reset counters"""
+        with self._lock:
+            self._reset()
+            self.hits = 0
+            self.misses = 0
+            self.lexical_rejections = 0
+            self.invalidations = 0
+
+    def stats(self) -> Dict:
+        """Get cache size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'lexical_rejections': self.lexical_rejections,
+                'invalidations': self.invalidations,
+                'collection_version': self._version
+            }
@@ -0,0 +1,414 @@
+"""
+Vector Index Backends
+Pluggable nearest-neighbour search for MultimodalRAGService.retrieve_multimodal:
+
+    chromadb : query the ChromaDB collection (SQLite + HNSW)
+    mmap     : search over a compact matrix in a memory-mapped .npy file - one
+               vectorized matmul + argpartition per query; every worker process shares
+               the same page-cached copy
+
+The mmap matrix is stored as float32, float16 or int8 (scalar-quantized with a per-vector
+scale). Quantized exports can keep a float32 copy (rescore.npy) that is only read for a
+small candidate set: the compact matrix picks k * rescore_factor candidates and exact
+float32 scores decide the final top-k.
+
+Both return documents as {"id", "content", "metadata", "distance", "collection"} with
+squared-L2 distances (ChromaDB's default space), so results from either backend merge
+the same way. The mmap index of a collection is exported from ChromaDB with
+export_chroma_collection (scripts/export_mmap_index.py).
+
+Layout: index_root/<collection>/manifest.json names the current export subdirectory
+("data_dir") holding the arrays. A re-export writes a new subdirectory and then replaces
+only the small manifest file, so no directory whose files are memory-mapped is ever
+renamed (Windows refuses to rename or delete mapped files); superseded exports are
+removed once nothing maps them.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+VECTORS_FILE = 'vectors.npy'
+PAGES_FILE = 'pages.npy'
+TYPES_FILE = 'types.npy'
+DOCUMENTS_FILE = 'documents.json'
+SCALES_FILE = 'scales.npy'
+RESCORE_FILE = 'rescore.npy'
+
+VECTOR_DTYPES = ('float32', 'float16', 'int8')
+RESCORE_MODES = ('auto', 'true', 'false')
+
+# Metadata "type" values are stored as small integer codes for vectorized filtering
+TYPE_CODES = {'text': 0, 'image': 1}
+
+_BLOCK_ROWS = 16384  # Rows converted to float32 per matmul block
+
+EXPORT_PREFIX = 'export-'
+KEEP_EXPORTS = 2  # Current export and the one before it (readers that just read the old manifest)
+
+
+def export_data_dir(directory: str, manifest: Optional[Dict] = None) -> str:
+    """Directory holding the arrays of an index's current export (the index directory for old exports)"""
+    if manifest is None:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+    return os.path.join(directory, manifest['data_dir']) if manifest.get('data_dir') else directory
+
+
+class VectorIndex:
+    """Interface of a per-collection vector index"""
+
+    name = ''
+
+    def query(self, query_embedding: List[float], k: int, where: Optional[Dict] = None,
+              rescore: Optional[bool] = None) -> List[Dict]:
+        """
+        Get the k nearest documents, optionally filtered on metadata (``type``/``page``)
+
+        Args:
+            rescore: Re-rank quantized candidates with exact float32 scores (None = index default)
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaVectorIndex(VectorIndex):
+    """ChromaDB collection as a VectorIndex"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def query(self, query_embedding: List[float], k: int, where: Optional[Dict] = None,
+              rescore: Optional[bool] = None) -> List[Dict]:
+        kwargs = {"where": where} if where else {}
+        results = self.collection.query(query_embeddings=[list(query_embedding)], n_results=k, **kwargs)
+
+        retrieved_docs = []
+        for i in range(len(results["ids"][0])):
+            retrieved_docs.append({
+                "id": results["ids"][0][i],
+                "content": results["documents"][0][i],
+                "metadata": results["metadatas"][0][i],
+                "distance": results["distances"][0][i] if "distances" in results else None,
+                "collection": self.name
+            })
+        return retrieved_docs
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+def _field_mask(values: np.ndarray, condition) -> np.ndarray:
+    """Mask for one field condition: a value or {"$eq"|"$ne"|"$in"|"$nin"|"$gt"|"$gte"|"$lt"|"$lte": value}"""
+    if not isinstance(condition, dict):
+        return values == condition
+    mask = np.ones(len(values), dtype=bool)
+    for op, operand in condition.items():
+        if op == '$eq':
+            mask &= values == operand
+        elif op == '$ne':
+            mask &= values != operand
+        elif op == '$in':
+            mask &= np.isin(values, operand)
+        elif op == '$nin':
+            mask &= ~np.isin(values, operand)
+        elif op == '$gt':
+            mask &= values > operand
+        elif op == '$gte':
+            mask &= values >= operand
+        elif op == '$lt':
+            mask &= values < operand
+        elif op == '$lte':
+            mask &= values <= operand
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return mask
+
+
+class MmapVectorIndex(VectorIndex):
+    """Search over a memory-mapped (optionally quantized) matrix exported from a collection"""
+
+    def __init__(self, directory: str, rescore_factor: int = 4):
+        """
+        Open an exported index (vectors are memory-mapped, not read into memory)
+
+        Args:
+            directory: Index directory written by export_chroma_collection
+            rescore_factor: Candidates per result re-ranked with float32 scores (0 disables rescoring)
+        """
+        self.directory = directory
+        self.rescore_factor = rescore_factor
+        self.lock = threading.Lock()
+        self._manifest_mtime = None
+        self._load()
+
+    def _load(self):
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        mtime = os.stat(manifest_path).st_mtime_ns
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        data_dir = export_data_dir(self.directory, manifest)
+        with open(os.path.join(data_dir, DOCUMENTS_FILE), 'r') as f:
+            documents = json.load(f)
+
+        vectors = np.load(os.path.join(data_dir, VECTORS_FILE), mmap_mode='r')
+        pages = np.load(os.path.join(data_dir, PAGES_FILE))
+        types = np.load(os.path.join(data_dir, TYPES_FILE))
+        scales = np.load(os.path.join(data_dir, SCALES_FILE)) if manifest.get('dtype') == 'int8' else None
+        exact = (np.load(os.path.join(data_dir, RESCORE_FILE), mmap_mode='r')
+                 if manifest.get('rescore') else None)
+
+        self.manifest = manifest
+        self.name = manifest['collection']
+        # Swapped as one tuple so a concurrent query never mixes two exports
+        self._state = (vectors, scales, exact, pages, types, documents)
+        self._manifest_mtime = mtime
+
+    def _reload_if_changed(self):
+        """Pick up a re-export (a new manifest) without restarting workers"""
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST_FILE)).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._manifest_mtime:
+            with self.lock:
+                if mtime != self._manifest_mtime:
+                    try:
+                        self._load()
+                    except (OSError, ValueError, KeyError) as e:
+                        # Export replaced mid-read; keep serving the loaded one and retry next query
+                        logger.warning(f"⚠️ Failed to reload mmap index {self.name}: {e}")
+                        return
+                    logger.info(f"🔄 Reloaded mmap index {self.name} ({self.count()} vectors)")
+
+    @staticmethod
+    def _filter_mask(where: Dict, pages: np.ndarray, types: np.ndarray) -> np.ndarray:
+        mask = np.ones(len(pages), dtype=bool)
+        for field, condition in where.items():
+            if field == '$and':
+                for clause in condition:
+                    mask &= MmapVectorIndex._filter_mask(clause, pages, types)
+            elif field == 'page':
+                mask &= _field_mask(pages, condition)
+            elif field == 'type':
+                if isinstance(condition, dict):
+                    condition = {op: ([TYPE_CODES.get(v, -1) for v in operand] if isinstance(operand, list)
+                                      else TYPE_CODES.get(operand, -1)) for op, operand in condition.items()}
+                else:
+                    condition = TYPE_CODES.get(condition, -1)
+                mask &= _field_mask(types, condition)
+            else:
+                raise ValueError(f"mmap index only filters on 'type' and 'page', got '{field}'")
+        return mask
+
+    @staticmethod
+    def scores(vectors: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+        """Inner products of the (unit-norm) query with every stored vector (de-quantized by scales)"""
+        if len(vectors) <= _BLOCK_ROWS:
+            scores = vectors.astype(np.float32) @ query
+        else:
+            scores = np.concatenate([
+                vectors[start:start + _BLOCK_ROWS].astype(np.float32) @ query
+                for start in range(0, len(vectors), _BLOCK_ROWS)
+            ])
+        return scores * scales if scales is not None else scores
+
+    def query(self, query_embedding: List[float], k: int, where: Optional[Dict] = None,
+              rescore: Optional[bool] = None) -> List[Dict]:
+        self._reload_if_changed()
+        vectors, scales, exact, pages, types, documents = self._state
+        if not documents:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        scores = self.scores(vectors, query, scales)
+        candidates = np.arange(len(scores))
+        if where:
+            candidates = np.flatnonzero(self._filter_mask(where, pages, types))
+            scores = scores[candidates]
+        if len(candidates) == 0:
+            return []
+
+        if rescore is None:
+            rescore = self.rescore_factor > 0
+        if rescore and exact is not None:
+            # Shortlist on the compact scores, then re-rank with float32 rows read from disk
+            shortlist = min(len(candidates), k * max(1, self.rescore_factor))
+            keep = np.sort(np.argpartition(-scores, shortlist - 1)[:shortlist])
+            candidates = candidates[keep]
+            scores = exact[candidates] @ query
+
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        retrieved_docs = []
+        for position in top:
+            document = documents[int(candidates[position])]
+            retrieved_docs.append({
+                "id": document["id"],
+                "content": document["content"],
+                "metadata": document["metadata"],
+                # Squared L2 between unit vectors, matching ChromaDB's default space
+                "distance": float(2.0 - 2.0 * scores[position]),
+                "collection": self.name
+            })
+        return retrieved_docs
+
+    def count(self) -> int:
+        return len(self._state[-1])
+
+
+def rescore_enabled(mode: str, dtype: str) -> bool:
+    """
+    Whether an export keeps the float32 rescore copy
+
+    'auto' keeps it for int8 only: float16 alone already finds ~99.7% of the float32
+    top-k, while int8 alone drops to ~94% (scripts/evaluate_quantization.py --synthetic),
+    and the copy adds 4 bytes per dimension to the disk footprint.
+    """
+    if mode not in RESCORE_MODES:
+        raise ValueError(f"Unsupported rescore mode '{mode}', expected one of {RESCORE_MODES}")
+    if mode == 'auto':
+        return dtype == 'int8'
+    return mode == 'true'
+
+
+def quantize_int8(matrix: np.ndarray):
+    """
+    Scalar-quantize rows to int8 with a per-row scale (max |v| / 127)
+
+    Returns:
+        (int8 matrix, float32 scales) with row ~= int8 row * scale
+    """
+    scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.zeros(0, dtype=np.float32)
+    scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def export_chroma_collection(collection, index_root: str, batch_size: int = 1000,
+                             dtype: str = 'float16', rescore: bool = False) -> Dict:
+    """
+    Export a ChromaDB collection to an mmap index directory (index_root/<collection name>)
+
+    The arrays are written to a new export subdirectory and the manifest pointing at it
+    is replaced last, so workers reading the previous export keep a consistent view
+    until they reload. Older exports are deleted when possible (files still mapped on
+    Windows are left for a later export to remove).
+
+    Args:
+        dtype: Storage of the scanned matrix: 'float32', 'float16' or 'int8'
+        rescore: Also store float32 vectors to re-rank candidates of a quantized matrix
+
+    Returns:
+        The manifest of the new export
+    """
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unsupported vector dtype '{dtype}', expected one of {VECTOR_DTYPES}")
+    rescore = rescore and dtype != 'float32'
+    name = collection.name
+    total = collection.count()
+    ids, vectors, pages, types, documents = [], [], [], [], []
+    for offset in range(0, total, batch_size):
+        batch = collection.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        for doc_id, embedding, content, metadata in zip(batch["ids"], batch["embeddings"],
+                                                        batch["documents"], batch["metadatas"]):
+            metadata = metadata or {}
+            ids.append(doc_id)
+            vectors.append(np.asarray(embedding, dtype=np.float32))
+            pages.append(int(metadata.get("page", -1)))
+            types.append(TYPE_CODES.get(metadata.get("type"), -1))
+            documents.append({"id": doc_id, "content": content, "metadata": metadata})
+
+    dim = len(vectors[0]) if vectors else 0
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, dim), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1.0, norms)
+
+    target = os.path.join(index_root, name)
+    data_dir = f"{EXPORT_PREFIX}{time.time_ns()}-{os.getpid()}"
+    export_dir = os.path.join(target, data_dir)
+    os.makedirs(export_dir)
+    if dtype == 'int8':
+        stored, scales = quantize_int8(matrix)
+        np.save(os.path.join(export_dir, SCALES_FILE), scales)
+    else:
+        stored = matrix.astype(dtype)
+    np.save(os.path.join(export_dir, VECTORS_FILE), stored)
+    if rescore:
+        np.save(os.path.join(export_dir, RESCORE_FILE), matrix.astype(np.float32))
+    np.save(os.path.join(export_dir, PAGES_FILE), np.asarray(pages, dtype=np.int32))
+    np.save(os.path.join(export_dir, TYPES_FILE), np.asarray(types, dtype=np.int8))
+    with open(os.path.join(export_dir, DOCUMENTS_FILE), 'w') as f:
+        json.dump(documents, f)
+    manifest = {'collection': name, 'count': len(ids), 'dim': dim, 'dtype': dtype, 'rescore': rescore,
+                'data_dir': data_dir}
+    manifest_tmp = os.path.join(target, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(manifest_tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    _replace_file(manifest_tmp, os.path.join(target, MANIFEST_FILE))
+    _remove_old_exports(target, data_dir)
+
+    logger.info(f"✅ Exported {name} to mmap index: {len(ids)} vectors, {dtype} ({stored.nbytes / 1e6:.1f} MB"
+                f"{', float32 rescore copy' if rescore else ''})")
+    return manifest
+
+
+def _replace_file(source: str, target: str, attempts: int = 50):
+    """os.replace, retried while a reader briefly holds the target open (Windows)"""
+    for attempt in range(attempts):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.1)
+
+
+def _remove_old_exports(target: str, current: str):
+    """Delete superseded exports, keeping the newest KEEP_EXPORTS (best effort)"""
+    exports = sorted((entry for entry in os.listdir(target) if entry.startswith(EXPORT_PREFIX)),
+                     key=lambda entry: int(entry[len(EXPORT_PREFIX):].split('-')[0]), reverse=True)
+    for entry in exports[KEEP_EXPORTS:]:
+        if entry != current:
+            shutil.rmtree(os.path.join(target, entry), ignore_errors=True)
+    # Arrays of the old single-directory layout, now superseded by the export subdirectory
+    for legacy in (VECTORS_FILE, PAGES_FILE, TYPES_FILE, DOCUMENTS_FILE, SCALES_FILE, RESCORE_FILE):
+        try:
+            os.remove(os.path.join(target, legacy))
+        except OSError:
+            pass
+
+
+def open_vector_index(backend: str, collection, index_root: Optional[str] = None,
+                      rescore_factor: int = 4) -> VectorIndex:
+    """
+    Open the index of a collection for the configured backend
+
+    Falls back to ChromaDB when the mmap export of the collection is missing or unreadable.
+    """
+    if backend == 'mmap' and index_root:
+        directory = os.path.join(index_root, collection.name)
+        if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            try:
+                return MmapVectorIndex(directory, rescore_factor)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to open mmap index {directory}, using ChromaDB: {e}")
+        else:
+            logger.warning(f"⚠️ No mmap index for {collection.name} (run scripts/export_mmap_index.py), using ChromaDB")
+    return ChromaVectorIndex(collection)
@@ -1,3 +1,5 @@
+import json
+
 from flask import jsonify
 
 def success_response(data=None, message="Success", status_code=200):
@@ -21,3 +23,7 @@ def error_response(message="Error occurred", status_code=400, errors=None):
 def validation_error_response(errors, message="Validation failed"):
     """Create a validation error response"""
     return error_response(message=message, status_code=422, errors=errors)
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
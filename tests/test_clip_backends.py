@@ -0,0 +1,144 @@
+"""
+Parity tests of the alternative CLIP inference backends against PyTorch fp32
+
+Every backend must produce embeddings with cosine similarity >= 0.99 to the fp32
+reference for the same texts and images. The tests run against a small randomly
+initialized CLIP (same architecture, built into a temporary directory, no download);
+test_pretrained_backend_matches_fp32 repeats the check on MULTIMODAL_CLIP_MODEL and is
+skipped when its weights are not available.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from PIL import Image
+from transformers import CLIPConfig, CLIPImageProcessor, CLIPModel, CLIPProcessor, CLIPTokenizer
+
+from config import Config
+from shared.services.clip_backends import BATCH_PARITY_ATOL, BATCH_PARITY_MIN_COSINE, load_clip_backend
+
+MIN_COSINE = 0.99
+
+TEXTS = [
+    "Newton's second law relates force, mass and acceleration",
+    "What is the oxidation state of manganese in potassium permanganate?",
+    "mitochondria",
+    "Find the derivative of x squared times the sine of x with respect to x, and evaluate it at pi",
+]
+
+
+def make_images():
+    """Deterministic synthetic RGB images (gradients and noise)"""
+    rng = np.random.default_rng(0)
+    ramp = np.linspace(0, 255, 224, dtype=np.uint8)
+    gradient = np.stack([np.tile(ramp, (224, 1)), np.tile(ramp[:, None], (1, 224)),
+                         np.full((224, 224), 128, dtype=np.uint8)], axis=-1)
+    noise = rng.integers(0, 256, size=(224, 224, 3), dtype=np.uint8)
+    return [Image.fromarray(gradient), Image.fromarray(noise)]
+
+
+def byte_symbols():
+    """The printable symbols CLIP's byte-level BPE maps every byte to"""
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) \
+        + list(range(ord("®"), ord("ÿ") + 1))
+    extra = [b for b in range(256) if b not in printable]
+    return [chr(b) for b in printable] + [chr(256 + i) for i in range(len(extra))]
+
+
+@pytest.fixture(scope='module')
+def tiny_clip(tmp_path_factory):
+    """A small random CLIP saved like a hub model (character-level vocab, 32px images)"""
+    directory = tmp_path_factory.mktemp('tiny_clip')
+    symbols = byte_symbols()
+    vocab = {symbol: i for i, symbol in enumerate(symbols + [s + '</w>' for s in symbols])}
+    vocab['<|startoftext|>'] = len(vocab)
+    vocab['<|endoftext|>'] = len(vocab)
+    (directory / 'vocab.json').write_text(json.dumps(vocab))
+    (directory / 'merges.txt').write_text('#version: 0.2\n')
+
+    torch.manual_seed(0)
+    config = CLIPConfig(
+        text_config=dict(vocab_size=len(vocab), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+                         num_attention_heads=4, max_position_embeddings=77,
+                         bos_token_id=vocab['<|startoftext|>'], eos_token_id=vocab['<|endoftext|>'],
+                         pad_token_id=vocab['<|endoftext|>']),
+        vision_config=dict(hidden_size=64, intermediate_size=128, num_hidden_layers=2, num_attention_heads=4,
+                           image_size=32, patch_size=8),
+        projection_dim=32
+    )
+    CLIPModel(config).save_pretrained(directory)
+    tokenizer = CLIPTokenizer(str(directory / 'vocab.json'), str(directory / 'merges.txt'))
+    image_processor = CLIPImageProcessor(size={'shortest_edge': 32}, crop_size={'height': 32, 'width': 32})
+    CLIPProcessor(image_processor=image_processor, tokenizer=tokenizer).save_pretrained(directory)
+    return str(directory)
+
+
+def load_or_skip(backend, model_name, onnx_root):
+    if backend.startswith('onnx'):
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+    try:
+        loaded = load_clip_backend(backend, model_name, onnx_root=onnx_root)
+    except Exception as e:
+        pytest.skip(f"CLIP backend {backend} unavailable: {e}")
+    if loaded.name != backend:
+        pytest.fail(f"CLIP backend {backend} fell back to {loaded.name}")
+    return loaded
+
+
+def assert_parity(candidate, reference):
+    text_features = candidate.text_features(TEXTS)
+    image_features = candidate.image_features(make_images())
+    text_reference = reference.text_features(TEXTS)
+    image_reference = reference.image_features(make_images())
+
+    assert text_features.shape == text_reference.shape
+    assert image_features.shape == image_reference.shape
+    # Rows are unit-norm, so the row-wise dot product is the cosine similarity
+    assert np.allclose(np.linalg.norm(text_features, axis=1), 1.0, atol=1e-4)
+    assert (text_features * text_reference).sum(axis=1).min() >= MIN_COSINE
+    assert (image_features * image_reference).sum(axis=1).min() >= MIN_COSINE
+
+
+@pytest.mark.parametrize('backend', ['torch-int8', 'onnx', 'onnx-int8'])
+def test_backend_matches_fp32(tiny_clip, tmp_path, backend):
+    reference = load_or_skip('torch', tiny_clip, None)
+    assert_parity(load_or_skip(backend, tiny_clip, str(tmp_path)), reference)
+
+
+def test_onnx_export_is_reused(tiny_clip, tmp_path):
+    load_or_skip('onnx', tiny_clip, str(tmp_path))
+    exported = sorted(p.name for p in tmp_path.rglob('*.onnx'))
+
+    load_or_skip('onnx', tiny_clip, str(tmp_path))
+
+    assert exported == ['text_tower.onnx', 'vision_tower.onnx']
+    assert not list(tmp_path.rglob('*.tmp'))
+
+
+@pytest.mark.parametrize('backend', ['torch', 'torch-int8', 'onnx', 'onnx-int8'])
+@pytest.mark.parametrize('batch_size', [2, 3, len(TEXTS)])
+def test_batched_text_matches_single(tiny_clip, tmp_path, backend, batch_size):
+    """embed_texts (one pass per batch) vs embed_text (one pass per text)"""
+    clip = load_or_skip(backend, tiny_clip, str(tmp_path))
+    single = np.stack([clip.text_features([text])[0] for text in TEXTS])
+
+    batched = np.concatenate([clip.text_features(TEXTS[i:i + batch_size])
+                              for i in range(0, len(TEXTS), batch_size)])
+
+    assert np.array_equal(single[0], clip.text_features(TEXTS[:1])[0])  # Deterministic per shape
+    if backend.endswith('int8'):
+        assert (single * batched).sum(axis=1).min() >= BATCH_PARITY_MIN_COSINE
+    else:
+        assert np.abs(single - batched).max() <= BATCH_PARITY_ATOL
+
+
+@pytest.mark.parametrize('backend', ['torch-int8', 'onnx', 'onnx-int8'])
+def test_pretrained_backend_matches_fp32(tmp_path, backend):
+    reference = load_or_skip('torch', Config.MULTIMODAL_CLIP_MODEL, None)
+    assert_parity(load_or_skip(backend, Config.MULTIMODAL_CLIP_MODEL, str(tmp_path)), reference)
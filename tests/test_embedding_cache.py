@@ -0,0 +1,105 @@
+"""
+Tests of the query embedding cache (in-memory LRU/TTL and the shared SQLite disk cache)
+"""
+
+import numpy as np
+
+from shared.services.embedding_cache import EmbeddingCache
+
+
+def vector(*values):
+    return np.asarray(values, dtype=np.float32)
+
+
+def age(cache, key, seconds):
+    """Move an in-memory entry's store time into the past"""
+    stored, stored_at = cache._entries[key]
+    cache._entries[key] = (stored, stored_at - seconds)
+
+
+def test_keys_are_normalized():
+    cache = EmbeddingCache(max_size=4)
+    cache.put("  What is   Ohm's LAW? ", vector(1, 2))
+
+    assert np.array_equal(cache.get("what is ohm's law?"), vector(1, 2))
+    assert cache.get("what is ohms law?") is None
+    assert cache.stats()['size'] == 1
+
+
+def test_returned_vectors_are_copies():
+    cache = EmbeddingCache(max_size=4)
+    cache.put("q", vector(1, 2))
+
+    cache.get("q")[0] = 9
+
+    assert np.array_equal(cache.get("q"), vector(1, 2))
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("a", vector(1))
+    cache.put("b", vector(2))
+    cache.get("a")  # b is now the least recently used
+
+    cache.put("c", vector(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()['size'] == 2
+
+
+def test_ttl_expiry():
+    cache = EmbeddingCache(max_size=4, ttl_seconds=60)
+    cache.put("old", vector(1))
+    cache.put("fresh", vector(2))
+    age(cache, "old", 61)
+
+    assert cache.get("old") is None
+    assert cache.get("fresh") is not None
+    stats = cache.stats()
+    assert stats['size'] == 1 and stats['hits'] == 1 and stats['misses'] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = EmbeddingCache(max_size=0)
+    cache.put("q", vector(1))
+
+    assert cache.get("q") is None
+    assert cache.stats()['misses'] == 0
+
+
+def test_disk_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'embeddings.sqlite3')
+    EmbeddingCache(max_size=4, disk_path=path, namespace='clip-a').put("Define force", vector(1, 2, 3))
+
+    reloaded = EmbeddingCache(max_size=4, disk_path=path, namespace='clip-a')
+    assert np.array_equal(reloaded.get("define   FORCE"), vector(1, 2, 3))
+    assert reloaded.stats()['disk_hits'] == 1
+
+    assert np.array_equal(reloaded.get("define force"), vector(1, 2, 3))
+    assert reloaded.stats()['disk_hits'] == 1  # Second read served from memory
+
+    other_model = EmbeddingCache(max_size=4, disk_path=path, namespace='clip-b')
+    assert other_model.get("define force") is None
+
+
+def test_expired_disk_entry_misses(tmp_path):
+    path = str(tmp_path / 'embeddings.sqlite3')
+    writer = EmbeddingCache(max_size=4, ttl_seconds=60, disk_path=path)
+    writer.put("q", vector(1))
+    conn = writer._connection()
+    conn.execute("UPDATE query_embeddings SET stored_at = stored_at - 61")
+    conn.commit()
+
+    assert EmbeddingCache(max_size=4, ttl_seconds=60, disk_path=path).get("q") is None
+
+
+def test_unusable_disk_path_falls_back_to_memory(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+
+    cache = EmbeddingCache(max_size=4, disk_path=str(blocker / 'embeddings.sqlite3'))
+    cache.put("q", vector(1))
+
+    assert cache.disk_path is None
+    assert cache.get("q") is not None
@@ -0,0 +1,112 @@
+"""
+Tests of the shared embedding server and its client (fake backend, no CLIP weights)
+"""
+
+import os
+import stat
+import time
+import socket
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+if not hasattr(os, 'fork'):
+    pytest.skip("Unix sockets only", allow_module_level=True)
+
+from shared.services.embedding_server import EmbeddingServer, RemoteClipBackend
+
+AUTHKEY = b'test-secret'
+
+
+class FakeBackend:
+    name = 'fake'
+    projection_dim = 4
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def text_features(self, texts):
+        time.sleep(self.delay)
+        return np.array([[len(text), 0, 0, 1] for text in texts], dtype=np.float32)
+
+    def image_features(self, images):
+        return np.zeros((len(images), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def socket_dir(tmp_path):
+    return str(tmp_path / 'run')
+
+
+def start_server(address, backend, authkey=AUTHKEY):
+    server = EmbeddingServer(backend, address, authkey, max_wait_ms=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    deadline = time.time() + 5
+    while not os.path.exists(address) and time.time() < deadline:
+        time.sleep(0.01)
+    return server
+
+
+def test_round_trip_and_socket_permissions(socket_dir):
+    address = os.path.join(socket_dir, 'embed.sock')
+    start_server(address, FakeBackend())
+
+    client = RemoteClipBackend(address, AUTHKEY, connect_timeout=1.0)
+
+    assert client.name == 'remote:fake'
+    assert client.text_features(['ab', 'abcd'])[:, 0].tolist() == [2.0, 4.0]
+    assert stat.S_IMODE(os.stat(socket_dir).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(address).st_mode) & 0o077 == 0
+
+
+def test_authkey_is_required(socket_dir):
+    with pytest.raises(ValueError):
+        EmbeddingServer(FakeBackend(), os.path.join(socket_dir, 'embed.sock'), b'')
+    with pytest.raises(ValueError):
+        RemoteClipBackend(os.path.join(socket_dir, 'embed.sock'), b'')
+
+
+def test_wrong_authkey_is_rejected(socket_dir):
+    address = os.path.join(socket_dir, 'embed.sock')
+    start_server(address, FakeBackend())
+
+    with pytest.raises(Exception):
+        RemoteClipBackend(address, b'wrong-secret', connect_timeout=1.0)
+
+
+def test_missing_server_fails_fast(socket_dir):
+    started = time.time()
+    with pytest.raises(ConnectionError):
+        RemoteClipBackend(os.path.join(socket_dir, 'missing.sock'), AUTHKEY, connect_timeout=1.0)
+    assert time.time() - started < 1.0
+
+
+def test_slow_reply_times_out_and_connection_is_replaced(socket_dir):
+    address = os.path.join(socket_dir, 'embed.sock')
+    backend = FakeBackend()
+    start_server(address, backend)
+    client = RemoteClipBackend(address, AUTHKEY, connect_timeout=1.0, request_timeout=0.2)
+
+    backend.delay = 0.5
+    with pytest.raises(TimeoutError):
+        client.text_features(['slow'])
+
+    backend.delay = 0.0
+    time.sleep(0.5)  # The late reply goes to the dropped connection
+    assert client.text_features(['abc'])[0, 0] == 3.0
+
+
+def test_handshake_timeouts_are_raised_to_request_timeout(socket_dir):
+    address = os.path.join(socket_dir, 'embed.sock')
+    start_server(address, FakeBackend(delay=0.3))
+    client = RemoteClipBackend(address, AUTHKEY, connect_timeout=0.1, request_timeout=2.5)
+
+    conn = client._connection()
+    with socket.fromfd(conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        for option in (socket.SO_RCVTIMEO, socket.SO_SNDTIMEO):
+            timeval = sock.getsockopt(socket.SOL_SOCKET, option, struct.calcsize('@ll'))
+            assert struct.unpack('@ll', timeval) == (2, 500000)
+
+    assert client.text_features(['slow'])[0, 0] == 4.0  # Slower than connect_timeout
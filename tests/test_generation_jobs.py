@@ -0,0 +1,109 @@
+"""
+Tests of the durable MCQ generation job table (leases, publishing and resume)
+
+Jobs live in an in-memory SQLite database; workers are driven by hand
+(_claim_next_job / _run_job) instead of through the worker threads.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from shared.models.user import db
+from shared.models.purchase import MCQGenerationJob
+from shared.services.async_mcq_generation_service import AsyncMCQGenerationService, GenerationJobContext
+
+JOB_TYPE = 'test_chunks'
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def make_service(handler=lambda context: {'success': True}):
+    service = AsyncMCQGenerationService()
+    service.register_handler(JOB_TYPE, handler)
+    return service
+
+
+def create_job(service, job_id='job-1'):
+    return service.create_session(mock_test_id=None, user_id=None, subject_id=None, total_questions=15,
+                                  job_type=JOB_TYPE, session_id=job_id)
+
+
+def expire_lease(job_id):
+    db.session.get(MCQGenerationJob, job_id).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_stale_lease_is_taken_over_by_another_worker(app):
+    first, second = make_service(), make_service()
+    create_job(first)
+    assert first._claim_next_job() == 'job-1'
+    first_context = GenerationJobContext(first, db.session.get(MCQGenerationJob, 'job-1'))
+
+    assert second._claim_next_job() is None  # Lease still live
+    expire_lease('job-1')
+    assert second._claim_next_job() == 'job-1'
+
+    job = db.session.get(MCQGenerationJob, 'job-1')
+    assert job.lease_owner != first_context.lease_token
+    assert job.status == 'running' and job.attempts == 2
+
+    first._finish_job('job-1', first_context.lease_token, error='late failure')
+    job = db.session.get(MCQGenerationJob, 'job-1')
+    assert job.status == 'running' and job.error_message is None  # The old owner's finish is a no-op
+
+
+def test_publish_after_losing_the_lease_does_not_commit(app):
+    first, second = make_service(), make_service()
+    create_job(first)
+    first._claim_next_job()
+    context = GenerationJobContext(first, db.session.get(MCQGenerationJob, 'job-1'))
+    assert context.publish(1, [{'question': 'q1'}])
+
+    expire_lease('job-1')
+    second._claim_next_job()
+    db.session.add(MCQGenerationJob(id='written-by-handler', job_type=JOB_TYPE, status='completed'))
+
+    assert context.publish(2, [{'question': 'q2'}]) is False
+    assert context.lease_lost
+    assert db.session.get(MCQGenerationJob, 'written-by-handler') is None  # Handler rows rolled back
+    job = db.session.get(MCQGenerationJob, 'job-1')
+    assert job.completed_chunks == [1] and [q['question'] for q in job.questions] == ['q1']
+    assert context.publish(3, [{'question': 'q3'}]) is False
+
+
+def test_resumed_job_skips_completed_chunks(app):
+    runs = []
+
+    def handler(context):
+        for chunk_num in (1, 2, 3):
+            if chunk_num in context.completed_chunks:
+                continue
+            if chunk_num == 2 and len(runs) == 1:
+                raise RuntimeError('worker crashed')
+            runs[-1].append(chunk_num)
+            context.publish(chunk_num, [{'question': f'q{chunk_num}'}])
+        return {'success': True}
+
+    service = make_service(handler)
+    create_job(service)
+
+    for expected_status in ('pending', 'completed'):
+        runs.append([])
+        job_id = service._claim_next_job()
+        service._run_job(job_id)
+        assert db.session.get(MCQGenerationJob, job_id).status == expected_status
+
+    assert runs == [[1], [2, 3]]
+    job = db.session.get(MCQGenerationJob, 'job-1')
+    assert [q['question'] for q in job.questions] == ['q1', 'q2', 'q3']
+    assert job.completed_chunks == [1, 2, 3] and job.attempts == 2 and job.lease_owner is None
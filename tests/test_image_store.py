@@ -0,0 +1,62 @@
+"""
+Tests of the SQLite image store and its LRU read cache
+"""
+
+import base64
+
+from shared.services.image_store import ImageStore
+
+
+def b64(payload: bytes) -> str:
+    return base64.b64encode(payload).decode()
+
+
+def test_put_many_round_trips_and_replaces(tmp_path):
+    store = ImageStore(str(tmp_path / 'images.sqlite3'), cache_size=4)
+    store.put_many('Physics', {'a': b64(b'one'), 'b': b64(b'two')}, pdf_file='a.pdf')
+
+    assert store.get('physics', 'a') == b64(b'one')  # Subjects are case-insensitive
+    store.put_many('physics', {'a': b64(b'new')}, pdf_file='a.pdf')
+
+    assert store.get('physics', 'a') == b64(b'new')  # Cached value invalidated on replace
+    assert store.count('physics') == 2 and store.count() == 2
+    assert store.get('physics', 'missing') is None
+
+
+def test_get_serves_from_lru_and_evicts_oldest(tmp_path):
+    store = ImageStore(str(tmp_path / 'images.sqlite3'), cache_size=2)
+    store.put_many('physics', {name: b64(name.encode()) for name in 'abc'})
+    store.get('physics', 'a')
+    store.get('physics', 'b')
+    store.get('physics', 'a')  # b is now the least recently used
+
+    store.get('physics', 'c')
+
+    assert list(store._cache) == [('physics', 'a'), ('physics', 'c')]
+    store._connection().execute("DELETE FROM images")
+    assert store.get('physics', 'a') == b64(b'a')  # Served without touching SQLite
+    assert store.get('physics', 'b') is None
+
+
+def test_persists_across_instances(tmp_path):
+    ImageStore(str(tmp_path / 'images.sqlite3')).put_many('physics', {'a': b64(b'one')})
+
+    assert ImageStore(str(tmp_path / 'images.sqlite3')).get('physics', 'a') == b64(b'one')
+
+
+def test_delete_file_keeps_listed_images(tmp_path):
+    store = ImageStore(str(tmp_path / 'images.sqlite3'), cache_size=8)
+    store.put_many('physics', {'a0': b64(b'0'), 'a1': b64(b'1'), 'a2': b64(b'2')}, pdf_file='a.pdf')
+    store.put_many('physics', {'b0': b64(b'b')}, pdf_file='b.pdf')
+    store.put_many('chemistry', {'c0': b64(b'c')}, pdf_file='a.pdf')
+    store.get('physics', 'a1')
+
+    assert store.delete_file('physics', 'a.pdf', keep={'a0'}) == 2
+
+    assert store.get('physics', 'a0') == b64(b'0')
+    assert store.get('physics', 'a1') is None  # Dropped from the cache too
+    assert store.get('physics', 'a2') is None
+    assert store.get('physics', 'b0') == b64(b'b')
+    assert store.get('chemistry', 'c0') == b64(b'c')
+    assert store.delete_file('physics', 'a.pdf') == 1
+    assert store.count('physics') == 1
@@ -0,0 +1,159 @@
+"""
+Tests of incremental subject indexing (VectorStoreSetup.process_subject)
+
+PDFs are real PyMuPDF files parsed in-process, embeddings are deterministic fakes
+and rows go to an in-memory ChromaDB client, so re-runs can be checked for skipped
+unchanged PDFs and for the removal of rows and images of changed or deleted PDFs.
+"""
+
+import importlib
+import io
+import types
+
+import numpy as np
+import pytest
+
+fitz = pytest.importorskip("fitz")
+chromadb = pytest.importorskip("chromadb")
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from config import Config
+from shared.services.image_store import ImageStore
+from shared.services.index_metadata import IndexMetadata, compute_file_checksum
+import shared.services.multimodal_rag_service as multimodal_rag_service
+
+SUBJECT = 'physics'
+DIM = 8
+
+
+def fake_embeddings(items, batch_size=None):
+    rng = np.random.default_rng(len(items))
+    vectors = rng.normal(size=(len(items), DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def png(color):
+    buffered = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def write_pdf(path, texts, images=()):
+    doc = fitz.open()
+    for text in texts:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+        for i, color in enumerate(images):
+            page.insert_image(fitz.Rect(72, 200 + 40 * i, 104, 232 + 40 * i), stream=png(color))
+    doc.save(str(path))
+    doc.close()
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The script logs to ./logs
+    script = importlib.import_module('scripts.setup_multimodal_vector_store')
+    monkeypatch.setattr(script, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(multimodal_rag_service, 'embed_texts', fake_embeddings)
+    monkeypatch.setattr(multimodal_rag_service, 'embed_images', fake_embeddings)
+    monkeypatch.setattr(Config, 'MULTIMODAL_CHUNKING', 'char')
+    monkeypatch.setattr(Config, 'MULTIMODAL_ENABLE_IMAGE_PROCESSING', True)
+
+    client = chromadb.EphemeralClient()
+    service = types.SimpleNamespace(client=client, image_store=ImageStore(str(tmp_path / 'images.sqlite3')))
+    (tmp_path / 'pdfs').mkdir()
+
+    def make_setup():
+        vector_store = script.VectorStoreSetup(str(tmp_path / 'chroma'), pdf_root=str(tmp_path / 'pdfs'))
+        vector_store.index_metadata = IndexMetadata(str(tmp_path / 'index_metadata.json'))
+        vector_store.service = service
+        return vector_store
+
+    yield make_setup, service, tmp_path / 'pdfs'
+    client.delete_collection(SUBJECT)
+
+
+def rows_by_file(collection):
+    rows = {}
+    for doc_id, metadata in zip(*(collection.get(include=['metadatas'])[key] for key in ('ids', 'metadatas'))):
+        rows.setdefault(metadata['pdf_file'], set()).add(doc_id)
+    return rows
+
+
+def test_unchanged_pdf_is_skipped(setup):
+    make_setup, service, pdf_root = setup
+    write_pdf(pdf_root / 'a.pdf', ["Force equals mass times acceleration."])
+    write_pdf(pdf_root / 'b.pdf', ["Energy is conserved."])
+    pdfs = [str(pdf_root / 'a.pdf'), str(pdf_root / 'b.pdf')]
+    first = make_setup()
+    assert first.process_subject(SUBJECT, pdfs)[0] > 0
+    before = rows_by_file(service.client.get_collection(SUBJECT))
+
+    second = make_setup()
+    assert second.process_subject(SUBJECT, pdfs) == (0, 0, 0)
+
+    assert second.stats['pdfs_skipped'] == 2 and second.stats['pdfs_processed'] == 0
+    assert rows_by_file(service.client.get_collection(SUBJECT)) == before
+
+
+def test_changed_pdf_replaces_its_stale_rows_and_images(setup):
+    make_setup, service, pdf_root = setup
+    write_pdf(pdf_root / 'a.pdf', ["Old page one.", "Old page two."], images=["red", "blue"])
+    write_pdf(pdf_root / 'b.pdf', ["Energy is conserved."])
+    pdfs = [str(pdf_root / 'a.pdf'), str(pdf_root / 'b.pdf')]
+    make_setup().process_subject(SUBJECT, pdfs)
+    collection = service.client.get_collection(SUBJECT)
+    before = rows_by_file(collection)
+    assert service.image_store.count(SUBJECT) == 4  # Two images on each page of a.pdf
+
+    write_pdf(pdf_root / 'a.pdf', ["New page one."], images=["green"])
+    rerun = make_setup()
+    docs, images, errors = rerun.process_subject(SUBJECT, pdfs)
+
+    after = rows_by_file(collection)
+    assert errors == 0 and rerun.stats['pdfs_skipped'] == 1
+    assert after['b.pdf'] == before['b.pdf']
+    assert len(after['a.pdf']) == docs == 2  # One text chunk and one image
+    assert not after['a.pdf'] & before['a.pdf']
+    assert service.image_store.count(SUBJECT) == images == 1
+    assert service.image_store.get(SUBJECT, 'a_page_0_img_0') is not None
+    assert service.image_store.get(SUBJECT, 'a_page_1_img_1') is None
+
+
+def test_deleted_pdf_rows_and_images_are_removed(setup):
+    make_setup, service, pdf_root = setup
+    write_pdf(pdf_root / 'a.pdf', ["Force equals mass times acceleration."], images=["red"])
+    write_pdf(pdf_root / 'b.pdf', ["Energy is conserved."])
+    make_setup().process_subject(SUBJECT, [str(pdf_root / 'a.pdf'), str(pdf_root / 'b.pdf')])
+    collection = service.client.get_collection(SUBJECT)
+    before = rows_by_file(collection)
+
+    rerun = make_setup()
+    rerun.process_subject(SUBJECT, [str(pdf_root / 'b.pdf')])
+
+    assert rerun.stats['pdfs_removed'] == 1
+    assert rows_by_file(collection) == {'b.pdf': before['b.pdf']}
+    assert service.image_store.count(SUBJECT) == 0
+    assert rerun.index_metadata.indexed_files(SUBJECT) == ['b.pdf']
+    assert not rerun.index_metadata.is_changed(SUBJECT, str(pdf_root / 'b.pdf'),
+                                               rerun.index_metadata.data['file_checksums']['physics/b.pdf'])
+
+
+def test_legacy_positional_ids_are_purged_once(setup):
+    make_setup, service, pdf_root = setup
+    write_pdf(pdf_root / 'a.pdf', ["Force equals mass times acceleration."])
+    collection = service.client.get_or_create_collection(SUBJECT)
+    collection.add(ids=['doc_0', 'doc_1'], documents=['old', 'old'], embeddings=fake_embeddings([0, 1]).tolist(),
+                   metadatas=[{'pdf_file': 'a.pdf', 'page': 0}] * 2)
+    first = make_setup()
+    first.index_metadata.record_file(SUBJECT, str(pdf_root / 'a.pdf'), compute_file_checksum(str(pdf_root / 'a.pdf')))
+
+    first.process_subject(SUBJECT, [str(pdf_root / 'a.pdf')])
+
+    ids = collection.get(include=[])['ids']
+    assert ids and not {'doc_0', 'doc_1'} & set(ids)
+    assert first.stats['pdfs_skipped'] == 0  # Unchanged, but its checksum was forgotten with the legacy rows
+    assert multimodal_rag_service.purge_legacy_doc_ids(collection, SUBJECT, make_setup().index_metadata) == 0
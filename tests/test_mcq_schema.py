@@ -0,0 +1,58 @@
+"""
+Unit tests for the MCQ output schema (answer normalization and validation)
+"""
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from shared.services.mcq_schema import MCQQuestion, mcq_array_schema, validate_question, validate_questions
+
+
+def mcq(**overrides):
+    question = {
+        'question': 'Which gas do plants absorb?',
+        'option_a': 'Oxygen', 'option_b': 'Carbon dioxide', 'option_c': 'Nitrogen', 'option_d': 'Helium',
+        'correct_answer': 'B'
+    }
+    question.update(overrides)
+    return question
+
+
+class TestNormalizeAnswer:
+    """correct_answer variants produced by LLMs"""
+
+    @pytest.mark.parametrize('answer', ['B', 'b', ' b ', 'B)', 'B.', 'b) Carbon dioxide', 'Option B', 'option b',
+                                        'OPTION_B', 'Option: B'])
+    def test_variants_map_to_letter(self, answer):
+        assert MCQQuestion.normalize_answer(answer) == 'B'
+        assert validate_question(mcq(correct_answer=answer))['correct_answer'] == 'B'
+
+    @pytest.mark.parametrize('answer', ['AB', 'E', 'Both', '', 'Carbon dioxide', 2])
+    def test_ambiguous_or_unknown_answers_are_rejected(self, answer):
+        assert validate_question(mcq(correct_answer=answer)) is None
+
+    def test_multiple_letters_are_not_truncated(self):
+        assert MCQQuestion.normalize_answer('AB') == 'AB'
+
+
+class TestValidation:
+    """Whole-object validation"""
+
+    def test_empty_option_is_rejected(self):
+        assert validate_question(mcq(option_c='  ')) is None
+
+    def test_extra_fields_are_ignored_and_explanation_defaults(self):
+        question = validate_question(mcq(difficulty='hard'))
+        assert 'difficulty' not in question
+        assert question['explanation'] == ''
+
+    def test_validate_questions_counts_invalid(self):
+        valid, invalid = validate_questions([mcq(), mcq(correct_answer='AB'), 'not an object'])
+        assert len(valid) == 1
+        assert invalid == 2
+
+    def test_array_schema_pins_the_count(self):
+        schema = mcq_array_schema(5)
+        assert schema['minItems'] == schema['maxItems'] == 5
+        assert schema['items']['properties']['correct_answer']['enum'] == ['A', 'B', 'C', 'D']
@@ -0,0 +1,99 @@
+"""
+Unit tests for the incremental MCQ JSON parser (streamed LLM output)
+"""
+
+import json
+
+import pytest
+
+from shared.services.mcq_stream_parser import IncrementalMCQParser, parse_mcq_objects
+
+
+def mcq(n):
+    return {
+        'question': f'Question {n}?',
+        'option_a': 'A', 'option_b': 'B', 'option_c': 'C', 'option_d': 'D',
+        'correct_answer': 'B'
+    }
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalMCQParser()
+    parsed = []
+    for start in range(0, len(text), size):
+        parsed.extend(parser.feed(text[start:start + size]))
+    return parser, parsed
+
+
+class TestIncrementalMCQParser:
+    """Chunk boundaries, string handling and recovery from malformed objects"""
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1000])
+    def test_braces_split_across_chunks(self, chunk_size):
+        text = json.dumps([mcq(1), mcq(2), mcq(3)])
+        parser, parsed = feed_in_chunks(text, chunk_size)
+        assert parsed == [mcq(1), mcq(2), mcq(3)]
+        assert not parser.has_partial
+
+    def test_objects_are_emitted_as_soon_as_they_close(self):
+        first, second = json.dumps(mcq(1)), json.dumps(mcq(2))
+        parser = IncrementalMCQParser()
+        assert parser.feed('[' + first[:-1]) == []
+        assert parser.feed('}, ' + second[:10]) == [mcq(1)]
+        assert parser.has_partial
+        assert parser.feed(second[10:] + ']') == [mcq(2)]
+
+    def test_braces_and_quotes_inside_strings(self):
+        tricky = dict(mcq(1), question='Which set is {x | x > 0}? Use "}" and \\"{\\" carefully',
+                      option_a='{1, 2}, {3, 4}')
+        parser, parsed = feed_in_chunks(json.dumps([tricky, mcq(2)]), 5)
+        assert parsed == [tricky, mcq(2)]
+
+    def test_trailing_comma_is_repaired(self):
+        text = '[{"question": "Q1?", "option_a": "A", "correct_answer": "A",}, ' + json.dumps(mcq(2)) + ']'
+        parser = IncrementalMCQParser()
+        parsed = parser.feed(text)
+        assert parsed == [{'question': 'Q1?', 'option_a': 'A', 'correct_answer': 'A'}, mcq(2)]
+        assert parser.objects_repaired == 1
+
+    def test_one_bad_object_among_good_ones_is_dropped(self):
+        text = '```json\n[' + json.dumps(mcq(1)) + ', {"question": "Q2?" "option_a": "A"}, ' \
+            + json.dumps(mcq(3)) + ']\n```'
+        parser = IncrementalMCQParser()
+        assert parser.feed(text) == [mcq(1), mcq(3)]
+        assert parser.objects_dropped == 1
+
+    def test_unterminated_string_does_not_swallow_later_objects(self):
+        broken = '{"question": "What is 2+2?, "option_a": "3", "option_b": "4", "correct_answer": "B"}'
+        text = '[' + json.dumps(mcq(1)) + ', ' + broken + ', ' + json.dumps(mcq(3)) + ', ' + json.dumps(mcq(4)) + ']'
+        parser, parsed = feed_in_chunks(text, 4)
+        assert parsed == [mcq(1), mcq(3), mcq(4)]
+        assert parser.objects_dropped == 1
+        assert not parser.has_partial
+
+    def test_unclosed_object_is_closed_at_the_next_object(self):
+        text = '[{"question": "Q1?", "option_a": "A", "correct_answer": "A", ' + json.dumps(mcq(2)) + ']'
+        parser = IncrementalMCQParser()
+        assert parser.feed(text) == [{'question': 'Q1?', 'option_a': 'A', 'correct_answer': 'A'}, mcq(2)]
+        assert parser.resyncs == 1
+
+    def test_unterminated_string_at_end_of_stream_is_partial(self):
+        parser = IncrementalMCQParser()
+        assert parser.feed('[' + json.dumps(mcq(1)) + ', {"question": "Cut off mid sent') == [mcq(1)]
+        assert parser.has_partial
+
+    def test_wrapper_object_yields_its_questions(self):
+        assert parse_mcq_objects(json.dumps({'questions': [mcq(1), mcq(2)]})) == [mcq(1), mcq(2)]
+
+
+def test_whole_response_fallback_repairs_single_quoted_objects():
+    """The case the streaming parser cannot recover, kept alive by _parse_mcq_response"""
+    pytest.importorskip("fitz")
+    pytest.importorskip("chromadb")
+    pytest.importorskip("ollama")
+    from shared.services.multimodal_rag_service import MultimodalRAGService
+
+    text = json.dumps([mcq(1), mcq(2)]).replace('"', "'")
+
+    assert parse_mcq_objects(text) == []
+    assert MultimodalRAGService._parse_mcq_response(text) == [mcq(1), mcq(2)]
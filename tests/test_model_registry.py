@@ -0,0 +1,126 @@
+"""
+Tests of the lazily loading model registry
+"""
+
+import os
+import threading
+
+import pytest
+
+from shared.services.model_registry import FAILED, NOT_LOADED, READY, WARMING, ModelRegistry
+
+
+def test_loader_runs_once_for_concurrent_callers():
+    calls = []
+    release = threading.Event()
+    registry = ModelRegistry()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 'model'
+
+    registry.register('clip', loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get('clip'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['model'] * 4
+    assert len(calls) == 1
+    assert registry.overall_state() == READY
+
+
+def test_failure_is_remembered_without_retry():
+    calls = []
+    registry = ModelRegistry()
+
+    def loader():
+        calls.append(1)
+        raise OSError('weights missing')
+
+    registry.register('clip', loader)
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match='weights missing'):
+            registry.get('clip')
+
+    assert len(calls) == 1
+    assert registry.overall_state() == FAILED
+
+
+def test_retry_waits_for_backoff():
+    calls = []
+    registry = ModelRegistry()
+
+    def loader():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError('server starting')
+        return 'remote'
+
+    registry.register('clip', loader, retry=True, retry_after=60)
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match='server starting'):
+            registry.get('clip')
+    assert len(calls) == 1  # Failed fast inside the backoff
+
+    registry._components['clip'].retry_at = 0.0  # Backoff elapsed
+    assert registry.get('clip') == 'remote'
+    assert len(calls) == 2
+
+
+def test_warm_up_retries_until_ready():
+    calls = []
+    registry = ModelRegistry()
+
+    def loader():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError('server starting')
+        return 'remote'
+
+    registry.register('clip', loader, retry=True, retry_after=0)
+    registry.warm_up().join(10)
+
+    assert registry.status()['clip']['state'] == READY
+    assert len(calls) == 3
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='POSIX only')
+def test_forked_child_does_not_inherit_warming_state_or_locks():
+    registry = ModelRegistry()  # Not the global instance, so no component leaks into other tests
+    os.register_at_fork(after_in_child=registry._after_fork_in_child)  # As done for model_registry
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(10)
+        return 'slow'
+
+    registry.register('slow', slow_loader)
+    registry.register('ready', lambda: 'ready')
+    registry.get('ready')
+    registry.warm_up(['slow'])
+    assert started.wait(5)  # The warm-up thread holds the component lock now
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            status = registry.status()
+            code = 0 if (status['slow']['state'] == NOT_LOADED
+                         and status['ready']['state'] == READY
+                         and registry._components['slow'].lock.acquire(timeout=1)) else 2
+        finally:
+            os._exit(code)
+
+    _, exit_status = os.waitpid(pid, 0)
+    release.set()
+    registry._warmup_thread.join(5)
+
+    assert os.waitstatus_to_exitcode(exit_status) == 0
+    assert registry.status()['slow']['state'] == READY
+    assert WARMING not in {c['state'] for c in registry.status().values()}
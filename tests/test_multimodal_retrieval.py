@@ -0,0 +1,128 @@
+"""
+Tests of retrieval over several collections and of how retrieved context is spread
+over MCQ generation chunks
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("chromadb")
+pytest.importorskip("ollama")
+
+from config import Config
+from shared.services import multimodal_rag_service
+from shared.services.multimodal_rag_service import MultimodalRAGService
+
+partition_context = MultimodalRAGService.partition_context
+
+
+def ranked(n):
+    return [{"id": f"doc{i}", "distance": i / 10} for i in range(n)]
+
+
+def ids(slices):
+    return [[doc["id"] for doc in picked] for picked in slices]
+
+
+def test_partition_is_strided_and_disjoint_when_pool_is_large_enough():
+    slices = partition_context(ranked(9), num_chunks=3, per_chunk=3)
+
+    assert ids(slices) == [["doc0", "doc3", "doc6"], ["doc1", "doc4", "doc7"], ["doc2", "doc5", "doc8"]]
+
+
+def test_uneven_pool_wraps_only_for_the_missing_ranks():
+    slices = partition_context(ranked(7), num_chunks=3, per_chunk=3)
+
+    assert ids(slices) == [["doc0", "doc3", "doc6"], ["doc1", "doc4", "doc0"], ["doc2", "doc5", "doc1"]]
+    assert all(len(picked) == 3 for picked in slices)
+
+
+def test_more_chunks_than_docs_still_gives_every_chunk_context():
+    slices = partition_context(ranked(2), num_chunks=5, per_chunk=3)
+
+    assert len(slices) == 5
+    assert ids(slices) == [["doc0", "doc1"], ["doc1", "doc0"]] * 2 + [["doc0", "doc1"]]  # No doc twice in a chunk
+
+
+def test_empty_context_gives_empty_slices():
+    assert partition_context([], num_chunks=4, per_chunk=3) == [[], [], [], []]
+
+
+class StubCollection:
+    """ChromaDB collection returning fixed distances (sorted, as ChromaDB does)"""
+
+    def __init__(self, name, distances, error=None):
+        self.name = name
+        self.distances = sorted(distances)
+        self.error = error
+        self.queries = []
+
+    def query(self, query_embeddings, n_results, where=None):
+        self.queries.append((query_embeddings, n_results))
+        if self.error:
+            raise self.error
+        hits = self.distances[:n_results]
+        return {
+            "ids": [[f"{self.name}-{d}" for d in hits]],
+            "documents": [[f"{self.name} at {d}" for d in hits]],
+            "metadatas": [[{"type": "text"} for _ in hits]],
+            "distances": [hits]
+        }
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(Config, 'MULTIMODAL_VECTOR_BACKEND', 'chromadb')
+    embedded = []
+    monkeypatch.setattr(multimodal_rag_service, 'embed_text',
+                        lambda text: embedded.append(text) or np.array([0.6, 0.8], dtype=np.float32))
+
+    service = MultimodalRAGService.__new__(MultimodalRAGService)
+    service.collections = {}
+    service.vector_indexes = {}
+    service._vector_index_retry_at = {}
+    service._retrieval_executor = ThreadPoolExecutor(max_workers=4)
+    service.embedded = embedded
+    yield service
+    service._retrieval_executor.shutdown()
+
+
+def test_global_top_k_is_merged_by_distance(service):
+    service.collections = {
+        'physics': StubCollection('physics', [0.1, 0.5, 0.9]),
+        'chemistry': StubCollection('chemistry', [0.2, 0.3, 0.4]),
+        'biology': StubCollection('biology', [0.8]),
+    }
+
+    docs = service.retrieve_across_collections("force", k=4)
+
+    assert [(doc["collection"], doc["distance"]) for doc in docs] == [
+        ('physics', 0.1), ('chemistry', 0.2), ('chemistry', 0.3), ('chemistry', 0.4)]
+    assert service.embedded == ["force"]  # Embedded once for every collection
+    for collection in service.collections.values():
+        (embeddings, n_results), = collection.queries
+        assert n_results == 4 and np.allclose(embeddings, [[0.6, 0.8]])
+
+
+def test_failing_collection_is_skipped(service):
+    service.collections = {
+        'physics': StubCollection('physics', [0.3, 0.6]),
+        'broken': StubCollection('broken', [0.0], error=RuntimeError("index corrupted")),
+    }
+
+    docs = service.retrieve_across_collections("force", k=3)
+
+    assert [doc["id"] for doc in docs] == ['physics-0.3', 'physics-0.6']
+
+
+def test_only_known_collections_are_searched(service):
+    service.collections = {'physics': StubCollection('physics', [0.3]), 'chemistry': StubCollection('chemistry', [0.1])}
+
+    docs = service.retrieve_across_collections("force", k=2, collections=['physics', 'unknown'])
+
+    assert [doc["collection"] for doc in docs] == ['physics']
+    assert service.collections['chemistry'].queries == []
+    assert service.retrieve_across_collections("force", collections=['unknown']) == []
@@ -0,0 +1,83 @@
+"""
+Unit tests for the cached Ollama health snapshot (staleness and re-probing)
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("ollama")
+
+from config import Config
+from shared.services import ollama_health_service
+from shared.services.ollama_health_service import OllamaHealthService
+
+
+class FakePool:
+    """The part of OllamaPool the health service reads"""
+
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.probes = 0
+
+    def refresh(self):
+        self.probes += 1
+        return self.snapshot()
+
+    def snapshot(self):
+        return [{'url': 'http://ollama:11434', 'healthy': self.healthy, 'models': ['llava:latest'],
+                 'message': 'Ollama server is running' if self.healthy else 'Connection refused'}]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(ollama_health_service, 'get_ollama_pool', lambda: pool)
+    monkeypatch.setattr(Config, 'OLLAMA_HEALTH_MAX_AGE', 30)
+    monkeypatch.setattr(Config, 'OLLAMA_HEALTH_PROBE_SECONDS', 10)
+    return pool
+
+
+def age_snapshot(service, seconds):
+    service._snapshot = {**service._snapshot, 'checked_at': time.time() - seconds}
+
+
+def test_stale_snapshot_of_wedged_monitor_is_reported_unhealthy(pool):
+    service = OllamaHealthService()
+    service.probe()
+    service._monitor_thread = object()  # Monitor "running" but no longer probing
+    assert service.is_healthy_cached() == (True, 'Ollama server is running')
+
+    age_snapshot(service, 31)
+    snapshot = service.get_snapshot()
+
+    assert pool.probes == 1  # Served from the cache, not re-probed
+    assert snapshot['server_healthy'] is False and snapshot['models_available'] is False
+    assert snapshot['server_message'] == 'Ollama health snapshot is stale (31s old)'
+    assert snapshot['age_seconds'] >= 31
+    assert service.is_healthy_cached()[0] is False
+    assert service._snapshot['server_healthy'] is True  # The cached snapshot itself is untouched
+
+
+def test_old_snapshot_without_monitor_is_probed_again(pool):
+    service = OllamaHealthService()
+    service.probe()
+    age_snapshot(service, 11)
+
+    snapshot = service.get_snapshot()
+
+    assert pool.probes == 2
+    assert snapshot['server_healthy'] is True and snapshot['age_seconds'] < 1
+
+
+def test_reported_failure_is_unhealthy_until_next_probe(pool):
+    service = OllamaHealthService()
+    service.probe()
+    service._monitor_thread = object()
+
+    service.report_failure('Connection refused')
+
+    assert service.is_healthy_cached() == (False, 'Ollama request failed: Connection refused')
+    assert not service.is_model_available_cached('llava')
+    service.probe()
+    assert service.is_healthy_cached()[0] is True and service.is_model_available_cached('llava')
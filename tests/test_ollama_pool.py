@@ -0,0 +1,201 @@
+"""
+Unit tests for the multi-host Ollama pool, run against local stub servers
+"""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("ollama")
+
+from shared.services.ollama_pool import OllamaPool
+
+
+class StubOllama:
+    """Minimal Ollama server: /api/tags, /api/ps and /api/chat with artificial latency"""
+
+    def __init__(self, name, models, loaded=None, latency=0.0):
+        self.name = name
+        self.models = models
+        self.loaded = loaded or []
+        self.latency = latency
+        self.chat_calls = 0
+        self.max_concurrent = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self._send_json({'models': [{'name': m} for m in stub.models]})
+                elif self.path == '/api/ps':
+                    self._send_json({'models': [{'name': m} for m in stub.loaded]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub._lock:
+                    stub.chat_calls += 1
+                    stub._active += 1
+                    stub.max_concurrent = max(stub.max_concurrent, stub._active)
+                try:
+                    time.sleep(stub.latency)
+                finally:
+                    with stub._lock:
+                        stub._active -= 1
+
+                message = {'role': 'assistant', 'content': stub.name}
+                if not request.get('stream'):
+                    self._send_json({'model': request['model'], 'message': message, 'done': True})
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                for content, done in ((stub.name, False), ('', True)):
+                    line = {'model': request['model'], 'message': {'role': 'assistant', 'content': content}, 'done': done}
+                    self.wfile.write((json.dumps(line) + '\n').encode())
+                self.wfile.flush()
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _unused_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+@pytest.fixture
+def stubs():
+    created = []
+
+    def make(*args, **kwargs):
+        stub = StubOllama(*args, **kwargs)
+        created.append(stub)
+        return stub
+
+    yield make
+    for stub in created:
+        stub.close()
+
+
+MESSAGES = [{'role': 'user', 'content': 'hi'}]
+
+
+class TestOllamaPool:
+    """Routing, load balancing and eviction"""
+
+    def test_routes_to_host_with_model(self, stubs):
+        with_model = stubs('a', ['llava:latest'])
+        without_model = stubs('b', ['llama3.2:1b'])
+        pool = OllamaPool([without_model.url, with_model.url], probe_timeout=1)
+        pool.refresh()
+
+        for _ in range(5):
+            response = pool.chat(model='llava', messages=MESSAGES)
+            assert response['message']['content'] == 'a'
+
+        assert with_model.chat_calls == 5
+        assert without_model.chat_calls == 0
+
+    def test_prefers_host_with_model_loaded(self, stubs):
+        cold = stubs('cold', ['llava:latest'])
+        warm = stubs('warm', ['llava:latest'], loaded=['llava:latest'])
+        pool = OllamaPool([cold.url, warm.url], probe_timeout=1)
+        pool.refresh()
+
+        assert pool.chat(model='llava', messages=MESSAGES)['message']['content'] == 'warm'
+
+    def test_least_loaded_routing_spreads_concurrent_calls(self, stubs):
+        hosts = [stubs(f'h{i}', ['llava:latest'], latency=0.3) for i in range(2)]
+        pool = OllamaPool([host.url for host in hosts], probe_timeout=1)
+        pool.refresh()
+
+        threads = [threading.Thread(target=pool.chat, kwargs={'model': 'llava', 'messages': MESSAGES})
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counts = [host.chat_calls for host in hosts]
+        assert sum(counts) == 8
+        assert max(counts) - min(counts) <= 2
+        assert all(status['in_flight'] == 0 for status in pool.snapshot())
+
+    def test_in_flight_cap_is_shared_by_all_callers(self, stubs):
+        host = stubs('h', ['llava:latest'], latency=0.2)
+        pool = OllamaPool([host.url], probe_timeout=1, max_in_flight=2)
+        pool.refresh()
+
+        threads = [threading.Thread(target=pool.chat, kwargs={'model': 'llava', 'messages': MESSAGES})
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert host.chat_calls == 6
+        assert host.max_concurrent == 2
+        assert pool.snapshot()[0]['in_flight'] == 0
+
+    def test_probe_evicts_unreachable_host(self, stubs):
+        live = stubs('live', ['llava:latest'])
+        pool = OllamaPool([_unused_url(), live.url], probe_timeout=1)
+
+        statuses = pool.refresh()
+        assert [status['healthy'] for status in statuses] == [False, True]
+
+        for _ in range(3):
+            assert pool.chat(model='llava', messages=MESSAGES)['message']['content'] == 'live'
+
+    def test_failed_call_moves_to_next_host(self, stubs):
+        live = stubs('live', ['llava:latest'])
+        dead_url = _unused_url()
+        pool = OllamaPool([dead_url, live.url], probe_timeout=1, evict_seconds=60)
+
+        # Not probed yet: both hosts are candidates and the dead one is picked first
+        assert pool.chat(model='llava', messages=MESSAGES)['message']['content'] == 'live'
+        dead = next(status for status in pool.snapshot() if status['url'] == dead_url)
+        assert dead['healthy'] is False
+        assert dead['failures'] == 1
+
+    def test_stream_releases_host(self, stubs):
+        live = stubs('live', ['llava:latest'])
+        pool = OllamaPool([live.url], probe_timeout=1)
+
+        parts = [part['message']['content'] for part in pool.chat(model='llava', messages=MESSAGES, stream=True)]
+        assert ''.join(parts) == 'live'
+        assert pool.snapshot()[0]['in_flight'] == 0
+
+    def test_all_hosts_down_raises_connection_error(self):
+        pool = OllamaPool([_unused_url(), _unused_url()], probe_timeout=1)
+        with pytest.raises(ConnectionError):
+            pool.chat(model='llava', messages=MESSAGES)
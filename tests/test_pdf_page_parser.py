@@ -0,0 +1,76 @@
+"""
+Tests of page chunking offsets and the merge of overlapping retrieved chunks
+"""
+
+import pytest
+
+pytest.importorskip("fitz")
+
+from shared.services.pdf_page_parser import (chunk_text_spans, chunk_text_windows, merge_overlapping_chunks,
+                                             split_sentences)
+
+TEXT = " ".join(f"Sentence {i} is about topic {i} and nothing else." for i in range(40))
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def as_docs(chunks, page=0, pdf_file="a.pdf"):
+    return [{"id": f"{pdf_file}:{page}:{i}", "content": content, "collection": "physics",
+             "metadata": {"type": "text", "pdf_file": pdf_file, "page": page,
+                          "span_start": start, "span_end": end}}
+            for i, (content, (start, end)) in enumerate(chunks)]
+
+
+def test_window_spans_locate_payload_in_normalized_text():
+    normalized = " ".join(split_sentences(TEXT))
+    windows = chunk_text_windows(TEXT, max_tokens=30, context_chars=200, count_tokens=count_words)
+
+    assert len(windows) > 3
+    for _, context, (start, end) in windows:
+        assert normalized[start:end] == context
+
+
+def test_char_spans_locate_chunk():
+    for chunk, (start, end) in chunk_text_spans(TEXT, 200, 50):
+        assert TEXT[start:end] == chunk
+
+
+@pytest.mark.parametrize('make_chunks', [
+    lambda: [(context, span) for _, context, span in
+             chunk_text_windows(TEXT, max_tokens=30, context_chars=200, count_tokens=count_words)],
+    lambda: chunk_text_spans(TEXT, 200, 50),
+])
+def test_merging_every_chunk_restores_the_page_once(make_chunks):
+    chunks = make_chunks()
+    merged = merge_overlapping_chunks(list(reversed(as_docs(chunks))))
+
+    assert len(merged) == 1
+    start, end = merged[0]["metadata"]["span_start"], merged[0]["metadata"]["span_end"]
+    assert (start, end) == (chunks[0][1][0], chunks[-1][1][1])
+    assert merged[0]["id"] == f"a.pdf:0:{len(chunks) - 1}"  # Best ranked chunk of the cluster
+
+
+def test_merge_keeps_rank_and_separate_passages():
+    chunks = chunk_text_spans(TEXT, 200, 50)
+    docs = as_docs(chunks)
+    image = {"id": "img", "content": "figure", "collection": "physics", "metadata": {"type": "image"}}
+    other_page = as_docs(chunks[:1], page=1)[0]
+    ranked = [docs[5], image, docs[1], docs[4], other_page, docs[2]]
+
+    merged = merge_overlapping_chunks(ranked)
+
+    # 4+5 overlap (rank 0), 1+2 overlap (rank 2); the page 1 chunk stays apart
+    assert [doc["id"] for doc in merged] == [docs[5]["id"], "img", docs[1]["id"], other_page["id"]]
+    assert merged[0]["content"] == TEXT[chunks[4][1][0]:chunks[5][1][1]]
+    assert merged[2]["content"] == TEXT[chunks[1][1][0]:chunks[2][1][1]]
+    assert docs[5]["content"] == chunks[5][0]  # Inputs untouched
+
+
+def test_chunks_without_spans_are_deduplicated_by_content():
+    legacy = {"content": "same text", "collection": "physics", "metadata": {"type": "text", "pdf_file": "a.pdf", "page": 0}}
+
+    merged = merge_overlapping_chunks([legacy, dict(legacy), {**legacy, "content": "other"}])
+
+    assert [doc["content"] for doc in merged] == ["same text", "other"]
@@ -0,0 +1,157 @@
+"""
+Tests of question bank test assembly and refill queueing on an in-memory SQLite database
+"""
+
+import pytest
+from sqlalchemy.orm import Query
+
+from app import create_app
+from config import Config
+from shared.models.user import db
+from shared.models.course import ExamCategory, ExamCategorySubject
+from shared.models.purchase import ExamCategoryQuestion, MCQGenerationJob, MockTestAttempt
+from shared.services.question_bank_service import BANK_GENERATION_METHOD, REFILL_JOB_TYPE, QuestionBankService
+
+USER_ID = 7
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def subject(app):
+    course = ExamCategory(course_name='JEE')
+    db.session.add(course)
+    db.session.flush()
+    subject = ExamCategorySubject(exam_category_id=course.id, subject_name='Physics')
+    db.session.add(subject)
+    db.session.commit()
+    return subject
+
+
+@pytest.fixture
+def locked_entities(monkeypatch):
+    """Entities queried with SELECT ... FOR UPDATE (SQLite compiles the lock away)"""
+    locked = []
+    with_for_update = Query.with_for_update
+
+    def spy(self, *args, **kwargs):
+        locked.append(self.column_descriptions[0]['entity'])
+        return with_for_update(self, *args, **kwargs)
+
+    monkeypatch.setattr(Query, 'with_for_update', spy)
+    return locked
+
+
+def add_bank_questions(subject, count):
+    questions = [ExamCategoryQuestion(exam_category_id=subject.exam_category_id, subject_id=subject.id,
+                                      question=f'Question {i}?', option_1='a', option_2='b', option_3='c',
+                                      option_4='d', correct_answer='a', generation_method=BANK_GENERATION_METHOD)
+                 for i in range(count)]
+    db.session.add_all(questions)
+    db.session.commit()
+    return [question.id for question in questions]
+
+
+def add_mock_test(subject, test_number=1, total_questions=5):
+    mock_test = MockTestAttempt(purchase_id=1, user_id=USER_ID, course_id=subject.exam_category_id,
+                                subject_id=subject.id, test_number=test_number, total_questions=total_questions)
+    db.session.add(mock_test)
+    db.session.commit()
+    return mock_test
+
+
+def question_ids(result):
+    return [question.id for question in result['questions']]
+
+
+def test_assemble_test_maps_bank_questions_in_order(subject):
+    bank_ids = add_bank_questions(subject, 8)
+    mock_test = add_mock_test(subject)
+
+    result = QuestionBankService.assemble_test(mock_test, 5)
+
+    assert result['success'] and len(set(question_ids(result))) == 5
+    assert set(question_ids(result)) <= set(bank_ids)
+    assert [q.id for q in QuestionBankService.get_mock_test_questions(mock_test.id)] == question_ids(result)
+    assert mock_test.questions_generated
+    assert QuestionBankService.get_bank_size(subject.id) == 8  # Assembled by reference
+
+
+def test_assemble_test_prefers_unseen_questions(subject):
+    bank_ids = add_bank_questions(subject, 8)
+    first = QuestionBankService.assemble_test(add_mock_test(subject, 1), 5)
+
+    second = QuestionBankService.assemble_test(add_mock_test(subject, 2), 5)
+
+    unseen = set(bank_ids) - set(question_ids(first))
+    assert unseen <= set(question_ids(second))  # All 3 unseen, topped up with 2 seen
+    assert len(set(question_ids(second))) == 5
+
+
+def test_assemble_test_locks_the_mock_test_and_assembles_once(subject, locked_entities):
+    add_bank_questions(subject, 8)
+    mock_test = add_mock_test(subject)
+
+    first = QuestionBankService.assemble_test(mock_test, 5)
+    again = QuestionBankService.assemble_test(mock_test, 5)
+
+    assert not db.session().in_transaction()  # Lock released by the rollback
+    assert locked_entities == [MockTestAttempt, MockTestAttempt]
+    assert again['already_assembled'] and question_ids(again) == question_ids(first)
+
+
+def test_assemble_test_short_bank_releases_the_lock(subject):
+    add_bank_questions(subject, 3)
+    mock_test = add_mock_test(subject)
+
+    result = QuestionBankService.assemble_test(mock_test, 5)
+
+    assert not result['success'] and '3/5' in result['error']
+    assert not db.session().in_transaction()
+    assert QuestionBankService.get_mock_test_questions(mock_test.id) == []
+
+
+def refill_jobs(subject):
+    return MCQGenerationJob.query.filter_by(job_type=REFILL_JOB_TYPE, subject_id=subject.id).all()
+
+
+def test_ensure_refill_queues_one_job_per_subject(subject, locked_entities, monkeypatch):
+    monkeypatch.setattr(Config, 'QUESTION_BANK_TARGET_DEPTH', 10)
+    monkeypatch.setattr(Config, 'QUESTION_BANK_REFILL_BATCH', 50)
+    add_bank_questions(subject, 4)
+
+    job_id = QuestionBankService.ensure_refill(subject.id)
+
+    assert locked_entities[0] is ExamCategorySubject  # Subject locked before checking for queued jobs
+    assert QuestionBankService.ensure_refill(subject.id) is None
+    assert not db.session().in_transaction()
+    jobs = refill_jobs(subject)
+    assert [job.id for job in jobs] == [job_id]
+    assert jobs[0].total_questions == 6 and jobs[0].payload['subject_name'] == 'Physics'
+
+
+def test_ensure_refill_chains_past_the_running_job(subject, monkeypatch):
+    monkeypatch.setattr(Config, 'QUESTION_BANK_TARGET_DEPTH', 10)
+    first = QuestionBankService.ensure_refill(subject.id)
+
+    second = QuestionBankService.ensure_refill(subject.id, exclude_job_id=first)
+
+    assert second and second != first
+    assert len(refill_jobs(subject)) == 2
+
+
+def test_ensure_refill_skips_full_bank_and_unknown_subject(subject, monkeypatch):
+    monkeypatch.setattr(Config, 'QUESTION_BANK_TARGET_DEPTH', 3)
+    add_bank_questions(subject, 3)
+
+    assert QuestionBankService.ensure_refill(subject.id) is None
+    assert QuestionBankService.ensure_refill(subject.id + 1) is None
+    assert refill_jobs(subject) == []
@@ -0,0 +1,206 @@
+"""
+Tests of near-duplicate question detection and deduplicated generation
+
+generate_deduplicated runs against a fake MultimodalRAGService whose generate_mcq
+serves scripted questions in chunks of 5; saved rows go to an in-memory SQLite
+database, and each save snapshots dedup_state as a job publish would.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from app import create_app
+from config import Config
+from shared.models.user import db
+from shared.models.course import ExamCategory, ExamCategorySubject
+from shared.models.purchase import ExamCategoryQuestion
+from shared.services import question_dedup_service
+from shared.services.question_dedup_service import (NUM_BANDS, NUM_PERM, QuestionDedupIndex, _SubjectIndex,
+                                                    generate_deduplicated, minhash_signature)
+
+
+def question(i):
+    """A question sharing no word 3-gram with question(j) for j != i"""
+    return {'question': ' '.join(f"w{i}x{j}" for j in range(8)) + '?', 'correct_answer': 'A'}
+
+
+def duplicate(i):
+    """question(i) with different case and punctuation"""
+    return {'question': question(i)['question'].upper().replace(' ', ', '), 'correct_answer': 'B'}
+
+
+class Crash(Exception):
+    pass
+
+
+class FakeMCQService:
+    """generate_mcq of MultimodalRAGService serving questions from a script"""
+
+    ollama_model = 'fake-model'
+
+    def __init__(self, questions, crash_before_chunk=None):
+        self.questions = list(questions)
+        self.crash_before_chunk = crash_before_chunk
+        self.calls = []
+
+    def generate_mcq(self, query, subject, num_questions, on_chunk, skip_chunks):
+        self.calls.append((num_questions, sorted(skip_chunks)))
+        for chunk_num in range(1, (num_questions + 4) // 5 + 1):
+            if chunk_num in skip_chunks:
+                continue
+            if (len(self.calls), chunk_num) == self.crash_before_chunk:
+                raise Crash()
+            size = min(5, num_questions - (chunk_num - 1) * 5)
+            chunk, self.questions = self.questions[:size], self.questions[size:]
+            on_chunk(chunk_num, (chunk_num - 1) * 5, chunk)
+        return {'success': True, 'model_used': self.ollama_model}
+
+
+@pytest.fixture
+def subject():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        course = ExamCategory(course_name='JEE')
+        db.session.add(course)
+        db.session.flush()
+        subject = ExamCategorySubject(exam_category_id=course.id, subject_name='Physics')
+        db.session.add(subject)
+        db.session.commit()
+        yield subject
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def dedup_index(monkeypatch):
+    monkeypatch.setattr(Config, 'QUESTION_DEDUP_ENABLED', True)
+    index = QuestionDedupIndex(threshold=0.8, max_per_subject=1000, sync_seconds=0)
+    monkeypatch.setattr(question_dedup_service, '_question_dedup_index', index)
+    return index
+
+
+def save_question(subject, q_data):
+    row = ExamCategoryQuestion(exam_category_id=subject.exam_category_id, subject_id=subject.id,
+                               question=q_data['question'], option_1='a', option_2='b', option_3='c',
+                               option_4='d', correct_answer=q_data['correct_answer'])
+    db.session.add(row)
+    db.session.commit()
+    return row
+
+
+class Job:
+    """Stands in for GenerationJobContext: completed chunks and payload survive a crash"""
+
+    def __init__(self, subject):
+        self.subject = subject
+        self.saved = []  # (chunk_num, start_index, question texts)
+        self.completed_chunks = []
+        self.dedup_state = {}
+
+    def save_chunk(self, chunk_num, start_index, questions):
+        rows = [save_question(self.subject, q_data) for q_data in questions]
+        self.saved.append((chunk_num, start_index, [q['question'] for q in questions]))
+        self.completed_chunks.append(chunk_num)
+        self.persisted_state = json.loads(json.dumps(self.dedup_state))
+        return rows
+
+    def run(self, service, num_questions, max_rounds=2, resume=False):
+        return generate_deduplicated(service, query='Physics', subject='Physics', subject_id=self.subject.id,
+                                     num_questions=num_questions, save_chunk=self.save_chunk,
+                                     skip_chunks=list(self.completed_chunks), max_rounds=max_rounds,
+                                     dedup_state=self.persisted_state if resume else self.dedup_state)
+
+
+def test_minhash_ignores_case_and_punctuation():
+    assert np.array_equal(minhash_signature("What is Newton's second law?"),
+                          minhash_signature("what is newton s SECOND law"))
+    assert minhash_signature("?!") is None and minhash_signature("") is None
+    assert minhash_signature("Define force").shape == (NUM_PERM,)
+
+
+def test_minhash_agreement_estimates_similarity():
+    base = "A ball of mass 2 kg is thrown vertically upwards with a speed of 20 m/s from the ground level"
+    one_word_changed = base.replace("ground", "roof")
+    unrelated = "Which organelle is known as the powerhouse of the cell in eukaryotic organisms"
+
+    def agreement(text):
+        return float(np.mean(minhash_signature(base) == minhash_signature(text)))
+
+    assert agreement(one_word_changed) > agreement(unrelated)
+    assert agreement(unrelated) < 0.2
+
+
+def test_subject_index_evicts_oldest_signatures_and_buckets():
+    index = _SubjectIndex()
+    for question_id in (1, 2, 3):
+        index.add(question_id, minhash_signature(question(question_id)['question']), max_size=2)
+
+    assert list(index.signatures) == [2, 3]
+    assert index.find(minhash_signature(question(1)['question']), 0.8) is None
+    assert index.find(minhash_signature(duplicate(3)['question']), 0.8) == 3
+    assert all(1 not in bucket for bucket in index.buckets.values())
+    assert sum(len(bucket) for bucket in index.buckets.values()) == 2 * NUM_BANDS  # Emptied buckets removed
+
+
+def test_filter_new_checks_saved_questions_and_the_batch(subject, dedup_index):
+    saved = save_question(subject, question(0))
+
+    unique, duplicates = dedup_index.filter_new(subject.id, [
+        duplicate(0), question(1), duplicate(1), {'question': '...'}, question(2)
+    ])
+
+    assert unique == [question(1), question(2)]
+    assert duplicates == [duplicate(0), duplicate(1), {'question': '...'}]
+    assert dedup_index.find_duplicate(subject.id, duplicate(0)['question']) == saved.id
+    assert dedup_index.find_duplicate(subject.id, question(1)['question']) is None  # Batch-only, not indexed
+
+
+def test_duplicates_are_dropped_and_regenerated(subject, dedup_index):
+    save_question(subject, question(0))
+    service = FakeMCQService([duplicate(0), question(1), question(2), question(3), duplicate(1),
+                              question(4), question(5)])
+    job = Job(subject)
+
+    result = job.run(service, num_questions=5)
+
+    assert service.calls == [(5, []), (2, [])]
+    assert [(chunk, start, len(texts)) for chunk, start, texts in job.saved] == [(1, 0, 3), (1001, 5, 2)]
+    assert result['success'] and result['duplicates_dropped'] == 2
+    assert [q['question'] for q in result['questions']] == [question(i)['question'] for i in range(1, 6)]
+
+
+def test_top_up_rounds_are_capped(subject, dedup_index):
+    save_question(subject, question(0))
+    service = FakeMCQService([question(1), question(2)] + [duplicate(0)] * 20)
+    job = Job(subject)
+
+    result = job.run(service, num_questions=5, max_rounds=2)
+
+    assert service.calls == [(5, []), (3, []), (3, [])]  # Requested questions, then 2 top-up rounds
+    assert [chunk for chunk, _, _ in job.saved] == [1, 1001, 2001]
+    assert result['duplicates_dropped'] == 9 and len(result['questions']) == 2
+
+
+def test_resume_mid_top_up_round(subject, dedup_index):
+    first_round = [question(1), question(2), duplicate(1), duplicate(2), duplicate(1),
+                   question(3), question(4), duplicate(3), duplicate(4), duplicate(3)]
+    top_up = [question(i) for i in range(5, 12)]
+    job = Job(subject)
+
+    with pytest.raises(Crash):
+        job.run(FakeMCQService(first_round + top_up, crash_before_chunk=(2, 2)), num_questions=10)
+
+    assert job.completed_chunks == [1, 2, 1001]
+    assert job.persisted_state['round'] == 1 and job.persisted_state['round_target'] == 6
+    assert job.persisted_state['next_index'] == 15
+
+    resumed = FakeMCQService(top_up[5:])
+    result = job.run(resumed, num_questions=10, resume=True)
+
+    assert resumed.calls == [(6, [1])]  # Round 0 not re-run; chunk 1001 skipped as top-up chunk 1
+    assert job.saved[-1] == (1002, 15, [question(10)['question']])
+    assert result['success'] and [q['question'] for q in result['questions']] == [question(10)['question']]
+    assert ExamCategoryQuestion.query.filter_by(subject_id=subject.id).count() == 10
@@ -0,0 +1,40 @@
+"""
+Tests of the /health report and the /ready readiness signal
+"""
+
+import pytest
+
+from app import create_app
+from shared.services import model_registry as model_registry_module
+from shared.services.model_registry import FAILED, READY, WARMING, ModelRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ModelRegistry()
+    monkeypatch.setattr(model_registry_module, 'model_registry', registry)
+    return registry
+
+
+@pytest.fixture
+def client():
+    return create_app('testing').test_client()
+
+
+def set_state(registry, name, state):
+    registry.register(name, lambda: name)
+    registry._components[name].state = state
+
+
+@pytest.mark.parametrize('state, ready_code', [(READY, 200), (WARMING, 503), (FAILED, 503)])
+def test_health_is_200_and_ready_follows_model_state(registry, client, state, ready_code):
+    set_state(registry, 'clip', READY)
+    set_state(registry, 'vector_store', state)
+
+    health = client.get('/health')
+    ready = client.get('/ready')
+
+    assert health.status_code == 200 and health.get_json()['success'] is True
+    assert health.get_json()['readiness']['status'] == state
+    assert ready.status_code == ready_code and ready.get_json()['success'] is (ready_code == 200)
+    assert ready.get_json()['readiness']['components']['vector_store']['state'] == state
@@ -0,0 +1,163 @@
+"""
+Tests of the semantic chat response cache
+
+The labelled pairs below are the calibration set of CHAT_RESPONSE_CACHE_THRESHOLD.
+PARAPHRASES must be served from each other's cache entry; DIFFERENT_QUESTIONS never
+may. The lexical guard alone must separate every pair whose content words or numbers
+differ (checked without a model); test_threshold_calibration embeds the whole set with
+MULTIMODAL_CLIP_MODEL and is skipped when its weights are not available.
+"""
+
+import numpy as np
+import pytest
+
+from config import Config
+from shared.services.semantic_response_cache import SemanticResponseCache, lexical_key
+
+PARAPHRASES = [
+    ("What is Newton's second law?", "Explain Newton's second law"),
+    ("Define photosynthesis", "What is photosynthesis?"),
+    ("State Ohm's law", "What is Ohm's law?"),
+    ("What is the SI unit of force?", "SI unit of force"),
+    ("Tell me about mitochondria", "Explain mitochondria"),
+    ("What is the atomic number of carbon?", "atomic number of carbon"),
+    ("Explain the laws of thermodynamics", "What are the laws of thermodynamics?"),
+    ("What is the derivative of sin x?", "derivative of sin x"),
+    ("Describe the structure of an atom", "Explain the structure of the atom"),
+    ("What is the molar mass of 2 moles of water?", "molar mass of 2 moles of water"),
+]
+
+# Near-duplicates for CLIP that ask for a different answer
+DIFFERENT_QUESTIONS = [
+    ("What is the atomic number of sodium?", "What is the atomic number of potassium?"),
+    ("Mass of 2 moles of oxygen", "Mass of 3 moles of oxygen"),
+    ("Explain Newton's first law", "Explain Newton's second law"),
+    ("What is the derivative of sin x?", "What is the integral of sin x?"),
+    ("Explain mitosis", "Explain meiosis"),
+    ("Convert 100 Celsius to Fahrenheit", "Convert 100 Fahrenheit to Celsius"),
+    ("Is every square a rectangle?", "Is every rectangle a square?"),
+    ("Speed of sound in air", "Speed of light in air"),
+    ("Find the area of a circle of radius 7 cm", "Find the area of a circle of radius 7.5 cm"),
+    ("Why is the sky blue?", "Why is the sea blue?"),
+]
+
+MIN_PARAPHRASE_RECALL = 0.5
+VERSION = 'v1'
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_lexical_key_ignores_phrasing():
+    for first, second in PARAPHRASES:
+        assert lexical_key(first) == lexical_key(second), (first, second)
+
+
+@pytest.mark.parametrize('first, second', DIFFERENT_QUESTIONS)
+def test_lexical_guard_rejects_different_question_with_identical_embedding(first, second):
+    """Even at similarity 1.0 a query with other numbers or content words misses"""
+    cache = SemanticResponseCache(max_size=8, threshold=0.95)
+    vector = unit([1.0, 2.0, 3.0])
+    cache.put(vector, {'response': first}, VERSION, first)
+
+    assert cache.get(vector, VERSION, second) is None
+    assert cache.get(vector, VERSION, first)['response'] == first
+    assert cache.stats()['lexical_rejections'] == 1
+
+
+def test_guard_skips_to_next_candidate():
+    """A rejected best match does not hide a lexically matching one above the threshold"""
+    cache = SemanticResponseCache(max_size=8, threshold=0.9)
+    cache.put(unit([1.0, 0.0, 0.0]), {'response': 'sodium'}, VERSION, "atomic number of sodium")
+    cache.put(unit([1.0, 0.2, 0.0]), {'response': 'potassium'}, VERSION, "atomic number of potassium")
+
+    hit = cache.get(unit([1.0, 0.01, 0.0]), VERSION, "What is the atomic number of potassium?")
+
+    assert hit['response'] == 'potassium'
+
+
+def test_put_appends_to_the_matrix():
+    cache = SemanticResponseCache(max_size=100, threshold=0.99)
+    rng = np.random.default_rng(0)
+    vectors = [unit(rng.normal(size=16)) for _ in range(70)]
+    cache.put(vectors[0], {'response': 0}, VERSION, "q 0")
+    assert cache.get(vectors[0], VERSION, "q 0")['response'] == 0
+    matrix = cache._matrix
+
+    for i, vector in enumerate(vectors[1:64], start=1):
+        cache.put(vector, {'response': i}, VERSION, f"q {i}")
+    assert cache._matrix is matrix  # Written in place, not rebuilt
+
+    for i, vector in enumerate(vectors[64:], start=64):
+        cache.put(vector, {'response': i}, VERSION, f"q {i}")
+    assert cache._matrix.shape[0] == 100  # Grown once, capped at max_size
+    assert all(cache.get(v, VERSION, f"q {i}")['response'] == i for i, v in enumerate(vectors))
+
+
+def test_lru_eviction_reuses_rows():
+    cache = SemanticResponseCache(max_size=3, threshold=0.99)
+    vectors = [unit(np.eye(4)[i]) for i in range(4)]
+    for i in range(3):
+        cache.put(vectors[i], {'response': i}, VERSION, f"q {i}")
+    cache.get(vectors[0], VERSION, "q 0")  # 1 is now the least recently used
+
+    cache.put(vectors[3], {'response': 3}, VERSION, "q 3")
+
+    assert cache.get(vectors[1], VERSION, "q 1") is None
+    assert [cache.get(vectors[i], VERSION, f"q {i}")['response'] for i in (0, 2, 3)] == [0, 2, 3]
+    assert cache._matrix.shape[0] == 3 and len(cache._row_ids) == 3
+
+
+def test_expired_entry_misses():
+    cache = SemanticResponseCache(max_size=4, ttl_seconds=60, threshold=0.99)
+    vector = unit([1.0, 1.0])
+    cache.put(vector, {'response': 'old'}, VERSION, "q")
+    row, key, response, stored_at = cache._entries[0]
+    cache._entries[0] = (row, key, response, stored_at - 61)
+
+    assert cache.get(vector, VERSION, "q") is None
+    assert cache.stats()['size'] == 0
+
+
+def test_version_change_drops_entries():
+    cache = SemanticResponseCache(max_size=4, threshold=0.99)
+    vector = unit([1.0, 1.0])
+    cache.put(vector, {'response': 'a'}, VERSION, "q")
+
+    assert cache.get(vector, 'v2', "q") is None
+    assert cache.stats()['invalidations'] == 1
+    cache.put(vector, {'response': 'b'}, 'v2', "q")
+    assert cache.get(vector, 'v2', "q")['response'] == 'b'
+
+
+def test_threshold_calibration():
+    """CHAT_RESPONSE_CACHE_THRESHOLD against the labelled pairs, embedded with the real CLIP model"""
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from shared.services.clip_backends import load_clip_backend
+    try:
+        clip = load_clip_backend('torch', Config.MULTIMODAL_CLIP_MODEL)
+    except Exception as e:
+        pytest.skip(f"{Config.MULTIMODAL_CLIP_MODEL} unavailable: {e}")
+
+    def served(pairs):
+        cache = SemanticResponseCache(max_size=len(pairs), threshold=Config.CHAT_RESPONSE_CACHE_THRESHOLD)
+        stored = clip.text_features([first for first, _ in pairs])
+        asked = clip.text_features([second for _, second in pairs])
+        results = []
+        for i, (first, second) in enumerate(pairs):
+            cache.clear()
+            cache.put(stored[i], {'response': first}, VERSION, first)
+            results.append(cache.get(asked[i], VERSION, second) is not None)
+        return results, (stored * asked).sum(axis=1)
+
+    wrong, wrong_similarity = served(DIFFERENT_QUESTIONS)
+    right, right_similarity = served(PARAPHRASES)
+    print(f"\nthreshold {Config.CHAT_RESPONSE_CACHE_THRESHOLD}: paraphrase similarity "
+          f"min {right_similarity.min():.4f} / mean {right_similarity.mean():.4f}, different-question "
+          f"similarity max {wrong_similarity.max():.4f}, recall {np.mean(right):.2f}, false hits {sum(wrong)}")
+
+    assert not any(wrong), [pair for pair, hit in zip(DIFFERENT_QUESTIONS, wrong) if hit]
+    assert np.mean(right) >= MIN_PARAPHRASE_RECALL
@@ -0,0 +1,78 @@
+"""
+Tests of the mmap vector index export layout (re-exports while an index is open)
+"""
+
+import os
+import json
+
+import numpy as np
+
+from shared.services.vector_index import (EXPORT_PREFIX, KEEP_EXPORTS, MANIFEST_FILE, VECTORS_FILE,
+                                          MmapVectorIndex, export_chroma_collection, export_data_dir)
+
+
+class FakeCollection:
+    """The part of a ChromaDB collection export_chroma_collection reads"""
+
+    def __init__(self, name, vectors):
+        self.name = name
+        self.vectors = vectors
+
+    def count(self):
+        return len(self.vectors)
+
+    def get(self, limit, offset, include):
+        rows = range(offset, min(offset + limit, len(self.vectors)))
+        return {
+            "ids": [f"doc{i}" for i in rows],
+            "embeddings": [self.vectors[i] for i in rows],
+            "documents": [f"content {i}" for i in rows],
+            "metadatas": [{"type": "text", "page": i} for i in rows]
+        }
+
+
+def random_vectors(n, seed):
+    return list(np.random.default_rng(seed).normal(size=(n, 8)).astype(np.float32))
+
+
+def test_reexport_keeps_open_index_consistent(tmp_path):
+    first = random_vectors(10, 0)
+    export_chroma_collection(FakeCollection('physics', first), str(tmp_path), dtype='float32')
+    index = MmapVectorIndex(str(tmp_path / 'physics'))
+    assert index.query(first[3].tolist(), 1)[0]["id"] == "doc3"
+
+    second = random_vectors(12, 1)
+    export_chroma_collection(FakeCollection('physics', second), str(tmp_path), dtype='float32')
+    os.utime(tmp_path / 'physics' / MANIFEST_FILE, ns=(1, 1))  # Coarse-mtime filesystems: force a change
+
+    assert index.query(second[11].tolist(), 1)[0]["id"] == "doc11"
+    assert index.count() == 12
+
+
+def test_old_exports_are_pruned(tmp_path):
+    for seed in range(KEEP_EXPORTS + 2):
+        export_chroma_collection(FakeCollection('physics', random_vectors(5, seed)), str(tmp_path), dtype='float16')
+
+    directory = tmp_path / 'physics'
+    exports = [entry for entry in os.listdir(directory) if entry.startswith(EXPORT_PREFIX)]
+    assert len(exports) == KEEP_EXPORTS
+    assert os.path.basename(export_data_dir(str(directory))) in exports
+    assert not [entry for entry in os.listdir(directory) if entry.endswith('.tmp')]
+
+
+def test_single_directory_export_still_opens(tmp_path):
+    """Exports written before the export subdirectories (arrays next to the manifest)"""
+    export_chroma_collection(FakeCollection('physics', random_vectors(6, 0)), str(tmp_path), dtype='float32')
+    directory = tmp_path / 'physics'
+    data_dir = export_data_dir(str(directory))
+    for name in os.listdir(data_dir):
+        os.replace(os.path.join(data_dir, name), directory / name)
+    manifest = json.loads((directory / MANIFEST_FILE).read_text())
+    del manifest['data_dir']
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest))
+
+    index = MmapVectorIndex(str(directory))
+
+    assert index.count() == 6
+    assert export_data_dir(str(directory)) == str(directory)
+    assert (directory / VECTORS_FILE).exists()